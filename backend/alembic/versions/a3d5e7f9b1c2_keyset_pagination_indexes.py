@@ -0,0 +1,47 @@
+"""keyset pagination indexes
+
+Revision ID: a3d5e7f9b1c2
+Revises: 6f4e3c2a9b11
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "a3d5e7f9b1c2"
+down_revision = "6f4e3c2a9b11"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_credentials_project_id_id", "credentials", ["project_id", "id"], unique=False
+    )
+    op.create_index(
+        "ix_service_instances_project_id_id",
+        "service_instances",
+        ["project_id", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_project_members_project_id_id",
+        "project_members",
+        ["project_id", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_project_members_user_id_project_id",
+        "project_members",
+        ["user_id", "project_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_project_members_user_id_project_id", table_name="project_members")
+    op.drop_index("ix_project_members_project_id_id", table_name="project_members")
+    op.drop_index("ix_service_instances_project_id_id", table_name="service_instances")
+    op.drop_index("ix_credentials_project_id_id", table_name="credentials")
@@ -0,0 +1,120 @@
+"""
+Bulk request parsing and per-item results
+
+Bulk endpoints accept either a JSON array or NDJSON (one object per line,
+`Content-Type: application/x-ndjson`). Items are validated one by one so a bad
+row is reported in the results instead of failing the whole request.
+"""
+import json
+from typing import Any, Literal, Optional, TypeVar
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import settings
+
+S = TypeVar("S", bound=BaseModel)
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: Literal["created", "updated", "deleted", "unchanged", "error"]
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    results: list[BulkItemResult]
+
+
+def bulk_result(results: list[dict[str, Any]]) -> dict[str, Any]:
+    """Wrap per-item results (dicts shaped like BulkItemResult) with totals"""
+    results.sort(key=lambda r: r["index"])
+    totals = {"created": 0, "updated": 0, "deleted": 0, "unchanged": 0, "error": 0}
+    for result in results:
+        totals[result["status"]] += 1
+    return {
+        "created": totals["created"],
+        "updated": totals["updated"],
+        "deleted": totals["deleted"],
+        "unchanged": totals["unchanged"],
+        "failed": totals["error"],
+        "results": results,
+    }
+
+
+def error_result(index: int, detail: str) -> dict[str, Any]:
+    return {"index": index, "status": "error", "id": None, "detail": detail}
+
+
+def _too_many() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"At most {settings.BULK_MAX_ITEMS} items per request",
+    )
+
+
+async def _raw_items(request: Request) -> list[Any]:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_TYPES:
+        items: list[Any] = []
+        buffer = b""
+
+        def take(line: bytes) -> None:
+            if line.strip():
+                if len(items) >= settings.BULK_MAX_ITEMS:
+                    raise _too_many()
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    # Keep the index; the row is reported as invalid
+                    items.append(None)
+
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                take(line)
+        take(buffer)
+        return items
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is not valid JSON")
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a JSON array or NDJSON body",
+        )
+    if len(items) > settings.BULK_MAX_ITEMS:
+        raise _too_many()
+    return items
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'item'}: {e['msg']}" for e in error.errors()
+    )
+
+
+async def read_bulk_items(request: Request, schema: type[S]) -> tuple[list[tuple[int, S]], list[dict[str, Any]]]:
+    """Return (valid (index, item) pairs, error results for invalid items)"""
+    valid: list[tuple[int, S]] = []
+    errors: list[dict[str, Any]] = []
+    for index, raw in enumerate(await _raw_items(request)):
+        if not isinstance(raw, dict):
+            errors.append(error_result(index, "Item must be a JSON object"))
+            continue
+        try:
+            valid.append((index, schema.model_validate(raw)))
+        except ValidationError as e:
+            errors.append(error_result(index, _describe(e)))
+    return valid, errors
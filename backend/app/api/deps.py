@@ -1,51 +1,120 @@
 """
 Common dependencies for API routes
 """
-from fastapi import Depends, HTTPException, status
+import logging
+from typing import Any, Optional
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
 
-from app.db import get_db
+from app.db import SessionLocal, get_db
 from app.api.v1.users.models import User
+from app.api.v1.projects.claims import (
+    MEMBERSHIP_VERSION_CLAIM,
+    PROJECT_ROLES_CLAIM,
+    decode_project_roles,
+    membership_version_async,
+)
+from app.core.principal_cache import Principal, principal_cache, token_digest
 from app.core.security import decode_access_token, TokenError
+from app.core.token_blacklist import is_blacklisted
 
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
-) -> User:
-    """
-    Resolve the current user from a Bearer access token.
+def fetch_principal(db: Session, payload: dict[str, Any]) -> Principal | None:
+    """Load the principal for a verified access token payload from the DB"""
+    stmt = select(User.id, User.is_active, User.is_superuser).where(User.id == int(payload["sub"]))
+    row = db.execute(stmt).one_or_none()
+    if not row:
+        return None
+    return Principal(
+        id=row.id,
+        is_active=bool(row.is_active),
+        is_superuser=bool(row.is_superuser),
+        project_roles=decode_project_roles(payload.get(PROJECT_ROLES_CLAIM)),
+        membership_version=payload.get(MEMBERSHIP_VERSION_CLAIM),
+    )
+
 
-    The access token is issued by `/api/v1/auth/login`.
+def _load_principal(payload: dict[str, Any]) -> Principal | None:
+    db = SessionLocal()
+    try:
+        return fetch_principal(db, payload)
+    finally:
+        db.close()
+
+
+async def resolve_principal(token: str) -> Optional[Principal]:
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    Verify an access token and return its principal, or None.
 
+    Verified principals are cached per worker, so the users table is only hit
+    (on the threadpool) on a cache miss. Project role claims in the token are
+    dropped once the user's membership version has moved on.
+    """
     try:
         payload = decode_access_token(token)
-        sub = payload.get("sub")
-        if not sub:
-            raise credentials_exception
-        user_id = int(sub)
-    except (TokenError, ValueError):
-        raise credentials_exception
+        if not payload.get("sub"):
+            return None
+        int(payload["sub"])
+        if await is_blacklisted(payload):
+            logger.warning("[AUTH] Blacklisted token used")
+            return None
+
+        digest = token_digest(token)
+        principal = principal_cache.get(digest)
+        if principal is None:
+            principal = await run_in_threadpool(_load_principal, payload)
+            if principal is None:
+                return None
+            principal_cache.put(digest, principal, expires_at=payload.get("exp"))
 
-    stmt = select(User).where(User.id == user_id)
-    user = db.execute(stmt).scalar_one_or_none()
-    if not user:
-        raise credentials_exception
-    return user
+        # Project role claims are only as fresh as the membership version they
+        # were issued at; one Redis GET per request keeps revocation immediate.
+        if principal.project_roles is not None:
+            if await membership_version_async(principal.id) != principal.membership_version:
+                principal = principal.without_project_roles()
+        return principal
+
+    except (TokenError, ValueError, TypeError) as e:
+        # Only a bad token means "unauthenticated"; database or Redis outages
+        # propagate as 500s instead of logging everyone out.
+        logger.warning(f"[AUTH] Invalid token: {e}")
+    return None
+
+
+async def get_current_user(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+) -> Principal:
+    """
+    Resolve the current user from a Bearer access token.
+
+    The access token is issued by `/api/v1/auth/login`. AuthMiddleware usually
+    resolves the principal already. The whole dependency chain is async, so
+    authenticated requests never hop to the threadpool just to authenticate.
+    """
+    resolved = getattr(request.state, "user", None)
+    if isinstance(resolved, Principal):
+        return resolved
+
+    principal = await resolve_principal(token)
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     if not current_user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -54,7 +123,7 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
     return current_user
 
 
-def require_superuser(current_user: User = Depends(get_current_active_user)) -> User:
+async def require_superuser(current_user: Principal = Depends(get_current_active_user)) -> Principal:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
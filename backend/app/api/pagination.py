@@ -0,0 +1,155 @@
+"""
+Keyset (cursor) pagination for list endpoints
+
+A page is requested with `?limit=&sort=&cursor=`; when more rows follow, the
+response carries an opaque cursor in the `X-Next-Cursor` header. The cursor
+encodes the sort key and id of the last row returned, and the next page starts
+strictly after it, so page N costs the same as page 1 given an index on
+(scope, sort key, id).
+
+`skip` is still honoured (as OFFSET) when no cursor is given, for clients
+written against the old API.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Optional, Sequence
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import tuple_
+
+from app.core.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort: str, key: Sequence[Any]) -> str:
+    raw = json.dumps({"s": sort, "k": list(key)}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode()
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def decode_cursor(cursor: str) -> tuple[str, list[Any]]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        sort, key = data["s"], data["k"]
+        if not isinstance(sort, str) or not isinstance(key, list):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        raise _invalid_cursor()
+    return sort, key
+
+
+def _cursor_value(column: Any, value: Any) -> Any:
+    """
+    A decoded cursor key as a bind value for `column`. Cursors are opaque but
+    not signed, so a value of the wrong JSON type is rejected here rather
+    than failing in the database.
+    """
+    python_type = column.type.python_type
+    if python_type in (datetime, date):
+        # Encoded with str(); back to the type the driver binds
+        if isinstance(value, str):
+            try:
+                return python_type.fromisoformat(value)
+            except ValueError:
+                pass
+    elif isinstance(value, python_type) and isinstance(value, bool) == (python_type is bool):
+        return value
+    raise _invalid_cursor()
+
+
+class PageParams:
+    """
+    One page of a keyset-paginated list.
+
+    `sort` names a non-null model attribute; `id` breaks ties. After the query,
+    `collect()` trims the look-ahead row and sets `next_cursor`.
+    """
+
+    def __init__(self, *, limit: int, sort: str = "id", cursor: Optional[str] = None, skip: int = 0):
+        self.limit = max(1, min(limit, settings.MAX_PAGE_SIZE))
+        self.sort = sort
+        self.after: Optional[list[Any]] = None
+        self.offset = skip
+        if cursor:
+            cursor_sort, self.after = decode_cursor(cursor)
+            expected = 1 if sort == "id" else 2
+            if (
+                cursor_sort != sort
+                or len(self.after) != expected
+                or not isinstance(self.after[-1], int)
+            ):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cursor does not match the requested sort",
+                )
+            # A cursor already encodes the position
+            self.offset = 0
+        self.next_cursor: Optional[str] = None
+
+    def _key(self, model: Any) -> tuple:
+        if self.sort == "id":
+            return (model.id,)
+        return (getattr(model, self.sort), model.id)
+
+    def predicate(self, model: Any) -> Any:
+        """Condition selecting rows after the cursor, or None on the first page"""
+        if self.after is None:
+            return None
+        key = self._key(model)
+        if len(key) == 1:
+            return key[0] > self.after[0]
+        return tuple_(*key) > tuple_(_cursor_value(key[0], self.after[0]), self.after[1])
+
+    def order_by(self, model: Any) -> tuple:
+        return self._key(model)
+
+    def apply(self, stmt: Any, model: Any) -> Any:
+        """Add cursor, ordering and limit (+1 look-ahead row) to a select of `model`"""
+        predicate = self.predicate(model)
+        if predicate is not None:
+            stmt = stmt.where(predicate)
+        stmt = stmt.order_by(*self.order_by(model)).limit(self.limit + 1)
+        if self.offset:
+            stmt = stmt.offset(self.offset)
+        return stmt
+
+    def collect(self, items: list[Any]) -> list[Any]:
+        """Drop the look-ahead row and remember where the next page starts"""
+        if len(items) <= self.limit:
+            self.next_cursor = None
+            return items
+        items = items[: self.limit]
+        last = items[-1]
+        key = [last.id] if self.sort == "id" else [getattr(last, self.sort), last.id]
+        self.next_cursor = encode_cursor(self.sort, key)
+        return items
+
+
+def keyset_page(*sortable: str) -> Callable[..., PageParams]:
+    """Dependency parsing `limit`, `skip`, `sort` and `cursor` for a list endpoint"""
+    allowed = ("id",) + tuple(s for s in sortable if s != "id")
+
+    async def dependency(
+        limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1),
+        skip: int = Query(0, ge=0),
+        sort: str = Query("id", description=f"One of: {', '.join(allowed)}"),
+        cursor: Optional[str] = Query(None, description=f"Value of the previous page's {NEXT_CURSOR_HEADER}"),
+    ) -> PageParams:
+        if sort not in allowed:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot sort by {sort!r}; expected one of {', '.join(allowed)}",
+            )
+        return PageParams(limit=limit, sort=sort, cursor=cursor, skip=skip)
+
+    return dependency
+
+
+def set_next_cursor(response: Response, page: PageParams) -> None:
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
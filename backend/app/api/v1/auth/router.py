@@ -1,37 +1,54 @@
 """
 Authentication router
 """
-from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-
-from app.api.deps import get_db
+from app.api.deps import oauth2_scheme
+from app.db import DBSession, db_dependency, run_db
 from app.api.v1.auth.service import AuthService
+from app.api.v1.users.activity import record_activity
 from app.api.v1.auth.schemas import (
     Token, 
     UserLogin, 
     UserRegister, 
     TokenRefresh, 
-    TokenRefreshResponse
+    TokenRefreshResponse,
+    LogoutRequest,
+)
+from app.core.rate_limit import (
+    account_key,
+    login_account_limiter,
+    login_ip_limiter,
+    refresh_ip_limiter,
+    register_ip_limiter,
 )
 from app.core.security import (
-    create_access_token,
+    REFRESH_TOKEN_EXPIRE_MINUTES,
     create_refresh_token,
+    decode_access_token,
     decode_refresh_token,
     TokenError
 )
+from app.core.token_blacklist import (
+    is_blacklisted,
+    revoke_impersonation_session,
+    revoke_token,
+)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+get_session = db_dependency("auth")
 
-@router.post("/login", response_model=Token)
+
+@router.post("/login", response_model=Token, dependencies=[Depends(login_ip_limiter)])
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
 
-    user = AuthService.authenticate_user(
+    # Throttle per account too, so a botnet cannot spread guesses across IPs.
+    await login_account_limiter.hit(account_key(form_data.username))
+    user = await AuthService.authenticate_user(
         db, email=form_data.username, password=form_data.password
     )
     if not user:
@@ -41,12 +58,11 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Update last login
-    user.last_login = datetime.utcnow()
-    db.commit()
+    # Update last login (flushed to the users table in bulk by Celery beat)
+    await record_activity(user.id, "last_login")
     
     # Create both access and refresh tokens
-    access_token = create_access_token(user)
+    access_token = await AuthService.issue_access_token(db, user)
     refresh_token = create_refresh_token(user)
     
     return {
@@ -56,16 +72,16 @@ async def login(
     }
 
 
-@router.post("/register", response_model=Token)
+@router.post("/register", response_model=Token, dependencies=[Depends(register_ip_limiter)])
 async def register(
     user_data: UserRegister,
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Create new user account
     """
     # Check if user already exists
-    existing_user = AuthService.get_user_by_email(db, user_data.email)
+    existing_user = await run_db(db, AuthService.get_user_by_email, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -73,10 +89,10 @@ async def register(
         )
     
     # Create new user
-    user = AuthService.create_user(db, user_data)
+    user = await AuthService.create_user(db, user_data)
     
     # Create both access and refresh tokens
-    access_token = create_access_token(user)
+    access_token = await AuthService.issue_access_token(db, user)
     refresh_token = create_refresh_token(user)
     
     return {
@@ -86,10 +102,10 @@ async def register(
     }
 
 
-@router.post("/token/refresh", response_model=TokenRefreshResponse)
+@router.post("/token/refresh", response_model=TokenRefreshResponse, dependencies=[Depends(refresh_ip_limiter)])
 async def refresh_token(
     token_data: TokenRefresh,
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Refresh access token using refresh token
@@ -104,12 +120,18 @@ async def refresh_token(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token type"
             )
+
+        if await is_blacklisted(payload):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked"
+            )
         
         # Get user ID from token
         user_id = int(payload.get("sub"))
         
         # Get user from database
-        user = AuthService.get_user_by_id(db, user_id)
+        user = await run_db(db, AuthService.get_user_by_id, user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -123,7 +145,7 @@ async def refresh_token(
             )
         
         # Create new access token
-        access_token = create_access_token(user)
+        access_token = await AuthService.issue_access_token(db, user)
         
         return {
             "access_token": access_token,
@@ -140,3 +162,39 @@ async def refresh_token(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token payload"
         )
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    data: LogoutRequest | None = None,
+    token: str = Depends(oauth2_scheme),
+):
+    """
+    Revoke the presented access token (and refresh token, if given).
+
+    Logging out of an impersonation token ends the whole impersonation session.
+    """
+    try:
+        payload = decode_access_token(token)
+    except TokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid or expired token: {str(e)}",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    await revoke_token(payload)
+    if payload.get("imp_sid"):
+        # Impersonation refresh tokens share the session id but may outlive the
+        # access token, so keep the session revoked for a full refresh lifetime.
+        await revoke_impersonation_session(
+            payload["imp_sid"], float(payload["exp"]) + REFRESH_TOKEN_EXPIRE_MINUTES * 60
+        )
+
+    if data and data.refresh_token:
+        try:
+            await revoke_token(decode_refresh_token(data.refresh_token))
+        except TokenError:
+            # An already expired or foreign refresh token needs no revocation.
+            pass
+    return None
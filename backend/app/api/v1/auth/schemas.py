@@ -28,3 +28,7 @@ class TokenRefresh(BaseModel):
 class TokenRefreshResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: str | None = None
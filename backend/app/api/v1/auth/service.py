@@ -5,25 +5,43 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from app.api.v1.users.models import User
+from app.db import DBSession, run_db
 from app.api.v1.auth.schemas import UserRegister
-from app.core.security import verify_password, get_password_hash
+from app.api.v1.projects.claims import (
+    current_membership_version,
+    encode_project_roles,
+    load_project_roles,
+)
+from app.core.security import (
+    create_access_token,
+    get_password_hash_async,
+    verify_and_update_password_async,
+)
 
 
 class AuthService:
     @staticmethod
-    def authenticate_user(db: Session, email: str, password: str) -> User | None:
+    async def authenticate_user(db: DBSession, email: str, password: str) -> User | None:
         """
         Authenticate user by email and password
+
+        The password check runs on the hashing executor, so this must be awaited.
+        A hash made with an outdated scheme or cost is upgraded in place.
         """
-        user = AuthService.get_user_by_email(db, email)
+        user = await run_db(db, AuthService.get_user_by_email, email)
         if not user:
             return None
         
-        if not verify_password(password, user.hashed_password):
+        verified, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+        if not verified:
             return None
         
         if not user.is_active:
             return None
+
+        if new_hash:
+            user.hashed_password = new_hash
+            await run_db(db, AuthService._save, user)
         
         return user
     
@@ -46,11 +64,11 @@ class AuthService:
         return result.scalar_one_or_none()
     
     @staticmethod
-    def create_user(db: Session, user_data: UserRegister) -> User:
+    async def create_user(db: DBSession, user_data: UserRegister) -> User:
         """
         Create new user
         """
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         user = User(
             email=user_data.email,
             hashed_password=hashed_password,
@@ -58,7 +76,33 @@ class AuthService:
             is_superuser=False,
             date_joined=datetime.utcnow()
         )
+        return await run_db(db, AuthService._save, user)
+
+    @staticmethod
+    def _save(db: Session, user: User) -> User:
         db.add(user)
         db.commit()
-        db.refresh(user)
         return user
+
+    @staticmethod
+    async def issue_access_token(db: DBSession, user: User) -> str:
+        """
+        Create an access token, embedding project role claims when the user
+        has few enough memberships for them to fit
+        """
+        if user.is_superuser:
+            return create_access_token(user)
+
+        # Read the version before the memberships: a change racing with this
+        # login then bumps the version past the one stamped into the token.
+        version = await current_membership_version(user.id)
+        if version is None:
+            return create_access_token(user)
+        roles = await run_db(db, load_project_roles, user_id=user.id)
+        if roles is None:
+            return create_access_token(user)
+        return create_access_token(
+            user,
+            project_roles=encode_project_roles(roles),
+            membership_version=version,
+        )
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.api.v1.projects.models import ProjectMember
+from app.core.config import settings
+from app.core.errors import ServiceUnavailableError
+from app.core.redis import redis_client, redis_sync_client
+
+logger = logging.getLogger(__name__)
+
+# Access tokens may carry the caller's project memberships as
+# {"prj": {"<project_id>": "<role code>"}, "mv": <membership version>}.
+# The claim is trusted only while the user's membership version in Redis still
+# equals "mv"; add/remove/update of a membership bumps it.
+ROLE_CODES = {"owner": "o", "admin": "a", "member": "m", "viewer": "v"}
+_CODE_ROLES = {code: role for role, code in ROLE_CODES.items()}
+
+PROJECT_ROLES_CLAIM = "prj"
+MEMBERSHIP_VERSION_CLAIM = "mv"
+
+
+def _version_key(user_id: int) -> str:
+    return f"auth:membership-version:{user_id}"
+
+
+def encode_project_roles(memberships: dict[int, str]) -> dict[str, str]:
+    return {str(project_id): ROLE_CODES.get(role, role) for project_id, role in memberships.items()}
+
+
+def decode_project_roles(claim: Any) -> Optional[dict[int, str]]:
+    if not isinstance(claim, dict):
+        return None
+    try:
+        return {int(project_id): _CODE_ROLES.get(code, code) for project_id, code in claim.items()}
+    except (TypeError, ValueError):
+        return None
+
+
+def load_project_roles(db: Session, *, user_id: int) -> Optional[dict[int, str]]:
+    """Return the user's memberships, or None when there are too many to embed"""
+    limit = settings.TOKEN_PROJECT_CLAIMS_MAX
+    if limit <= 0:
+        return None
+    stmt = (
+        select(ProjectMember.project_id, ProjectMember.role)
+        .where(ProjectMember.user_id == user_id)
+        .limit(limit + 1)
+    )
+    rows = db.execute(stmt).all()
+    if len(rows) > limit:
+        return None
+    return {row.project_id: row.role for row in rows}
+
+
+async def current_membership_version(user_id: int) -> Optional[int]:
+    """
+    Read the version to stamp into a new token, initialising it if missing.
+
+    The initial value is a timestamp rather than 0 so that a Redis flush can
+    never bring an old version number back to life.
+    """
+    key = _version_key(user_id)
+    try:
+        await redis_client.set(key, time.time_ns(), nx=True)
+        value = await redis_client.get(key)
+    except Exception as e:
+        logger.warning(f"[AUTH] Membership version unavailable for user {user_id}: {e}")
+        return None
+    return int(value) if value is not None else None
+
+
+def membership_version(user_id: int) -> Optional[int]:
+    """Read the current version without initialising it; None if unknown"""
+    try:
+        value = redis_sync_client.get(_version_key(user_id))
+    except Exception as e:
+        logger.warning(f"[AUTH] Membership version unavailable for user {user_id}: {e}")
+        return None
+    return int(value) if value is not None else None
+
+
+async def membership_version_async(user_id: int) -> Optional[int]:
+    """Async variant of `membership_version` for code running on the event loop"""
+    try:
+        value = await redis_client.get(_version_key(user_id))
+    except Exception as e:
+        logger.warning(f"[AUTH] Membership version unavailable for user {user_id}: {e}")
+        return None
+    return int(value) if value is not None else None
+
+
+def bump_membership_version(user_id: int) -> None:
+    """
+    Invalidate project claims in every outstanding token of the user.
+
+    Raises ServiceUnavailableError when Redis cannot be reached: without the
+    bump, stale claims would stay trusted until token expiry, so the write must
+    not look successful. The bump is idempotent and safe to retry.
+    """
+    try:
+        redis_sync_client.incr(_version_key(user_id))
+    except Exception as e:
+        logger.error(f"[AUTH] Failed to bump membership version for user {user_id}: {e}")
+        raise ServiceUnavailableError("Project access could not be updated in issued tokens") from e
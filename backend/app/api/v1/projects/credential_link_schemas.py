@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from pydantic import BaseModel, Field
+
+from app.api.v1.services.models import ServiceCredentialUsage
+
+
+class CredentialLinkCreate(BaseModel):
+    service_instance_id: int = Field(gt=0)
+    credential_id: int = Field(gt=0)
+    usage: ServiceCredentialUsage = ServiceCredentialUsage.default
+
+
+class CredentialLinkDelete(BaseModel):
+    service_instance_id: int = Field(gt=0)
+    credential_id: int = Field(gt=0)
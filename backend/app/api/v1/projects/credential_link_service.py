@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import func, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.api.bulk import error_result
+from app.api.v1.projects.access import ProjectAccess, WRITE
+from app.api.v1.projects.credential_link_schemas import CredentialLinkCreate, CredentialLinkDelete
+from app.api.v1.projects.models import Credential
+from app.api.v1.services.models import ServiceInstance, ServiceInstanceCredential
+from app.core.config import settings
+from app.core.principal_cache import Principal
+from app.db.session import awaitable
+
+
+class CredentialLinkService:
+    """Attach / detach credentials to service instances of one project, in bulk"""
+
+    @staticmethod
+    def _validate(
+        db: Session,
+        project_id: int,
+        items: list[tuple[int, CredentialLinkCreate | CredentialLinkDelete]],
+    ) -> tuple[list[tuple[int, Any]], list[dict[str, Any]]]:
+        # One query per side: both ends of every pair must belong to the project.
+        service_ids = {data.service_instance_id for _, data in items}
+        credential_ids = {data.credential_id for _, data in items}
+        known_services = set(
+            db.execute(
+                select(ServiceInstance.id).where(
+                    ServiceInstance.id.in_(service_ids), ServiceInstance.project_id == project_id
+                )
+            ).scalars()
+        ) if service_ids else set()
+        known_credentials = set(
+            db.execute(
+                select(Credential.id).where(
+                    Credential.id.in_(credential_ids), Credential.project_id == project_id
+                )
+            ).scalars()
+        ) if credential_ids else set()
+
+        valid: list[tuple[int, Any]] = []
+        errors: list[dict[str, Any]] = []
+        seen: dict[tuple[int, int], int] = {}
+        for index, data in items:
+            pair = (data.service_instance_id, data.credential_id)
+            if data.service_instance_id not in known_services:
+                errors.append(error_result(index, "Service instance not found"))
+            elif data.credential_id not in known_credentials:
+                errors.append(error_result(index, "Credential not found"))
+            elif pair in seen:
+                errors.append(error_result(index, f"Duplicate pair in request (item {seen[pair]})"))
+            else:
+                seen[pair] = index
+                valid.append((index, data))
+        return valid, errors
+
+    @staticmethod
+    def attach(
+        db: Session,
+        *,
+        project_id: int,
+        items: list[tuple[int, CredentialLinkCreate]],
+        user: Principal | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Link credentials to service instances; an existing pair gets its usage
+        updated. All pairs are written in one transaction.
+        """
+        ProjectAccess.require(db, project_id=project_id, user=user, min_role=WRITE)
+        valid, results = CredentialLinkService._validate(db, project_id, items)
+        index_by_pair = {(data.service_instance_id, data.credential_id): index for index, data in valid}
+
+        table = ServiceInstanceCredential.__table__
+        chunk_size = settings.BULK_CHUNK_SIZE
+        try:
+            for start in range(0, len(valid), chunk_size):
+                chunk = valid[start:start + chunk_size]
+                stmt = pg_insert(table).values([
+                    {
+                        "service_instance_id": data.service_instance_id,
+                        "credential_id": data.credential_id,
+                        "usage": data.usage,
+                    }
+                    for _, data in chunk
+                ])
+                stmt = stmt.on_conflict_do_update(
+                    constraint="uq_service_instance_credential_pair",
+                    set_={"usage": stmt.excluded.usage, "updated_at": func.now()},
+                    # Leave identical links alone; they are reported as unchanged.
+                    where=table.c.usage.is_distinct_from(stmt.excluded.usage),
+                ).returning(
+                    table.c.id,
+                    table.c.service_instance_id,
+                    table.c.credential_id,
+                    literal_column("xmax = 0").label("inserted"),
+                )
+                written = set()
+                for row in db.execute(stmt):
+                    pair = (row.service_instance_id, row.credential_id)
+                    written.add(pair)
+                    results.append({
+                        "index": index_by_pair[pair],
+                        "status": "created" if row.inserted else "updated",
+                        "id": row.id,
+                        "detail": None,
+                    })
+                for index, data in chunk:
+                    if (data.service_instance_id, data.credential_id) not in written:
+                        results.append({"index": index, "status": "unchanged", "id": None, "detail": None})
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return results
+
+    @staticmethod
+    def detach(
+        db: Session,
+        *,
+        project_id: int,
+        items: list[tuple[int, CredentialLinkDelete]],
+        user: Principal | None = None,
+    ) -> list[dict[str, Any]]:
+        """Remove links in one transaction; pairs that were not linked are reported as unchanged"""
+        ProjectAccess.require(db, project_id=project_id, user=user, min_role=WRITE)
+        valid, results = CredentialLinkService._validate(db, project_id, items)
+        index_by_pair = {(data.service_instance_id, data.credential_id): index for index, data in valid}
+
+        table = ServiceInstanceCredential.__table__
+        pair_columns = tuple_(table.c.service_instance_id, table.c.credential_id)
+        chunk_size = settings.BULK_CHUNK_SIZE
+        pairs = list(index_by_pair)
+        deleted = set()
+        try:
+            for start in range(0, len(pairs), chunk_size):
+                stmt = (
+                    table.delete()
+                    .where(pair_columns.in_(pairs[start:start + chunk_size]))
+                    .returning(table.c.id, table.c.service_instance_id, table.c.credential_id)
+                )
+                for row in db.execute(stmt):
+                    pair = (row.service_instance_id, row.credential_id)
+                    deleted.add(pair)
+                    results.append({"index": index_by_pair[pair], "status": "deleted", "id": row.id, "detail": None})
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        for pair in pairs:
+            if pair not in deleted:
+                results.append({"index": index_by_pair[pair], "status": "unchanged", "id": None, "detail": "Not linked"})
+        return results
+
+
+class AsyncCredentialLinkService:
+    """CredentialLinkService for async handlers; accepts a sync Session or an AsyncSession"""
+
+    attach = awaitable(CredentialLinkService.attach)
+    detach = awaitable(CredentialLinkService.detach)
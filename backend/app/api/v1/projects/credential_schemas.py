@@ -31,9 +31,10 @@ class CredentialRead(BaseModel):
 
     id: int
     project_id: int
-    kind: str
+    kind: CredentialKind
     secret_ref: str
     expires_at: Optional[datetime] = None
-    metadata: Optional[dict] = Field(default=None, alias="metadata_")
+    # Read from the ORM attribute, rendered as "metadata"
+    metadata: Optional[dict] = Field(default=None, validation_alias="metadata_")
     created_at: datetime
     updated_at: Optional[datetime] = None
@@ -1,45 +1,77 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+from typing import Any
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
-from app.api.v1.projects.models import Credential, Project
+from app.api.pagination import PageParams
+from app.api.v1.projects.access import ProjectAccess, READ, WRITE
+from app.api.v1.projects.etags import bump_collection_version
+from app.api.v1.projects.models import Credential
 from app.api.v1.projects.credential_schemas import CredentialCreate, CredentialUpdate
-from app.api.v1.projects.service import ProjectService
-from app.api.v1.users.models import User
+from app.core.config import settings
+from app.core.errors import NotFoundError
+from app.core.principal_cache import Principal
+from app.db.session import after_commit, awaitable
+
+# CredentialRead's fields, for list endpoints serializing rows directly
+CREDENTIAL_READ_COLUMNS = (
+    Credential.id,
+    Credential.project_id,
+    Credential.kind,
+    Credential.secret_ref,
+    Credential.expires_at,
+    Credential.metadata_.label("metadata"),
+    Credential.created_at,
+    Credential.updated_at,
+)
 
 
 class CredentialService:
     @staticmethod
-    def list(db: Session, *, project_id: int, user: User | None = None) -> list[Credential]:
-        # Check if user has access to this project
-        project = ProjectService.get(db, project_id=project_id, user=user)
-        if not project:
-            return []
-        
-        stmt = select(Credential).where(Credential.project_id == project_id).order_by(Credential.id)
-        return list(db.execute(stmt).scalars().all())
+    def list(
+        db: Session,
+        *,
+        project_id: int,
+        user: Principal | None = None,
+        page: PageParams | None = None,
+    ) -> list[Any]:
+        """Rows of CREDENTIAL_READ_COLUMNS"""
+        return ProjectAccess.fetch_all(
+            db,
+            Credential,
+            project_id=project_id,
+            user=user,
+            order_by=Credential.id,
+            page=page,
+            columns=CREDENTIAL_READ_COLUMNS,
+        )
 
     @staticmethod
-    def get(db: Session, *, project_id: int, credential_id: int, user: User | None = None) -> Credential | None:
-        # Check if user has access to this project
-        project = ProjectService.get(db, project_id=project_id, user=user)
-        if not project:
-            return None
-        
-        stmt = select(Credential).where(
-            Credential.id == credential_id,
-            Credential.project_id == project_id
+    def get(
+        db: Session,
+        *,
+        project_id: int,
+        credential_id: int,
+        user: Principal | None = None,
+        min_role: str = READ,
+    ) -> Credential:
+        return ProjectAccess.fetch_one(
+            db,
+            Credential,
+            project_id=project_id,
+            resource_id=credential_id,
+            user=user,
+            min_role=min_role,
+            not_found="Credential not found",
         )
-        return db.execute(stmt).scalar_one_or_none()
 
     @staticmethod
-    def create(db: Session, *, project_id: int, data: CredentialCreate, user: User | None = None) -> Credential:
-        # Check if user has access to this project
-        project = ProjectService.get(db, project_id=project_id, user=user)
-        if not project:
-            raise ValueError("Project not found or access denied")
-        
+    def create(db: Session, *, project_id: int, data: CredentialCreate, user: Principal | None = None) -> Credential:
+        ProjectAccess.require(db, project_id=project_id, user=user, min_role=WRITE)
+
         credential = Credential(
             project_id=project_id,
             kind=data.kind,
@@ -48,36 +80,103 @@ class CredentialService:
             metadata_=data.metadata
         )
         db.add(credential)
+        # id and created_at come back from the INSERT's RETURNING clause
         db.commit()
-        db.refresh(credential)
+        after_commit(db, bump_collection_version, project_id)
         return credential
 
     @staticmethod
-    def update(db: Session, *, project_id: int, credential_id: int, data: CredentialUpdate, user: User | None = None) -> Credential:
-        # Check if user has access to this project
-        credential = CredentialService.get(db, project_id=project_id, credential_id=credential_id, user=user)
-        if not credential:
-            raise ValueError("Credential not found or access denied")
-        
-        if data.kind is not None:
-            credential.kind = data.kind
-        if data.secret_ref is not None:
-            credential.secret_ref = data.secret_ref
-        if data.expires_at is not None:
-            credential.expires_at = data.expires_at
-        if data.metadata is not None:
-            credential.metadata_ = data.metadata
-        
-        db.add(credential)
+    def bulk_create(
+        db: Session,
+        *,
+        project_id: int,
+        items: list[tuple[int, CredentialCreate]],
+        user: Principal | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Insert many credentials with batched INSERT ... RETURNING, in chunks of
+        BULK_CHUNK_SIZE, in a single transaction. `items` are (index, data) pairs.
+        """
+        ProjectAccess.require(db, project_id=project_id, user=user, min_role=WRITE)
+
+        table = Credential.__table__
+        results: list[dict[str, Any]] = []
+        chunk_size = settings.BULK_CHUNK_SIZE
+        try:
+            for start in range(0, len(items), chunk_size):
+                chunk = items[start:start + chunk_size]
+                # RETURNING order is unspecified; sort_by_parameter_order makes
+                # SQLAlchemy correlate the ids back to the parameter sets.
+                stmt = pg_insert(table).returning(table.c.id, sort_by_parameter_order=True)
+                ids = db.execute(stmt, [
+                    {
+                        "project_id": project_id,
+                        "kind": data.kind.value,
+                        "secret_ref": data.secret_ref,
+                        "expires_at": data.expires_at,
+                        "metadata": data.metadata,
+                    }
+                    for _, data in chunk
+                ]).scalars().all()
+                for (index, _), credential_id in zip(chunk, ids):
+                    results.append({"index": index, "status": "created", "id": credential_id, "detail": None})
+            db.commit()
+            after_commit(db, bump_collection_version, project_id)
+        except Exception:
+            db.rollback()
+            raise
+        return results
+
+    @staticmethod
+    def update(db: Session, *, project_id: int, credential_id: int, data: CredentialUpdate, user: Principal | None = None) -> Credential:
+        values = {
+            attr: value
+            for attr, value in (
+                (Credential.kind, data.kind),
+                (Credential.secret_ref, data.secret_ref),
+                (Credential.expires_at, data.expires_at),
+                (Credential.metadata_, data.metadata),
+            )
+            if value is not None
+        }
+        if not values:
+            return CredentialService.get(db, project_id=project_id, credential_id=credential_id, user=user)
+
+        ProjectAccess.require(db, project_id=project_id, user=user, min_role=WRITE)
+        stmt = (
+            update(Credential)
+            .where(Credential.id == credential_id, Credential.project_id == project_id)
+            .values(values)
+            .returning(Credential)
+        )
+        credential = db.execute(stmt).scalar_one_or_none()
+        if credential is None:
+            raise NotFoundError("Credential not found")
         db.commit()
-        db.refresh(credential)
+        after_commit(db, bump_collection_version, project_id)
         return credential
 
     @staticmethod
-    def delete(db: Session, *, project_id: int, credential_id: int, user: User | None = None) -> None:
-        credential = CredentialService.get(db, project_id=project_id, credential_id=credential_id, user=user)
-        if not credential:
-            raise ValueError("Credential not found or access denied")
-        
-        db.delete(credential)
+    def delete(db: Session, *, project_id: int, credential_id: int, user: Principal | None = None) -> None:
+        ProjectAccess.require(db, project_id=project_id, user=user, min_role=WRITE)
+        # Links go with the row through ON DELETE CASCADE; no need to load them
+        stmt = (
+            delete(Credential)
+            .where(Credential.id == credential_id, Credential.project_id == project_id)
+            .returning(Credential.id)
+        )
+        if db.execute(stmt).scalar_one_or_none() is None:
+            raise NotFoundError("Credential not found")
         db.commit()
+        after_commit(db, bump_collection_version, project_id)
+
+
+class AsyncCredentialService:
+    """CredentialService for async handlers; accepts a sync Session or an AsyncSession"""
+
+    list = awaitable(CredentialService.list)
+    get = awaitable(CredentialService.get)
+    create = awaitable(CredentialService.create)
+    bulk_create = awaitable(CredentialService.bulk_create)
+    update = awaitable(CredentialService.update)
+    delete = awaitable(CredentialService.delete)
@@ -0,0 +1,70 @@
+"""
+Background deletion of large projects
+
+A single DELETE of a project with tens of thousands of services cascades
+through every child row in one long transaction. Above
+PROJECT_DELETE_ASYNC_THRESHOLD children the API hands the work to a Celery job
+instead (app.tasks.delete_project). The job deletes children in batches of
+PROJECT_DELETE_BATCH_SIZE, one short transaction each, and the project row
+last. The Celery task id is the job handle clients poll.
+
+A Redis key per project makes queuing idempotent: a second DELETE while a job
+is pending returns the same job id.
+"""
+import logging
+from typing import Any
+from uuid import uuid4
+
+from app.celery import celery_app
+from app.core.redis import redis_sync_client
+
+logger = logging.getLogger(__name__)
+
+# Outlives the Celery hard time limit, so a killed worker cannot block
+# deletion forever
+_GUARD_SECONDS = 2 * 60 * 60
+
+
+def _guard_key(project_id: int) -> str:
+    return f"projects:deleting:{project_id}"
+
+
+def start_deletion(project_id: int) -> str:
+    """Queue the deletion job and return its id, or the id of the one already queued"""
+    from app.tasks import delete_project
+
+    key = _guard_key(project_id)
+    job_id = str(uuid4())
+    # The guard can expire between a failed SET NX and the GET; try again then
+    while not redis_sync_client.set(key, job_id, nx=True, ex=_GUARD_SECONDS):
+        existing = redis_sync_client.get(key)
+        if existing:
+            return existing
+    try:
+        delete_project.apply_async(args=[project_id], task_id=job_id)
+    except Exception:
+        # Never queued: do not hand this job id to the next caller
+        redis_sync_client.delete(key)
+        raise
+    logger.info(f"[PROJECTS] queued deletion of project {project_id} as job {job_id}")
+    return job_id
+
+
+def finish_deletion(project_id: int) -> None:
+    try:
+        redis_sync_client.delete(_guard_key(project_id))
+    except Exception as e:
+        logger.warning(f"[PROJECTS] could not clear deletion guard of project {project_id}: {e}")
+
+
+def deletion_status(job_id: str) -> dict[str, Any]:
+    result = celery_app.AsyncResult(job_id)
+    state = result.state
+    info = result.info if isinstance(result.info, dict) else {}
+    return {
+        "job_id": job_id,
+        "status": "queued" if state == "PENDING" else state.lower(),
+        "project_id": info.get("project_id"),
+        "deleted": info.get("deleted"),
+        "error": str(result.info) if state == "FAILURE" else None,
+    }
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from typing import Optional
+
+from fastapi import Depends, Request, Response
+
+from app.api.deps import get_current_active_user
+from app.core.errors import NotModifiedError
+from app.core.principal_cache import Principal
+from app.core.redis import redis_client, redis_sync_client
+from app.db.session import DBSession, served_from_replica
+
+logger = logging.getLogger(__name__)
+
+# Every project has a collection version in Redis, bumped after each committed
+# write to its services or credentials. GETs of those collections carry an
+# ETag derived from it, and a matching If-None-Match is answered with 304
+# before any database work.
+#
+# The version is read before the handler queries, so data tagged with a version
+# is never older than that version. Reads served by a lagging replica could be,
+# so they get no ETag.
+
+
+def _version_key(project_id: int) -> str:
+    return f"projects:collection-version:{project_id}"
+
+
+async def current_collection_version(project_id: int) -> Optional[int]:
+    """
+    Read the project's collection version, initialising it if missing.
+
+    Like the membership version, it starts at a timestamp so that a Redis flush
+    cannot bring back a version an old ETag was built from.
+    """
+    key = _version_key(project_id)
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.set(key, time.time_ns(), nx=True)
+            pipe.get(key)
+            _, value = await pipe.execute()
+    except Exception as e:
+        logger.warning(f"[PROJECTS] Collection version unavailable for project {project_id}: {e}")
+        return None
+    return int(value) if value is not None else None
+
+
+def bump_collection_version(project_id: int) -> None:
+    """Invalidate every ETag issued for the project's collections"""
+    try:
+        redis_sync_client.incr(_version_key(project_id))
+    except Exception as e:
+        # Without the bump, clients keep getting 304 for data that has changed
+        logger.error(f"[PROJECTS] Failed to bump collection version for project {project_id}: {e}")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header value matches `etag`"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # If-None-Match uses the weak comparison
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _authorized_without_db(user: Principal, project_id: int) -> bool:
+    # Only answer 304 when access is known without a query; anyone else takes
+    # the normal path, which checks membership.
+    return user.is_superuser or (user.project_roles is not None and project_id in user.project_roles)
+
+
+async def collection_etag(
+    request: Request,
+    project_id: int,
+    current_user: Principal = Depends(get_current_active_user),
+) -> Optional[str]:
+    """
+    Dependency for project-scoped GETs. Returns the ETag for this URL, or raises
+    NotModifiedError (304) when If-None-Match matches it. Issues no SQL.
+    Declare it before the session dependency.
+    """
+    version = await current_collection_version(project_id)
+    if version is None:
+        return None
+    raw = f"{version}:{request.url.path}?{request.url.query}".encode()
+    etag = f'"{hashlib.sha256(raw).hexdigest()[:32]}"'
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _authorized_without_db(current_user, project_id) and etag_matches(if_none_match, etag):
+        raise NotModifiedError(headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    return etag
+
+
+def set_collection_etag(response: Response, etag: Optional[str], db: DBSession) -> None:
+    if etag is None or served_from_replica(db):
+        return
+    response.headers["ETag"] = etag
+    # Clients may keep the body but must revalidate before using it
+    response.headers["Cache-Control"] = "private, no-cache"
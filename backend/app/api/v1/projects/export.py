@@ -0,0 +1,211 @@
+"""
+Streaming export of a project's inventory
+
+`GET /projects/{id}/export` writes the project with its environments, service
+instances, credentials (the fields the API lists; no secrets) and members as
+NDJSON, one record per line tagged with "type", or one of those resources as
+CSV. Rows are read through server-side cursors (yield_per) inside a single
+REPEATABLE READ transaction. The sections therefore form one consistent
+snapshot, and memory stays flat however large the project is: at most
+EXPORT_BATCH_SIZE rows and one output chunk are held at a time. With
+compress=gzip the stream is gzipped as it is produced.
+
+The export opens its own session, since the request's session is closed
+before a streaming body is sent. That session holds one of the process' sync
+pool connections for as long as the download runs, so at most
+EXPORT_MAX_CONCURRENT exports (and never more than half of the sync pool)
+stream at once per process; further requests get a 503. When the client goes
+away mid-stream, the export is closed right away, releasing its connection
+and snapshot, instead of whenever the abandoned generator is collected.
+"""
+import csv
+import io
+import logging
+import threading
+import zlib
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Iterable, Iterator, Optional, Sequence
+
+import anyio
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.types import Receive, Scope, Send
+
+from app.api.responses import ORJSON_OPTIONS
+from app.api.v1.projects.credential_service import CREDENTIAL_READ_COLUMNS
+from app.api.v1.projects.models import Credential, Environment, Project, ProjectMember
+from app.api.v1.projects.service import MEMBER_READ_COLUMNS
+from app.api.v1.projects.service_instance_service import SERVICE_INSTANCE_READ_COLUMNS
+from app.api.v1.services.models import ServiceInstance
+from app.core.config import settings
+from app.core.errors import ServiceUnavailableError
+from app.db import SessionLocal
+from app.db.pool import engine_budget
+
+logger = logging.getLogger(__name__)
+
+PROJECT_EXPORT_COLUMNS = (
+    Project.id,
+    Project.code,
+    Project.display_name,
+    Project.kind,
+    Project.created_at,
+    Project.updated_at,
+)
+ENVIRONMENT_EXPORT_COLUMNS = (
+    Environment.id,
+    Environment.project_id,
+    Environment.code,
+    Environment.display_name,
+    Environment.created_at,
+    Environment.updated_at,
+)
+
+# resource -> (record type, model, columns), in export order
+RESOURCES = {
+    "environments": ("environment", Environment, ENVIRONMENT_EXPORT_COLUMNS),
+    "services": ("service", ServiceInstance, SERVICE_INSTANCE_READ_COLUMNS),
+    "credentials": ("credential", Credential, CREDENTIAL_READ_COLUMNS),
+    "members": ("member", ProjectMember, MEMBER_READ_COLUMNS),
+}
+
+_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+_export_slots = threading.BoundedSemaphore(
+    max(1, min(settings.EXPORT_MAX_CONCURRENT, engine_budget("sync") // 2))
+)
+
+
+class ExportsBusyError(ServiceUnavailableError):
+    detail = "Too many exports in progress, please retry"
+
+
+def _stream(db: Session, stmt: Any) -> Iterator[Any]:
+    return iter(db.execute(stmt.execution_options(yield_per=settings.EXPORT_BATCH_SIZE)))
+
+
+def _sections(
+    db: Session, project_id: int, resource: Optional[str]
+) -> Iterator[tuple[str, Sequence[Any], Iterator[Any]]]:
+    """(record type, columns, rows) for each exported section"""
+    if resource is None:
+        stmt = select(*PROJECT_EXPORT_COLUMNS).where(Project.id == project_id)
+        yield "project", PROJECT_EXPORT_COLUMNS, _stream(db, stmt)
+    for name, (record_type, model, columns) in RESOURCES.items():
+        if resource is None or resource == name:
+            stmt = select(*columns).where(model.project_id == project_id).order_by(model.id)
+            yield record_type, columns, _stream(db, stmt)
+
+
+def _ndjson(sections: Iterable[tuple[str, Sequence[Any], Iterator[Any]]]) -> Iterator[bytes]:
+    option = ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE
+    for record_type, _, rows in sections:
+        for row in rows:
+            yield orjson.dumps({"type": record_type, **row._mapping}, option=option)
+
+
+def _csv_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value).decode()
+    return value
+
+
+def _csv(sections: Iterable[tuple[str, Sequence[Any], Iterator[Any]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for _, columns, rows in sections:
+        fields = [column.key for column in columns]
+        writer.writerow(fields)
+        for row in rows:
+            mapping = row._mapping
+            writer.writerow([_csv_cell(mapping[field]) for field in fields])
+            # Hand over one line at a time; _chunked batches them
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _chunked(parts: Iterable[bytes]) -> Iterator[bytes]:
+    """Group small encoded records into chunks of about EXPORT_CHUNK_BYTES"""
+    pending: list[bytes] = []
+    size = 0
+    for part in parts:
+        pending.append(part)
+        size += len(part)
+        if size >= settings.EXPORT_CHUNK_BYTES:
+            yield b"".join(pending)
+            pending.clear()
+            size = 0
+    if pending:
+        yield b"".join(pending)
+
+
+def _gzipped(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def generate_export(project_id: int, *, fmt: str, resource: Optional[str], compress: Optional[str]) -> Iterator[bytes]:
+    """Body of an export; access must already have been checked"""
+    db = SessionLocal()
+    try:
+        # One snapshot for every section, on the primary
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True})
+        sections = _sections(db, project_id, resource)
+        chunks = _chunked(_ndjson(sections) if fmt == "ndjson" else _csv(sections))
+        yield from _gzipped(chunks) if compress == "gzip" else chunks
+    except Exception:
+        # Headers are already sent; the client sees a truncated body
+        logger.exception(f"[PROJECTS] Export of project {project_id} failed")
+        raise
+    finally:
+        db.close()
+
+
+class ExportResponse(StreamingResponse):
+    """Streams an export holding an export slot, and closes it however the stream ends"""
+
+    def __init__(self, content: Iterator[bytes], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self._export = content
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Starlette abandons the iterator when the client disconnects;
+            # closing it runs generate_export's cleanup (rollback, connection
+            # back to the pool) now. Shielded: this also runs on cancellation.
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(self._export.close)
+            _export_slots.release()
+
+
+def export_response(project_id: int, *, fmt: str, resource: Optional[str], compress: Optional[str]) -> StreamingResponse:
+    filename = f"project-{project_id}{f'-{resource}' if resource else ''}.{fmt}"
+    media_type = _MEDIA_TYPES[fmt]
+    if compress == "gzip":
+        filename += ".gz"
+        media_type = "application/gzip"
+    if not _export_slots.acquire(blocking=False):
+        raise ExportsBusyError(headers={"Retry-After": "5"})
+    return ExportResponse(
+        generate_export(project_id, fmt=fmt, resource=resource, compress=compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
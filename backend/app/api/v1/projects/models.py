@@ -4,7 +4,7 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional
 
-from sqlalchemy import DateTime, ForeignKey, String, Text, UniqueConstraint, text
+from sqlalchemy import DateTime, ForeignKey, Index, String, Text, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.associationproxy import association_proxy
@@ -19,6 +19,9 @@ class ProjectMember(BaseModel):
     __tablename__ = "project_members"
     __table_args__ = (
         UniqueConstraint("project_id", "user_id", name="uq_project_member_project_user"),
+        # keyset pagination of a project's members / of a user's projects
+        Index("ix_project_members_project_id_id", "project_id", "id"),
+        Index("ix_project_members_user_id_project_id", "user_id", "project_id"),
     )
 
     project_id: Mapped[int] = mapped_column(
@@ -36,6 +39,10 @@ class ProjectMember(BaseModel):
     project: Mapped["Project"] = relationship(back_populates="memberships")
     user: Mapped["User"] = relationship(back_populates="project_memberships")
 
+    @property
+    def user_email(self) -> Optional[str]:
+        return self.user.email if self.user else None
+
     def __repr__(self) -> str:
         return (
             f"<ProjectMember id={self.id} project_id={self.project_id} "
@@ -51,18 +58,20 @@ class Project(BaseModel):
     kind: Mapped[Optional[str]] = mapped_column(String(32), nullable=True, index=True)
     display_name: Mapped[str] = mapped_column(String(255), nullable=False)
 
+    # Children go with the project through ON DELETE CASCADE (passive_deletes);
+    # the ORM never loads them just to delete them
     environments: Mapped[list["Environment"]] = relationship(
-        back_populates="project", cascade="all, delete-orphan"
+        back_populates="project", cascade="all, delete-orphan", passive_deletes=True
     )
     memberships: Mapped[list["ProjectMember"]] = relationship(
-        back_populates="project", cascade="all, delete-orphan"
+        back_populates="project", cascade="all, delete-orphan", passive_deletes=True
     )
     users = association_proxy("memberships", "user")
     service_instances: Mapped[list["ServiceInstance"]] = relationship(
-        back_populates="project", cascade="all, delete-orphan"
+        back_populates="project", cascade="all, delete-orphan", passive_deletes=True
     )
     credentials: Mapped[list["Credential"]] = relationship(
-        back_populates="project", cascade="all, delete-orphan"
+        back_populates="project", cascade="all, delete-orphan", passive_deletes=True
     )
 
     def __repr__(self) -> str:
@@ -82,8 +91,9 @@ class Environment(BaseModel):
     display_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
 
     project: Mapped["Project"] = relationship(back_populates="environments")
+    # environment_id is ON DELETE SET NULL; let the database do it
     service_instances: Mapped[list["ServiceInstance"]] = relationship(
-        back_populates="environment"
+        back_populates="environment", passive_deletes=True
     )
 
     def __repr__(self) -> str:
@@ -101,6 +111,10 @@ class CredentialKind(str, Enum):
 class Credential(BaseModel):
 
     __tablename__ = "credentials"
+    __table_args__ = (
+        # keyset pagination within a project
+        Index("ix_credentials_project_id_id", "project_id", "id"),
+    )
 
     project_id: Mapped[int] = mapped_column(
         ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True
@@ -117,7 +131,7 @@ class Credential(BaseModel):
 
     project: Mapped["Project"] = relationship(back_populates="credentials")
     service_links: Mapped[list["ServiceInstanceCredential"]] = relationship(
-        back_populates="credential", cascade="all, delete-orphan"
+        back_populates="credential", cascade="all, delete-orphan", passive_deletes=True
     )
 
     def __repr__(self) -> str:
@@ -1,13 +1,24 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
 from sqlalchemy import select
 
-from app.api.deps import get_db, get_current_active_user, require_superuser
+from app.api.deps import get_current_active_user, require_superuser
+from app.api.bulk import BulkResult, bulk_result, read_bulk_items
+from app.api.pagination import PageParams, keyset_page, set_next_cursor
+from app.api.responses import rows_response
+from app.db import DBSession, db_dependency, run_db
+from app.db.query_stats import query_budget
 from app.api.v1.users.models import User
+from app.core.principal_cache import Principal
 from app.api.v1.projects.schemas import (
     ProjectCreate,
+    ProjectDeletionJob,
     ProjectRead,
     ProjectUpdate,
     ProjectMemberCreate,
@@ -18,175 +29,199 @@ from app.api.v1.projects.credential_schemas import (
     CredentialRead,
     CredentialUpdate,
 )
+from app.api.v1.projects.credential_link_schemas import CredentialLinkCreate, CredentialLinkDelete
 from app.api.v1.projects.service_schemas import (
     ServiceInstanceCreate,
     ServiceInstanceRead,
     ServiceInstanceUpdate,
 )
-from app.api.v1.projects.service import ProjectService
-from app.api.v1.projects.credential_service import CredentialService
-from app.api.v1.projects.service_instance_service import ServiceInstanceService
-from app.api.v1.projects.models import ProjectMember
+from app.api.v1.projects.access import ProjectAccess
+from app.api.v1.projects.deletion import deletion_status, start_deletion
+from app.api.v1.projects.etags import collection_etag, set_collection_etag
+from app.api.v1.projects.export import export_response
+from app.api.v1.projects.service import MEMBER_READ_COLUMNS, AsyncProjectService
+from app.api.v1.projects.credential_service import CREDENTIAL_READ_COLUMNS, AsyncCredentialService
+from app.api.v1.projects.credential_link_service import AsyncCredentialLinkService
+from app.api.v1.projects.service_instance_service import SERVICE_INSTANCE_READ_COLUMNS, AsyncServiceInstanceService
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
+get_session = db_dependency("projects")
+
+# Query budgets below include the principal lookup on a cache miss (one
+# statement); see app.db.query_stats.
+
 
 @router.get("", response_model=list[ProjectRead])
-def list_projects(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+@query_budget(2)
+async def list_projects(
+    response: Response,
+    page: PageParams = Depends(keyset_page("id", "code")),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    return ProjectService.list(db, skip=skip, limit=limit, user=current_user)
+    projects = await AsyncProjectService.list(db, user=current_user, page=page)
+    set_next_cursor(response, page)
+    return projects
+
+
+def _active_users(db: Session) -> list[dict]:
+    stmt = select(User.id, User.email).where(User.is_active == True).order_by(User.email)
+    return [{"id": row.id, "email": row.email} for row in db.execute(stmt)]
 
 
 @router.get("/users", response_model=list[dict])
-def list_users(
-    db: Session = Depends(get_db),
-    _: User = Depends(require_superuser),
+@query_budget(2)
+async def list_users(
+    db: DBSession = Depends(get_session),
+    _: Principal = Depends(require_superuser),
 ):
     """List all users for selecting members"""
-    stmt = select(User).where(User.is_active == True).order_by(User.email)
-    users = list(db.execute(stmt).scalars().all())
-    return [{"id": user.id, "email": user.email} for user in users]
+    return await run_db(db, _active_users)
+
+
+@router.get("/jobs/{job_id}", response_model=ProjectDeletionJob)
+async def get_project_job(
+    job_id: str,
+    _: Principal = Depends(require_superuser),
+):
+    """Status of a background project deletion"""
+    return await run_in_threadpool(deletion_status, job_id)
 
 
 @router.get("/{project_id}", response_model=ProjectRead)
-def get_project(
+@query_budget(2)
+async def get_project(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    project = ProjectService.get(db, project_id=project_id, user=current_user)
-    if not project:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
-    return project
+    return await AsyncProjectService.get(db, project_id=project_id, user=current_user)
 
 
 @router.post("", response_model=ProjectRead, status_code=status.HTTP_201_CREATED)
-def create_project(
+@query_budget(2)
+async def create_project(
     data: ProjectCreate,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_superuser),  # only admin can add
+    db: DBSession = Depends(get_session),
+    _: Principal = Depends(require_superuser),  # only admin can add
 ):
-    existing = ProjectService.get_by_code(db, code=data.code)
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Project code already exists",
-        )
-    return ProjectService.create(db, data=data)
+    try:
+        return await AsyncProjectService.create(db, data=data)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
 
 
 @router.patch("/{project_id}", response_model=ProjectRead)
-def update_project(
+@query_budget(3)
+async def update_project(
     project_id: int,
     data: ProjectUpdate,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_superuser),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(require_superuser),
 ):
-    project = ProjectService.get(db, project_id=project_id)
-    if not project:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
-
-    if data.code is not None:
-        existing = ProjectService.get_by_code(db, code=data.code)
-        if existing and existing.id != project_id:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Project code already exists",
-            )
-
-    return ProjectService.update(db, project=project, data=data)
+    project = await AsyncProjectService.get(db, project_id=project_id, user=current_user)
+    try:
+        return await AsyncProjectService.update(db, project=project, data=data)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.delete(
+    "/{project_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={
+        status.HTTP_202_ACCEPTED: {
+            "model": ProjectDeletionJob,
+            "description": "Large project: deletion continues in the background",
+        },
+    },
+)
+@query_budget(4)
+async def delete_project(
+    project_id: int,
+    request: Request,
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(require_superuser),
+):
+    await AsyncProjectService.get(db, project_id=project_id, user=current_user)
+    if await AsyncProjectService.is_large(db, project_id=project_id):
+        job_id = await run_in_threadpool(start_deletion, project_id)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"job_id": job_id, "status": "queued", "project_id": project_id},
+            headers={"Location": str(request.url_for("get_project_job", job_id=job_id))},
+        )
+    await AsyncProjectService.delete(db, project_id=project_id)
+    return None
 
 
-@router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_project(
+@router.get("/{project_id}/export", response_class=StreamingResponse)
+async def export_project(
     project_id: int,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_superuser),
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    resource: Optional[Literal["environments", "services", "credentials", "members"]] = Query(
+        None, description="Export only this resource; required for CSV"
+    ),
+    compress: Optional[Literal["gzip"]] = Query(None),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    project = ProjectService.get(db, project_id=project_id)
-    if not project:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
-    ProjectService.delete(db, project=project)
-    return None
+    """
+    Stream the project's full inventory.
+
+    NDJSON carries the project, environments, services, credentials and
+    members, one record per line with a "type" field; CSV carries one
+    resource. Memory use does not grow with the project's size.
+    """
+    if fmt == "csv" and resource is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="CSV exports need a resource")
+    await run_db(db, ProjectAccess.require, project_id=project_id, user=current_user)
+    return export_response(project_id, fmt=fmt, resource=resource, compress=compress)
 
 
 @router.get("/{project_id}/members", response_model=list[ProjectMemberRead])
-def list_project_members(
+@query_budget(3)
+async def list_project_members(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    response: Response,
+    page: PageParams = Depends(keyset_page("id")),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    # Check if user has access to this project
-    project = ProjectService.get(db, project_id=project_id, user=current_user)
-    if not project:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
-    members = ProjectService.list_members(db, project_id=project_id)
-    # Convert to dict with user email
-    result = []
-    for member in members:
-        member_dict = {
-            "id": member.id,
-            "project_id": member.project_id,
-            "user_id": member.user_id,
-            "role": member.role,
-            "created_at": member.created_at,
-            "updated_at": member.updated_at,
-            "user_email": member.user.email if member.user else None,
-        }
-        result.append(member_dict)
-    return result
+    rows = await AsyncProjectService.list_members(db, project_id=project_id, user=current_user, page=page)
+    set_next_cursor(response, page)
+    return rows_response(rows, MEMBER_READ_COLUMNS, response)
 
 
 @router.post("/{project_id}/members", response_model=ProjectMemberRead, status_code=status.HTTP_201_CREATED)
-def add_project_member(
+@query_budget(4)
+async def add_project_member(
     project_id: int,
     data: ProjectMemberCreate,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_superuser),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(require_superuser),
 ):
-    project = ProjectService.get(db, project_id=project_id)
-    if not project:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
-    
+    await run_db(db, ProjectAccess.require, project_id=project_id, user=current_user)
+
     try:
-        member = ProjectService.add_member(db, project_id=project_id, data=data)
-        # Reload with user relationship
-        stmt = (
-            select(ProjectMember)
-            .where(ProjectMember.id == member.id)
-            .options(joinedload(ProjectMember.user))
-        )
-        member_with_user = db.execute(stmt).unique().scalar_one()
-        return {
-            "id": member_with_user.id,
-            "project_id": member_with_user.project_id,
-            "user_id": member_with_user.user_id,
-            "role": member_with_user.role,
-            "created_at": member_with_user.created_at,
-            "updated_at": member_with_user.updated_at,
-            "user_email": member_with_user.user.email if member_with_user.user else None,
-        }
+        return await AsyncProjectService.add_member(db, project_id=project_id, data=data)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.delete("/{project_id}/members/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def remove_project_member(
+@query_budget(3)
+async def remove_project_member(
     project_id: int,
     user_id: int,
-    db: Session = Depends(get_db),
-    _: User = Depends(require_superuser),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(require_superuser),
 ):
-    project = ProjectService.get(db, project_id=project_id)
-    if not project:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
-    
+    await run_db(db, ProjectAccess.require, project_id=project_id, user=current_user)
+
     try:
-        ProjectService.remove_member(db, project_id=project_id, user_id=user_id)
+        await AsyncProjectService.remove_member(db, project_id=project_id, user_id=user_id)
         return None
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -194,174 +229,227 @@ def remove_project_member(
 
 # Credential endpoints
 @router.get("/{project_id}/credentials", response_model=list[CredentialRead])
-def list_project_credentials(
+@query_budget(3)
+async def list_project_credentials(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    response: Response,
+    page: PageParams = Depends(keyset_page("id")),
+    etag: Optional[str] = Depends(collection_etag),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    credentials = CredentialService.list(db, project_id=project_id, user=current_user)
-    # Convert to dict format for proper serialization
-    result = []
-    for cred in credentials:
-        result.append({
-            "id": cred.id,
-            "project_id": cred.project_id,
-            "kind": cred.kind.value if hasattr(cred.kind, 'value') else str(cred.kind),
-            "secret_ref": cred.secret_ref,
-            "expires_at": cred.expires_at,
-            "metadata": cred.metadata_,
-            "created_at": cred.created_at,
-            "updated_at": cred.updated_at,
-        })
-    return result
+    rows = await AsyncCredentialService.list(db, project_id=project_id, user=current_user, page=page)
+    set_next_cursor(response, page)
+    set_collection_etag(response, etag, db)
+    return rows_response(rows, CREDENTIAL_READ_COLUMNS, response)
 
 
 @router.post("/{project_id}/credentials", response_model=CredentialRead, status_code=status.HTTP_201_CREATED)
-def create_project_credential(
+@query_budget(3)
+async def create_project_credential(
     project_id: int,
     data: CredentialCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
     try:
-        credential = CredentialService.create(db, project_id=project_id, data=data, user=current_user)
-        return {
-            "id": credential.id,
-            "project_id": credential.project_id,
-            "kind": credential.kind.value if hasattr(credential.kind, 'value') else str(credential.kind),
-            "secret_ref": credential.secret_ref,
-            "expires_at": credential.expires_at,
-            "metadata": credential.metadata_,
-            "created_at": credential.created_at,
-            "updated_at": credential.updated_at,
-        }
+        credential = await AsyncCredentialService.create(db, project_id=project_id, data=data, user=current_user)
+        return credential
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.post("/{project_id}/credentials/bulk", response_model=BulkResult)
+async def bulk_create_project_credentials(
+    project_id: int,
+    request: Request,
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
+):
+    """
+    Create many credentials at once.
+
+    The body is a JSON array of CredentialCreate objects, or NDJSON with one
+    object per line. Valid items are inserted in a single transaction; invalid
+    items are reported per index and skipped.
+    """
+    items, errors = await read_bulk_items(request, CredentialCreate)
+    results = await AsyncCredentialService.bulk_create(
+        db, project_id=project_id, items=items, user=current_user
+    )
+    return bulk_result(errors + results)
+
+
+@router.post("/{project_id}/credential-links/attach", response_model=BulkResult)
+async def attach_project_credentials(
+    project_id: int,
+    request: Request,
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
+):
+    """
+    Link credentials to service instances of the project.
+
+    Each item is {service_instance_id, credential_id, usage}; an existing link
+    gets its usage updated. Body format as for the other bulk endpoints.
+    """
+    items, errors = await read_bulk_items(request, CredentialLinkCreate)
+    results = await AsyncCredentialLinkService.attach(
+        db, project_id=project_id, items=items, user=current_user
+    )
+    return bulk_result(errors + results)
+
+
+@router.post("/{project_id}/credential-links/detach", response_model=BulkResult)
+async def detach_project_credentials(
+    project_id: int,
+    request: Request,
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
+):
+    """Remove links between credentials and service instances of the project"""
+    items, errors = await read_bulk_items(request, CredentialLinkDelete)
+    results = await AsyncCredentialLinkService.detach(
+        db, project_id=project_id, items=items, user=current_user
+    )
+    return bulk_result(errors + results)
+
+
 @router.get("/{project_id}/credentials/{credential_id}", response_model=CredentialRead)
-def get_project_credential(
+@query_budget(2)
+async def get_project_credential(
     project_id: int,
     credential_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    response: Response,
+    etag: Optional[str] = Depends(collection_etag),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    credential = CredentialService.get(db, project_id=project_id, credential_id=credential_id, user=current_user)
-    if not credential:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Credential not found")
-    return {
-        "id": credential.id,
-        "project_id": credential.project_id,
-        "kind": credential.kind.value if hasattr(credential.kind, 'value') else str(credential.kind),
-        "secret_ref": credential.secret_ref,
-        "expires_at": credential.expires_at,
-        "metadata": credential.metadata_,
-        "created_at": credential.created_at,
-        "updated_at": credential.updated_at,
-    }
+    credential = await AsyncCredentialService.get(db, project_id=project_id, credential_id=credential_id, user=current_user)
+    set_collection_etag(response, etag, db)
+    return credential
 
 
 @router.patch("/{project_id}/credentials/{credential_id}", response_model=CredentialRead)
-def update_project_credential(
+@query_budget(3)
+async def update_project_credential(
     project_id: int,
     credential_id: int,
     data: CredentialUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
     try:
-        credential = CredentialService.update(db, project_id=project_id, credential_id=credential_id, data=data, user=current_user)
-        return {
-            "id": credential.id,
-            "project_id": credential.project_id,
-            "kind": credential.kind.value if hasattr(credential.kind, 'value') else str(credential.kind),
-            "secret_ref": credential.secret_ref,
-            "expires_at": credential.expires_at,
-            "metadata": credential.metadata_,
-            "created_at": credential.created_at,
-            "updated_at": credential.updated_at,
-        }
+        credential = await AsyncCredentialService.update(db, project_id=project_id, credential_id=credential_id, data=data, user=current_user)
+        return credential
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.delete("/{project_id}/credentials/{credential_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_project_credential(
+@query_budget(3)
+async def delete_project_credential(
     project_id: int,
     credential_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    try:
-        CredentialService.delete(db, project_id=project_id, credential_id=credential_id, user=current_user)
-        return None
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    await AsyncCredentialService.delete(db, project_id=project_id, credential_id=credential_id, user=current_user)
+    return None
 
 
 # Service Instance endpoints
 @router.get("/{project_id}/services", response_model=list[ServiceInstanceRead])
-def list_project_services(
+@query_budget(3)
+async def list_project_services(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    response: Response,
+    page: PageParams = Depends(keyset_page("id", "name")),
+    etag: Optional[str] = Depends(collection_etag),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    services = ServiceInstanceService.list(db, project_id=project_id, user=current_user)
-    return services
+    rows = await AsyncServiceInstanceService.list(db, project_id=project_id, user=current_user, page=page)
+    set_next_cursor(response, page)
+    set_collection_etag(response, etag, db)
+    return rows_response(rows, SERVICE_INSTANCE_READ_COLUMNS, response)
 
 
 @router.post("/{project_id}/services", response_model=ServiceInstanceRead, status_code=status.HTTP_201_CREATED)
-def create_project_service(
+@query_budget(3)
+async def create_project_service(
     project_id: int,
     data: ServiceInstanceCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
     try:
-        service = ServiceInstanceService.create(db, project_id=project_id, data=data, user=current_user)
+        service = await AsyncServiceInstanceService.create(db, project_id=project_id, data=data, user=current_user)
         return service
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.post("/{project_id}/services/bulk", response_model=BulkResult)
+async def bulk_upsert_project_services(
+    project_id: int,
+    request: Request,
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
+):
+    """
+    Create or update service instances by name.
+
+    The body is a JSON array of ServiceInstanceCreate objects, or NDJSON with
+    one object per line. Every valid item is written in a single transaction;
+    invalid items are reported per index and skipped.
+    """
+    items, errors = await read_bulk_items(request, ServiceInstanceCreate)
+    results = await AsyncServiceInstanceService.bulk_upsert(
+        db, project_id=project_id, items=items, user=current_user
+    )
+    return bulk_result(errors + results)
+
+
 @router.get("/{project_id}/services/{service_id}", response_model=ServiceInstanceRead)
-def get_project_service(
+@query_budget(2)
+async def get_project_service(
     project_id: int,
     service_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    response: Response,
+    etag: Optional[str] = Depends(collection_etag),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    service = ServiceInstanceService.get(db, project_id=project_id, service_id=service_id, user=current_user)
-    if not service:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service instance not found")
+    service = await AsyncServiceInstanceService.get(db, project_id=project_id, service_id=service_id, user=current_user)
+    set_collection_etag(response, etag, db)
     return service
 
 
 @router.patch("/{project_id}/services/{service_id}", response_model=ServiceInstanceRead)
-def update_project_service(
+@query_budget(3)
+async def update_project_service(
     project_id: int,
     service_id: int,
     data: ServiceInstanceUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
     try:
-        service = ServiceInstanceService.update(db, project_id=project_id, service_id=service_id, data=data, user=current_user)
+        service = await AsyncServiceInstanceService.update(db, project_id=project_id, service_id=service_id, data=data, user=current_user)
         return service
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.delete("/{project_id}/services/{service_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_project_service(
+@query_budget(3)
+async def delete_project_service(
     project_id: int,
     service_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_active_user),
 ):
-    try:
-        ServiceInstanceService.delete(db, project_id=project_id, service_id=service_id, user=current_user)
-        return None
-    except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    await AsyncServiceInstanceService.delete(db, project_id=project_id, service_id=service_id, user=current_user)
+    return None
 
@@ -33,6 +33,15 @@ class ProjectRead(BaseModel):
     updated_at: Optional[datetime] = None
 
 
+class ProjectDeletionJob(BaseModel):
+    job_id: str
+    # queued | started | progress | success | failure (unknown ids read as queued)
+    status: str
+    project_id: Optional[int] = None
+    deleted: Optional[int] = None
+    error: Optional[str] = None
+
+
 class ProjectMemberCreate(BaseModel):
     user_id: int = Field(gt=0)
     role: str = Field(default="member", max_length=32)
@@ -1,55 +1,73 @@
 from __future__ import annotations
 
-from sqlalchemy import select
-from sqlalchemy.orm import Session, joinedload
+from typing import Any, Callable
 
-from app.api.v1.projects.models import Project, ProjectMember
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.api.pagination import PageParams
+from app.api.v1.projects.access import ProjectAccess, READ
+from app.api.v1.projects.claims import bump_membership_version
+from app.api.v1.projects.etags import bump_collection_version
+from app.api.v1.projects.models import Credential, Environment, Project, ProjectMember
 from app.api.v1.projects.schemas import ProjectCreate, ProjectUpdate, ProjectMemberCreate
+from app.api.v1.services.models import ServiceInstance
 from app.api.v1.users.models import User
+from app.core.config import settings
+from app.core.errors import NotFoundError
+from app.core.principal_cache import Principal
+from app.db.integrity import violated_constraint
+from app.db.session import after_commit, awaitable
+
+# Unique-key violations raised on commit, as client errors
+_VIOLATIONS = {
+    "projects_code_key": "Project code already exists",
+    "uq_project_member_project_user": "User is already a member of this project",
+}
+
+# ProjectMemberRead's fields, for the member list serializing rows directly
+MEMBER_READ_COLUMNS = (
+    ProjectMember.id,
+    ProjectMember.project_id,
+    ProjectMember.user_id,
+    ProjectMember.role,
+    ProjectMember.created_at,
+    ProjectMember.updated_at,
+    select(User.email).where(User.id == ProjectMember.user_id).scalar_subquery().label("user_email"),
+)
 
 
 class ProjectService:
     @staticmethod
-    def list(db: Session, *, skip: int = 0, limit: int = 100, user: User | None = None) -> list[Project]:
+    def list(
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        user: Principal | None = None,
+        page: PageParams | None = None,
+    ) -> list[Project]:
+        page = page or PageParams(limit=limit, skip=skip)
         if user and user.is_superuser:
             # Admin can see all projects
-            stmt = select(Project).order_by(Project.id).offset(skip).limit(limit)
+            stmt = select(Project)
         elif user:
             # Regular users can only see projects they are members of
             stmt = (
                 select(Project)
                 .join(ProjectMember, Project.id == ProjectMember.project_id)
                 .where(ProjectMember.user_id == user.id)
-                .order_by(Project.id)
-                .offset(skip)
-                .limit(limit)
             )
         else:
             # No user, return empty
             return []
-        return list(db.execute(stmt).scalars().all())
+        stmt = page.apply(stmt, Project)
+        return page.collect(list(db.execute(stmt).scalars().all()))
 
     @staticmethod
-    def get(db: Session, *, project_id: int, user: User | None = None) -> Project | None:
-        stmt = select(Project).where(Project.id == project_id)
-        project = db.execute(stmt).scalar_one_or_none()
-        
-        if not project:
-            return None
-        
-        # If user is admin, allow access
-        if user and user.is_superuser:
-            return project
-        
-        # If user is provided, check if they are a member
-        if user:
-            member = ProjectService.get_member(db, project_id=project_id, user_id=user.id)
-            if member:
-                return project
-            return None
-        
-        # No user provided, deny access
-        return None
+    def get(db: Session, *, project_id: int, user: Principal | None = None, min_role: str = READ) -> Project:
+        return ProjectAccess.get_project(db, project_id=project_id, user=user, min_role=min_role)
 
     @staticmethod
     def get_by_code(db: Session, *, code: str) -> Project | None:
@@ -60,8 +78,7 @@ class ProjectService:
     def create(db: Session, *, data: ProjectCreate) -> Project:
         project = Project(code=data.code, display_name=data.display_name, kind=data.kind)
         db.add(project)
-        db.commit()
-        db.refresh(project)
+        ProjectService._commit(db)
         return project
 
     @staticmethod
@@ -74,24 +91,95 @@ class ProjectService:
             project.kind = data.kind
 
         db.add(project)
-        db.commit()
-        db.refresh(project)
+        ProjectService._commit(db)
         return project
 
     @staticmethod
-    def delete(db: Session, *, project: Project) -> None:
-        db.delete(project)
+    def delete(db: Session, *, project_id: int) -> None:
+        """Delete a project; children go in the same statement through ON DELETE CASCADE"""
+        # RETURNING sees the rows as of the statement's start, before the
+        # cascade, so the members whose claims must be invalidated come back too
+        member_ids = (
+            select(func.array_agg(ProjectMember.user_id))
+            .where(ProjectMember.project_id == Project.id)
+            .scalar_subquery()
+        )
+        stmt = delete(Project).where(Project.id == project_id).returning(Project.id, member_ids)
+        row = db.execute(stmt).one_or_none()
+        if row is None:
+            raise NotFoundError("Project not found")
         db.commit()
+        after_commit(db, bump_collection_version, project_id)
+        for user_id in row[1] or ():
+            after_commit(db, bump_membership_version, user_id)
 
     @staticmethod
-    def list_members(db: Session, *, project_id: int) -> list[ProjectMember]:
-        stmt = (
-            select(ProjectMember)
-            .where(ProjectMember.project_id == project_id)
-            .options(joinedload(ProjectMember.user))
-            .order_by(ProjectMember.id)
+    def is_large(db: Session, *, project_id: int) -> bool:
+        """Whether the project has PROJECT_DELETE_ASYNC_THRESHOLD services + credentials or more"""
+        threshold = settings.PROJECT_DELETE_ASYNC_THRESHOLD
+
+        def bounded_count(model: Any) -> Any:
+            # Stop counting at the threshold; the exact size does not matter
+            rows = select(model.id).where(model.project_id == project_id).limit(threshold).subquery()
+            return select(func.count()).select_from(rows).scalar_subquery()
+
+        total = db.execute(select(bounded_count(ServiceInstance) + bounded_count(Credential))).scalar_one()
+        return total >= threshold
+
+    @staticmethod
+    def delete_in_batches(
+        db: Session,
+        *,
+        project_id: int,
+        batch_size: int,
+        progress: Callable[[int], None] | None = None,
+    ) -> int:
+        """
+        Delete a project's children `batch_size` rows at a time, committing
+        after each batch, then the project itself. Returns the number of
+        child rows deleted (credential links are cascaded and not counted).
+        """
+        deleted = 0
+        for model in (ServiceInstance, Credential, Environment, ProjectMember):
+            # Removed members' token claims are invalidated batch by batch
+            returned = model.user_id if model is ProjectMember else model.id
+            while True:
+                batch = select(model.id).where(model.project_id == project_id).limit(batch_size)
+                stmt = delete(model).where(model.id.in_(batch.scalar_subquery())).returning(returned)
+                ids = db.execute(stmt).scalars().all()
+                db.commit()
+                if model is ProjectMember:
+                    for user_id in ids:
+                        after_commit(db, bump_membership_version, user_id)
+                count = len(ids)
+                deleted += count
+                if progress is not None:
+                    progress(deleted)
+                if count < batch_size:
+                    break
+        db.execute(delete(Project).where(Project.id == project_id))
+        db.commit()
+        after_commit(db, bump_collection_version, project_id)
+        return deleted
+
+    @staticmethod
+    def list_members(
+        db: Session,
+        *,
+        project_id: int,
+        user: Principal | None = None,
+        page: PageParams | None = None,
+    ) -> list[Any]:
+        """Rows of MEMBER_READ_COLUMNS"""
+        return ProjectAccess.fetch_all(
+            db,
+            ProjectMember,
+            project_id=project_id,
+            user=user,
+            order_by=ProjectMember.id,
+            page=page,
+            columns=MEMBER_READ_COLUMNS,
         )
-        return list(db.execute(stmt).unique().scalars().all())
 
     @staticmethod
     def get_member(db: Session, *, project_id: int, user_id: int) -> ProjectMember | None:
@@ -103,49 +191,78 @@ class ProjectService:
 
     @staticmethod
     def add_member(db: Session, *, project_id: int, data: ProjectMemberCreate) -> ProjectMember:
-        # Check if project exists
-        project = ProjectService.get(db, project_id=project_id)
-        if not project:
-            raise ValueError("Project not found")
-
-        # Check if user exists
-        stmt = select(User).where(User.id == data.user_id)
-        user = db.execute(stmt).scalar_one_or_none()
+        # The user row is needed for the response (email) anyway
+        user = db.get(User, data.user_id)
         if not user:
             raise ValueError("User not found")
 
-        # Check if member already exists
-        existing = ProjectService.get_member(db, project_id=project_id, user_id=data.user_id)
-        if existing:
-            raise ValueError("User is already a member of this project")
-
-        # Create new member
+        # An existing membership is caught by uq_project_member_project_user
         member = ProjectMember(
             project_id=project_id,
             user_id=data.user_id,
-            role=data.role
+            role=data.role,
+            user=user,
         )
         db.add(member)
-        db.commit()
-        db.refresh(member)
+        ProjectService._commit(db)
+        ProjectAccess.forget(db, project_id=project_id, user_id=data.user_id)
+        after_commit(db, bump_membership_version, data.user_id)
         return member
 
     @staticmethod
     def remove_member(db: Session, *, project_id: int, user_id: int) -> None:
-        member = ProjectService.get_member(db, project_id=project_id, user_id=user_id)
-        if not member:
+        stmt = (
+            delete(ProjectMember)
+            .where(ProjectMember.project_id == project_id, ProjectMember.user_id == user_id)
+            .returning(ProjectMember.id)
+        )
+        if db.execute(stmt).scalar_one_or_none() is None:
             raise ValueError("Member not found")
-        db.delete(member)
         db.commit()
+        ProjectAccess.forget(db, project_id=project_id, user_id=user_id)
+        after_commit(db, bump_membership_version, user_id)
 
     @staticmethod
     def update_member_role(db: Session, *, project_id: int, user_id: int, role: str) -> ProjectMember:
-        member = ProjectService.get_member(db, project_id=project_id, user_id=user_id)
-        if not member:
+        stmt = (
+            update(ProjectMember)
+            .where(ProjectMember.project_id == project_id, ProjectMember.user_id == user_id)
+            .values(role=role)
+            .returning(ProjectMember)
+        )
+        member = db.execute(stmt).scalar_one_or_none()
+        if member is None:
             raise ValueError("Member not found")
-        member.role = role
-        db.add(member)
         db.commit()
-        db.refresh(member)
+        ProjectAccess.forget(db, project_id=project_id, user_id=user_id)
+        after_commit(db, bump_membership_version, user_id)
         return member
 
+    @staticmethod
+    def _commit(db: Session) -> None:
+        """Commit, turning unique-key violations into ValueError"""
+        try:
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            message = _VIOLATIONS.get(violated_constraint(e))
+            if message is None:
+                raise
+            raise ValueError(message) from e
+
+
+class AsyncProjectService:
+    """ProjectService for async handlers; accepts a sync Session or an AsyncSession"""
+
+    list = awaitable(ProjectService.list)
+    get = awaitable(ProjectService.get)
+    get_by_code = awaitable(ProjectService.get_by_code)
+    create = awaitable(ProjectService.create)
+    update = awaitable(ProjectService.update)
+    delete = awaitable(ProjectService.delete)
+    is_large = awaitable(ProjectService.is_large)
+    list_members = awaitable(ProjectService.list_members)
+    get_member = awaitable(ProjectService.get_member)
+    add_member = awaitable(ProjectService.add_member)
+    remove_member = awaitable(ProjectService.remove_member)
+    update_member_role = awaitable(ProjectService.update_member_role)
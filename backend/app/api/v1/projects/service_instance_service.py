@@ -1,65 +1,95 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+from typing import Any, NoReturn
+
+from sqlalchemy import delete, func, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.api.bulk import error_result
+from app.api.pagination import PageParams
+from app.api.v1.projects.access import ProjectAccess, READ, WRITE
+from app.api.v1.projects.etags import bump_collection_version
+from app.api.v1.projects.models import Environment
+from app.api.v1.services.catalog import service_type_catalog
 from app.api.v1.services.models import ServiceInstance, ServiceType
 from app.api.v1.projects.service_schemas import ServiceInstanceCreate, ServiceInstanceUpdate
-from app.api.v1.projects.service import ProjectService
-from app.api.v1.users.models import User
+from app.core.config import settings
+from app.core.errors import NotFoundError
+from app.core.principal_cache import Principal
+from app.db.integrity import violated_constraint
+from app.db.session import after_commit, awaitable
+
+# Constraint violations raised by single-row writes, as client errors
+_SERVICE_TYPE_FK = "service_instances_service_type_id_fkey"
+
+_VIOLATIONS = {
+    _SERVICE_TYPE_FK: "Service type not found",
+    "service_instances_environment_id_fkey": "Environment not found",
+    "uq_service_instance_project_name": "Service instance with this name already exists in the project",
+}
+
+# ServiceInstanceRead's fields, for list endpoints serializing rows directly
+SERVICE_INSTANCE_READ_COLUMNS = (
+    ServiceInstance.id,
+    ServiceInstance.project_id,
+    ServiceInstance.service_type_id,
+    ServiceInstance.environment_id,
+    ServiceInstance.name,
+    ServiceInstance.endpoint,
+    ServiceInstance.port,
+    ServiceInstance.status,
+    ServiceInstance.metadata_.label("metadata"),
+    ServiceInstance.created_at,
+    ServiceInstance.updated_at,
+)
 
 
 class ServiceInstanceService:
     @staticmethod
-    def list(db: Session, *, project_id: int, user: User | None = None) -> list[ServiceInstance]:
-        # Check if user has access to this project
-        project = ProjectService.get(db, project_id=project_id, user=user)
-        if not project:
-            return []
-        
-        stmt = (
-            select(ServiceInstance)
-            .where(ServiceInstance.project_id == project_id)
-            .order_by(ServiceInstance.id)
+    def list(
+        db: Session,
+        *,
+        project_id: int,
+        user: Principal | None = None,
+        page: PageParams | None = None,
+    ) -> list[Any]:
+        """Rows of SERVICE_INSTANCE_READ_COLUMNS"""
+        return ProjectAccess.fetch_all(
+            db,
+            ServiceInstance,
+            project_id=project_id,
+            user=user,
+            order_by=ServiceInstance.id,
+            page=page,
+            columns=SERVICE_INSTANCE_READ_COLUMNS,
         )
-        return list(db.execute(stmt).scalars().all())
 
     @staticmethod
-    def get(db: Session, *, project_id: int, service_id: int, user: User | None = None) -> ServiceInstance | None:
-        # Check if user has access to this project
-        project = ProjectService.get(db, project_id=project_id, user=user)
-        if not project:
-            return None
-        
-        stmt = select(ServiceInstance).where(
-            ServiceInstance.id == service_id,
-            ServiceInstance.project_id == project_id
+    def get(
+        db: Session,
+        *,
+        project_id: int,
+        service_id: int,
+        user: Principal | None = None,
+        min_role: str = READ,
+    ) -> ServiceInstance:
+        return ProjectAccess.fetch_one(
+            db,
+            ServiceInstance,
+            project_id=project_id,
+            resource_id=service_id,
+            user=user,
+            min_role=min_role,
+            not_found="Service instance not found",
         )
-        return db.execute(stmt).scalar_one_or_none()
 
     @staticmethod
-    def create(db: Session, *, project_id: int, data: ServiceInstanceCreate, user: User | None = None) -> ServiceInstance:
-        # Check if user has access to this project
-        project = ProjectService.get(db, project_id=project_id, user=user)
-        if not project:
-            raise ValueError("Project not found or access denied")
-        
-        # Check if service type exists
-        stmt = select(ServiceType).where(ServiceType.id == data.service_type_id)
-        service_type = db.execute(stmt).scalar_one_or_none()
-        if not service_type:
-            raise ValueError("Service type not found")
-        
-        # Check if name is unique within project
-        existing = db.execute(
-            select(ServiceInstance).where(
-                ServiceInstance.project_id == project_id,
-                ServiceInstance.name == data.name
-            )
-        ).scalar_one_or_none()
-        if existing:
-            raise ValueError("Service instance with this name already exists in the project")
-        
+    def create(db: Session, *, project_id: int, data: ServiceInstanceCreate, user: Principal | None = None) -> ServiceInstance:
+        ProjectAccess.require(db, project_id=project_id, user=user, min_role=WRITE)
+
+        # Service type and name uniqueness are enforced by the INSERT itself
         service_instance = ServiceInstance(
             project_id=project_id,
             service_type_id=data.service_type_id,
@@ -71,58 +101,208 @@ class ServiceInstanceService:
             metadata_=data.metadata
         )
         db.add(service_instance)
-        db.commit()
-        db.refresh(service_instance)
+        try:
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            ServiceInstanceService._raise_violation(e)
+        after_commit(db, bump_collection_version, project_id)
         return service_instance
 
     @staticmethod
-    def update(db: Session, *, project_id: int, service_id: int, data: ServiceInstanceUpdate, user: User | None = None) -> ServiceInstance:
-        # Check if user has access to this project
-        service_instance = ServiceInstanceService.get(db, project_id=project_id, service_id=service_id, user=user)
-        if not service_instance:
-            raise ValueError("Service instance not found or access denied")
-        
-        if data.service_type_id is not None:
-            # Check if service type exists
-            stmt = select(ServiceType).where(ServiceType.id == data.service_type_id)
-            service_type = db.execute(stmt).scalar_one_or_none()
-            if not service_type:
-                raise ValueError("Service type not found")
-            service_instance.service_type_id = data.service_type_id
-        
-        if data.environment_id is not None:
-            service_instance.environment_id = data.environment_id
-        if data.name is not None:
-            # Check if name is unique within project
-            existing = db.execute(
-                select(ServiceInstance).where(
-                    ServiceInstance.project_id == project_id,
-                    ServiceInstance.name == data.name,
-                    ServiceInstance.id != service_id
-                )
-            ).scalar_one_or_none()
-            if existing:
-                raise ValueError("Service instance with this name already exists in the project")
-            service_instance.name = data.name
-        if data.endpoint is not None:
-            service_instance.endpoint = data.endpoint
-        if data.port is not None:
-            service_instance.port = data.port
-        if data.status is not None:
-            service_instance.status = data.status
-        if data.metadata is not None:
-            service_instance.metadata_ = data.metadata
-        
-        db.add(service_instance)
+    def update(db: Session, *, project_id: int, service_id: int, data: ServiceInstanceUpdate, user: Principal | None = None) -> ServiceInstance:
+        values = {
+            attr: value
+            for attr, value in (
+                (ServiceInstance.service_type_id, data.service_type_id),
+                (ServiceInstance.environment_id, data.environment_id),
+                (ServiceInstance.name, data.name),
+                (ServiceInstance.endpoint, data.endpoint),
+                (ServiceInstance.port, data.port),
+                (ServiceInstance.status, data.status),
+                (ServiceInstance.metadata_, data.metadata),
+            )
+            if value is not None
+        }
+        if not values:
+            return ServiceInstanceService.get(db, project_id=project_id, service_id=service_id, user=user)
+
+        ProjectAccess.require(db, project_id=project_id, user=user, min_role=WRITE)
+        stmt = (
+            update(ServiceInstance)
+            .where(ServiceInstance.id == service_id, ServiceInstance.project_id == project_id)
+            .values(values)
+            .returning(ServiceInstance)
+        )
+        try:
+            service_instance = db.execute(stmt).scalar_one_or_none()
+        except IntegrityError as e:
+            db.rollback()
+            ServiceInstanceService._raise_violation(e)
+        if service_instance is None:
+            raise NotFoundError("Service instance not found")
         db.commit()
-        db.refresh(service_instance)
+        after_commit(db, bump_collection_version, project_id)
         return service_instance
 
     @staticmethod
-    def delete(db: Session, *, project_id: int, service_id: int, user: User | None = None) -> None:
-        service_instance = ServiceInstanceService.get(db, project_id=project_id, service_id=service_id, user=user)
-        if not service_instance:
-            raise ValueError("Service instance not found or access denied")
-        
-        db.delete(service_instance)
+    def delete(db: Session, *, project_id: int, service_id: int, user: Principal | None = None) -> None:
+        ProjectAccess.require(db, project_id=project_id, user=user, min_role=WRITE)
+        # Credential links go with the row through ON DELETE CASCADE
+        stmt = (
+            delete(ServiceInstance)
+            .where(ServiceInstance.id == service_id, ServiceInstance.project_id == project_id)
+            .returning(ServiceInstance.id)
+        )
+        if db.execute(stmt).scalar_one_or_none() is None:
+            raise NotFoundError("Service instance not found")
         db.commit()
+        after_commit(db, bump_collection_version, project_id)
+
+    @staticmethod
+    def _raise_violation(error: IntegrityError) -> NoReturn:
+        message = _VIOLATIONS.get(violated_constraint(error))
+        if message is None:
+            raise error
+        raise ValueError(message) from error
+
+    @staticmethod
+    def bulk_upsert(
+        db: Session,
+        *,
+        project_id: int,
+        items: list[tuple[int, ServiceInstanceCreate]],
+        user: Principal | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Create or update (by name) many service instances in one transaction.
+
+        `items` are (request index, payload) pairs; returns one result per
+        item. Service types are validated against the catalog snapshot and
+        environments with one query, then rows are written with INSERT ... ON CONFLICT DO UPDATE in
+        chunks of BULK_CHUNK_SIZE.
+        """
+        ProjectAccess.require(db, project_id=project_id, user=user, min_role=WRITE)
+
+        type_ids = {data.service_type_id for _, data in items}
+        env_ids = {data.environment_id for _, data in items if data.environment_id is not None}
+        # The catalog snapshot answers for almost every id; only ids it has
+        # not seen yet (created since the last reload) go to the database.
+        known_types = service_type_catalog.known_ids(type_ids)
+        missing_types = type_ids - known_types
+        if missing_types:
+            known_types |= set(
+                db.execute(select(ServiceType.id).where(ServiceType.id.in_(missing_types))).scalars()
+            )
+        known_envs = set(
+            db.execute(
+                select(Environment.id).where(
+                    Environment.id.in_(env_ids), Environment.project_id == project_id
+                )
+            ).scalars()
+        ) if env_ids else set()
+
+        results: list[dict[str, Any]] = []
+        rows: list[dict[str, Any]] = []
+        index_by_name: dict[str, int] = {}
+        for index, data in items:
+            if data.service_type_id not in known_types:
+                results.append(error_result(index, "Service type not found"))
+            elif data.environment_id is not None and data.environment_id not in known_envs:
+                results.append(error_result(index, "Environment not found in this project"))
+            elif data.name in index_by_name:
+                # ON CONFLICT cannot touch the same row twice in one statement
+                results.append(error_result(index, f"Duplicate name in request (item {index_by_name[data.name]})"))
+            else:
+                index_by_name[data.name] = index
+                rows.append({
+                    "project_id": project_id,
+                    "service_type_id": data.service_type_id,
+                    "environment_id": data.environment_id,
+                    "name": data.name,
+                    "endpoint": data.endpoint,
+                    "port": data.port,
+                    "status": data.status,
+                    "metadata": data.metadata,
+                })
+
+        try:
+            try:
+                written = ServiceInstanceService._upsert_rows(db, rows, index_by_name)
+            except IntegrityError as e:
+                if violated_constraint(e) != _SERVICE_TYPE_FK:
+                    raise
+                # The snapshot still lists a type deleted since its last
+                # reload; re-check the types against the database and write
+                # the other items.
+                db.rollback()
+                existing = set(db.execute(
+                    select(ServiceType.id).where(ServiceType.id.in_({row["service_type_id"] for row in rows}))
+                ).scalars())
+                kept = []
+                for row in rows:
+                    if row["service_type_id"] in existing:
+                        kept.append(row)
+                    else:
+                        results.append(error_result(index_by_name[row["name"]], "Service type not found"))
+                written = ServiceInstanceService._upsert_rows(db, kept, index_by_name)
+            results.extend(written)
+            db.commit()
+            after_commit(db, bump_collection_version, project_id)
+        except Exception:
+            db.rollback()
+            raise
+        return results
+
+    @staticmethod
+    def _upsert_rows(db: Session, rows: list[dict[str, Any]], index_by_name: dict[str, int]) -> list[dict[str, Any]]:
+        """INSERT ... ON CONFLICT DO UPDATE `rows` in chunks; one result per row"""
+        table = ServiceInstance.__table__
+        chunk_size = settings.BULK_CHUNK_SIZE
+        # Executed with a list of parameter sets, so SQLAlchemy compiles the
+        # statement once and batches the rows into multi-row VALUES itself
+        # (insertmanyvalues); rendering VALUES from the rows on every chunk
+        # spent most of a large upsert compiling SQL.
+        stmt = pg_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_service_instance_project_name",
+            set_={
+                "service_type_id": stmt.excluded.service_type_id,
+                "environment_id": stmt.excluded.environment_id,
+                "endpoint": stmt.excluded.endpoint,
+                "port": stmt.excluded.port,
+                "status": stmt.excluded.status,
+                "metadata": stmt.excluded["metadata"],
+                "updated_at": func.now(),
+            },
+        ).returning(
+            table.c.id,
+            table.c.name,
+            # xmax is 0 only for rows this statement inserted
+            literal_column("xmax = 0").label("inserted"),
+        )
+        results: list[dict[str, Any]] = []
+        for start in range(0, len(rows), chunk_size):
+            for row in db.execute(
+                stmt,
+                rows[start:start + chunk_size],
+                execution_options={"insertmanyvalues_page_size": chunk_size},
+            ):
+                results.append({
+                    "index": index_by_name[row.name],
+                    "status": "created" if row.inserted else "updated",
+                    "id": row.id,
+                    "detail": None,
+                })
+        return results
+
+
+class AsyncServiceInstanceService:
+    """ServiceInstanceService for async handlers; accepts a sync Session or an AsyncSession"""
+
+    list = awaitable(ServiceInstanceService.list)
+    get = awaitable(ServiceInstanceService.get)
+    create = awaitable(ServiceInstanceService.create)
+    update = awaitable(ServiceInstanceService.update)
+    delete = awaitable(ServiceInstanceService.delete)
+    bulk_upsert = awaitable(ServiceInstanceService.bulk_upsert)
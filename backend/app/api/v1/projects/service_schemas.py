@@ -41,6 +41,7 @@ class ServiceInstanceRead(BaseModel):
     endpoint: str
     port: Optional[int] = None
     status: str
-    metadata: Optional[dict] = Field(default=None, alias="metadata_")
+    # Read from the ORM attribute, rendered as "metadata"
+    metadata: Optional[dict] = Field(default=None, validation_alias="metadata_")
     created_at: datetime
     updated_at: Optional[datetime] = None
@@ -0,0 +1,119 @@
+"""
+In-process snapshot of the ServiceType catalog
+
+Service types change rarely and are read constantly, so each process keeps
+all of them in memory, keyed by id and code, together with the rendered
+`GET /service-types` body and its ETag.
+
+The API has no service type writes; the catalog is seeded by migrations and
+edited out of band. Every worker reloads when the version number in Redis
+(`INCR service-types:version`) differs from the one it loaded, checked every
+SERVICE_TYPE_CATALOG_CHECK_SECONDS, or when its snapshot is older than
+SERVICE_TYPE_CATALOG_MAX_AGE_SECONDS. An edit made without the INCR is
+therefore served stale for up to SERVICE_TYPE_CATALOG_MAX_AGE_SECONDS. The
+version is read before the rows, so a snapshot is never older than the
+version it claims.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.api.v1.services.models import ServiceType
+from app.api.v1.services.schemas import ServiceTypeRead
+from app.core.config import settings
+from app.core.metrics import SERVICE_TYPE_CATALOG_RELOADS
+from app.core.redis import redis_client, redis_sync_client
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "service-types:version"
+
+
+class _Snapshot:
+    """One immutable load of the catalog; swapped in as a whole"""
+
+    def __init__(self, types: list[ServiceTypeRead], version: Optional[str]):
+        self.by_id = {t.id: t for t in types}
+        self.by_code = {t.code: t for t in types}
+        self.body = json.dumps([t.model_dump(mode="json") for t in types], separators=(",", ":")).encode()
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+
+class ServiceTypeCatalog:
+    def __init__(self):
+        self._snapshot: Optional[_Snapshot] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def get(self, type_id: int) -> Optional[ServiceTypeRead]:
+        snapshot = self._snapshot
+        return snapshot.by_id.get(type_id) if snapshot else None
+
+    def by_code(self, code: str) -> Optional[ServiceTypeRead]:
+        snapshot = self._snapshot
+        return snapshot.by_code.get(code) if snapshot else None
+
+    def known_ids(self, type_ids: Iterable[int]) -> set[int]:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return set()
+        return {type_id for type_id in type_ids if type_id in snapshot.by_id}
+
+    def rendered(self) -> Optional[tuple[bytes, str]]:
+        """(JSON body, ETag) of the whole catalog, or None before the first load"""
+        snapshot = self._snapshot
+        return (snapshot.body, snapshot.etag) if snapshot else None
+
+    def load(self, db: Session) -> None:
+        try:
+            version = redis_sync_client.get(VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"[SERVICES] Catalog version unavailable: {e}")
+            version = None
+        rows = db.execute(select(ServiceType).order_by(ServiceType.id)).scalars().all()
+        self._snapshot = _Snapshot([ServiceTypeRead.model_validate(row) for row in rows], version)
+        logger.info(f"[SERVICES] Loaded {len(rows)} service types (version {version})")
+
+    def reload(self, reason: str) -> None:
+        """Load from a fresh session on the primary"""
+        from app.db import SessionLocal
+
+        SERVICE_TYPE_CATALOG_RELOADS.labels(reason=reason).inc()
+        db = SessionLocal()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+    async def refresh_loop(self) -> None:
+        """Reload when the Redis version moves or the snapshot ages out; runs for the app lifetime"""
+        while True:
+            try:
+                snapshot = self._snapshot
+                version = await redis_client.get(VERSION_KEY)
+                if snapshot is None:
+                    await run_in_threadpool(self.reload, "initial")
+                elif version != snapshot.version:
+                    await run_in_threadpool(self.reload, "version")
+                elif time.monotonic() - snapshot.loaded_at > settings.SERVICE_TYPE_CATALOG_MAX_AGE_SECONDS:
+                    await run_in_threadpool(self.reload, "age")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[SERVICES] Catalog refresh failed: {e}")
+            await asyncio.sleep(settings.SERVICE_TYPE_CATALOG_CHECK_SECONDS)
+
+
+service_type_catalog = ServiceTypeCatalog()
+
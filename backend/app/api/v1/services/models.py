@@ -3,7 +3,7 @@ from __future__ import annotations
 from enum import Enum
 from typing import Optional
 
-from sqlalchemy import Enum as SAEnum, ForeignKey, Integer, String, Text, UniqueConstraint, text
+from sqlalchemy import Enum as SAEnum, ForeignKey, Index, Integer, String, Text, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -41,6 +41,8 @@ class ServiceInstance(BaseModel):
     __tablename__ = "service_instances"
     __table_args__ = (
         UniqueConstraint("project_id", "name", name="uq_service_instance_project_name"),
+        # keyset pagination within a project
+        Index("ix_service_instances_project_id_id", "project_id", "id"),
     )
 
     project_id: Mapped[int] = mapped_column(
@@ -68,7 +70,7 @@ class ServiceInstance(BaseModel):
     )
 
     credential_links: Mapped[list["ServiceInstanceCredential"]] = relationship(
-        back_populates="service_instance", cascade="all, delete-orphan"
+        back_populates="service_instance", cascade="all, delete-orphan", passive_deletes=True
     )
 
     def __repr__(self) -> str:
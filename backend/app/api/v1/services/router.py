@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Request, Response
+
+from app.api.deps import get_current_active_user
+from app.api.v1.projects.etags import etag_matches
+from app.api.v1.services.catalog import service_type_catalog
+from app.api.v1.services.schemas import ServiceTypeRead
+from app.core.config import settings
+from app.core.errors import ServiceUnavailableError
+from app.core.principal_cache import Principal
+from app.db.query_stats import query_budget
+
+router = APIRouter(prefix="/service-types", tags=["service-types"])
+
+
+@router.get("", response_model=list[ServiceTypeRead])
+@query_budget(1)
+async def list_service_types(
+    request: Request,
+    _: Principal = Depends(get_current_active_user),
+):
+    """The service type catalog, served from the in-process snapshot"""
+    rendered = service_type_catalog.rendered()
+    if rendered is None:
+        raise ServiceUnavailableError("Service type catalog is loading")
+    body, etag = rendered
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.SERVICE_TYPE_CACHE_MAX_AGE_SECONDS}",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
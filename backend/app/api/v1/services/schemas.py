@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class ServiceTypeRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    id: int
+    code: str
+    group: str
+    display_name: str
+    default_port: Optional[int] = None
+    default_checks: Optional[dict] = None
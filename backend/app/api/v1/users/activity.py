@@ -0,0 +1,93 @@
+"""
+Coalesced user activity timestamps
+
+Logins record `last_login` in a Redis hash (user id -> epoch seconds) instead
+of updating the users row. A Celery beat task flushes each hash with one
+`UPDATE users ... FROM (VALUES ...)` per batch, skipping rows whose stored
+timestamp is already within USER_ACTIVITY_STALENESS_SECONDS of the new one.
+"""
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from redis.exceptions import ResponseError
+from sqlalchemy import DateTime, Integer, column, or_, update, values
+from sqlalchemy.orm import Session
+
+from app.api.v1.users.models import User
+from app.core.config import settings
+from app.core.redis import redis_client, redis_sync_client
+
+logger = logging.getLogger(__name__)
+
+# users column -> Redis hash collecting its pending values
+ACTIVITY_KEYS = {
+    "last_login": "users:activity:last_login",
+}
+
+
+def _processing_key(key: str) -> str:
+    return f"{key}:flushing"
+
+
+async def record_activity(user_id: int, field: str = "last_login") -> None:
+    """Note that `field` of the user should become now(); never raises"""
+    try:
+        await redis_client.hset(ACTIVITY_KEYS[field], str(user_id), repr(time.time()))
+    except Exception as e:
+        # Activity timestamps are informational; a lost update is not worth a failed login.
+        logger.warning(f"[ACTIVITY] Could not record {field} for user {user_id}: {e}")
+
+
+def _claim_pending(key: str) -> dict[str, str]:
+    """
+    Move the pending hash aside and return its content.
+
+    A processing key left over from a failed flush is retried first; the
+    UPDATE only ever moves timestamps forward, so replay order does not matter.
+    """
+    processing = _processing_key(key)
+    try:
+        # Atomic: leaves both keys alone while a processing key still exists
+        redis_sync_client.renamenx(key, processing)
+    except ResponseError:
+        # Nothing recorded since the last flush
+        pass
+    return redis_sync_client.hgetall(processing)
+
+
+def flush_activity(db: Session) -> int:
+    """Write pending activity timestamps to the users table; returns rows updated"""
+    tolerance = timedelta(seconds=settings.USER_ACTIVITY_STALENESS_SECONDS)
+    batch_size = settings.USER_ACTIVITY_FLUSH_BATCH_SIZE
+    updated = 0
+    for field, key in ACTIVITY_KEYS.items():
+        pending = _claim_pending(key)
+        if not pending:
+            continue
+
+        rows = []
+        for user_id, ts in pending.items():
+            try:
+                rows.append((int(user_id), datetime.fromtimestamp(float(ts), tz=timezone.utc)))
+            except (TypeError, ValueError):
+                logger.warning(f"[ACTIVITY] Dropping malformed {field} entry {user_id!r}={ts!r}")
+
+        target = getattr(User, field)
+        for start in range(0, len(rows), batch_size):
+            pending_values = values(
+                column("id", Integer),
+                column("ts", DateTime(timezone=True)),
+                name="pending",
+            ).data(rows[start:start + batch_size])
+            stmt = (
+                update(User)
+                .where(User.id == pending_values.c.id)
+                .where(or_(target.is_(None), target < pending_values.c.ts - tolerance))
+                .values({field: pending_values.c.ts})
+                .execution_options(synchronize_session=False)
+            )
+            updated += db.execute(stmt).rowcount
+        db.commit()
+        redis_sync_client.delete(_processing_key(key))
+    return updated
@@ -21,11 +21,11 @@ class User(BaseModel):
     last_login: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
 
     profile: Mapped[Optional["Profile"]] = relationship(
-        back_populates="user", uselist=False, cascade="all, delete-orphan"
+        back_populates="user", uselist=False, cascade="all, delete-orphan", passive_deletes=True
     )
 
     project_memberships: Mapped[list["ProjectMember"]] = relationship(
-        back_populates="user", cascade="all, delete-orphan"
+        back_populates="user", cascade="all, delete-orphan", passive_deletes=True
     )
     projects = association_proxy("project_memberships", "project")
     def __repr__(self) -> str:
@@ -0,0 +1,32 @@
+"""
+User administration service
+"""
+from sqlalchemy.orm import Session
+
+from app.api.v1.users.models import User
+from app.core.principal_cache import publish_invalidation
+from app.db.session import after_commit
+
+
+class UserService:
+    @staticmethod
+    def set_active(db: Session, *, user: User, is_active: bool) -> User:
+        """
+        Activate or deactivate a user and evict their cached principals on every worker
+        """
+        user.is_active = is_active
+        db.add(user)
+        db.commit()
+        after_commit(db, publish_invalidation, user.id)
+        return user
+
+    @staticmethod
+    def set_superuser(db: Session, *, user: User, is_superuser: bool) -> User:
+        """
+        Promote or demote a user and evict their cached principals on every worker
+        """
+        user.is_superuser = is_superuser
+        db.add(user)
+        db.commit()
+        after_commit(db, publish_invalidation, user.id)
+        return user
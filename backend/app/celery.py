@@ -4,6 +4,8 @@ Celery configuration for the application
 from celery import Celery
 import os
 
+from app.core.config import settings
+
 # Get Redis URL from environment or use default
 redis_url = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 
@@ -26,5 +28,15 @@ celery_app.conf.update(
     task_time_limit=30 * 60,  # 30 minutes
     task_soft_time_limit=25 * 60,  # 25 minutes
     worker_prefetch_multiplier=1,
+    # Also sizes each worker process' DB pool (see app.db.pool)
+    worker_concurrency=settings.CELERY_WORKER_CONCURRENCY,
     worker_max_tasks_per_child=1000,
+    beat_schedule={
+        "flush-user-activity": {
+            "task": "app.tasks.flush_user_activity",
+            "schedule": settings.USER_ACTIVITY_FLUSH_SECONDS,
+            # A missed run is harmless: the next one picks up everything pending.
+            "options": {"expires": settings.USER_ACTIVITY_FLUSH_SECONDS},
+        },
+    },
 )
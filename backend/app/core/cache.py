@@ -0,0 +1,290 @@
+"""
+Shared cache-aside with single-flight fills and early refresh
+
+`SharedCache(name, ttl)` keeps JSON-serializable values in Redis under
+`cache:<name>:<key>`. `await cache.get_or_load(key, loader)` (or
+`cache.get_or_load_sync(key, loader)` from threadpool code) returns the cached
+value, or calls `loader` to produce it. A cold key is loaded once no matter how
+many callers arrive together:
+
+- within a process, the first caller's fill is shared with everyone else who
+  asks for the key before it lands;
+- across processes, the filling worker holds a short Redis lock and the other
+  workers poll the key until the value appears, or take over the lock if its
+  holder died.
+
+Entries record how long their loader took. Following XFetch (Vattani et al.,
+"Optimal Probabilistic Cache Stampede Prevention"), a reader recomputes an
+entry before it expires with a probability that grows as expiry approaches and
+with the recompute cost, so a hot key is refreshed by one caller ahead of time
+instead of by every caller at once when it expires. Callers that find a refresh
+already running keep getting the current value.
+
+Redis errors fail open: the loader is called directly and nothing is cached.
+"""
+import asyncio
+import json
+import logging
+import math
+import random
+import secrets
+import threading
+import time
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+from app.core.redis import redis_client, redis_sync_client
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = lock key; ARGV[1] = holder token. Only the holder may release.
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_release = redis_client.register_script(_RELEASE_SCRIPT)
+_release_sync = redis_sync_client.register_script(_RELEASE_SCRIPT)
+
+
+class _Entry:
+    __slots__ = ("value", "delta", "expires_at")
+
+    def __init__(self, value: Any, delta: float, expires_at: float):
+        self.value = value
+        self.delta = delta
+        self.expires_at = expires_at
+
+
+def _encode(value: Any, delta: float, ttl: float) -> str:
+    return json.dumps({"v": value, "d": delta, "x": time.time() + ttl}, separators=(",", ":"))
+
+
+def _decode(raw: Optional[str]) -> Optional[_Entry]:
+    if raw is None:
+        return None
+    try:
+        data = json.loads(raw)
+        return _Entry(data["v"], float(data["d"]), float(data["x"]))
+    except (ValueError, KeyError, TypeError):
+        # Written by something else or an older format; treat as a miss
+        return None
+
+
+class _Flight:
+    """A fill in progress on a threadpool thread, shared with the other threads"""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SharedCache:
+    def __init__(self, name: str, ttl: float, *, beta: Optional[float] = None):
+        self.name = name
+        self.ttl = ttl
+        # > 1 refreshes earlier, < 1 later; 0 disables early refresh
+        self.beta = settings.CACHE_XFETCH_BETA if beta is None else beta
+        self._flights: dict[str, asyncio.Future] = {}
+        self._sync_flights: dict[str, _Flight] = {}
+        self._sync_lock = threading.Lock()
+
+    def _key(self, key: str) -> str:
+        return f"cache:{self.name}:{key}"
+
+    def _fresh(self, entry: _Entry) -> bool:
+        # XFetch: -log(u) is exponentially distributed, so a few readers per
+        # delta-sized window before expiry choose to recompute.
+        early = entry.delta * self.beta * -math.log(1.0 - random.random())
+        return time.time() + early < entry.expires_at
+
+    def _count(self, result: str) -> None:
+        CACHE_REQUESTS.labels(cache=self.name, result=result).inc()
+
+    def _lock_ms(self) -> int:
+        return int(settings.CACHE_FILL_LOCK_SECONDS * 1000)
+
+    # Async (event loop) callers
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        redis_key = self._key(key)
+        try:
+            entry = _decode(await redis_client.get(redis_key))
+        except RedisError as e:
+            logger.warning(f"[CACHE] {self.name} unavailable, loading directly: {e}")
+            self._count("fallback")
+            return await loader()
+        if entry is not None and self._fresh(entry):
+            self._count("hit")
+            return entry.value
+
+        fill = self._flights.get(redis_key)
+        if fill is None:
+            # A task of its own, so that the fill outlives a cancelled first caller
+            fill = asyncio.ensure_future(self._fill(redis_key, loader, entry))
+            self._flights[redis_key] = fill
+            fill.add_done_callback(partial(self._landed, redis_key))
+        elif entry is not None:
+            self._count("stale")
+            return entry.value
+        else:
+            self._count("coalesced")
+        return await asyncio.shield(fill)
+
+    def _landed(self, redis_key: str, fill: asyncio.Future) -> None:
+        self._flights.pop(redis_key, None)
+        if not fill.cancelled():
+            # Mark the error retrieved; the callers awaiting the fill re-raise it
+            fill.exception()
+
+    async def _fill(self, redis_key: str, loader: Callable[[], Awaitable[Any]], entry: Optional[_Entry]) -> Any:
+        token = secrets.token_hex(8)
+        try:
+            outcome, entry = await self._lock_or_wait(redis_key, token, entry)
+        except RedisError as e:
+            logger.warning(f"[CACHE] {self.name} unavailable, loading directly: {e}")
+            outcome = "fallback"
+        if outcome in ("stale", "waited"):
+            self._count(outcome)
+            return entry.value
+        if outcome != "locked":
+            self._count(outcome)
+            return await loader()
+
+        self._count("miss" if entry is None else "early")
+        try:
+            started = time.monotonic()
+            value = await loader()
+            delta = time.monotonic() - started
+            try:
+                await redis_client.set(redis_key, _encode(value, delta, self.ttl), px=int(self.ttl * 1000))
+            except RedisError as e:
+                logger.warning(f"[CACHE] Failed to store {redis_key}: {e}")
+            return value
+        finally:
+            try:
+                await _release(keys=[f"{redis_key}:lock"], args=[token])
+            except RedisError as e:
+                # The lock expires on its own after CACHE_FILL_LOCK_SECONDS
+                logger.warning(f"[CACHE] Failed to release {redis_key} fill lock: {e}")
+
+    async def _lock_or_wait(self, redis_key: str, token: str, entry: Optional[_Entry]) -> tuple[str, Optional[_Entry]]:
+        """Take the fill lock, or wait for the worker holding it to store the value"""
+        lock_key = f"{redis_key}:lock"
+        deadline = time.monotonic() + settings.CACHE_FILL_WAIT_SECONDS
+        while True:
+            if await redis_client.set(lock_key, token, nx=True, px=self._lock_ms()):
+                return "locked", entry
+            if entry is not None:
+                # Another worker is refreshing early; keep serving the current value
+                return "stale", entry
+            if time.monotonic() >= deadline:
+                logger.warning(f"[CACHE] Timed out waiting for another worker to fill {redis_key}")
+                return "timeout", None
+            await asyncio.sleep(settings.CACHE_FILL_POLL_SECONDS)
+            entry = _decode(await redis_client.get(redis_key))
+            if entry is not None:
+                return "waited", entry
+
+    async def invalidate(self, key: str) -> None:
+        await redis_client.delete(self._key(key))
+
+    # Sync (threadpool) callers
+
+    def get_or_load_sync(self, key: str, loader: Callable[[], Any]) -> Any:
+        redis_key = self._key(key)
+        try:
+            entry = _decode(redis_sync_client.get(redis_key))
+        except RedisError as e:
+            logger.warning(f"[CACHE] {self.name} unavailable, loading directly: {e}")
+            self._count("fallback")
+            return loader()
+        if entry is not None and self._fresh(entry):
+            self._count("hit")
+            return entry.value
+
+        with self._sync_lock:
+            flight = self._sync_flights.get(redis_key)
+            leader = flight is None
+            if leader:
+                flight = self._sync_flights[redis_key] = _Flight()
+        if not leader:
+            if entry is not None:
+                self._count("stale")
+                return entry.value
+            self._count("coalesced")
+            if not flight.done.wait(settings.CACHE_FILL_WAIT_SECONDS + settings.CACHE_FILL_LOCK_SECONDS):
+                self._count("timeout")
+                return loader()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._fill_sync(redis_key, loader, entry)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._sync_lock:
+                self._sync_flights.pop(redis_key, None)
+            flight.done.set()
+
+    def _fill_sync(self, redis_key: str, loader: Callable[[], Any], entry: Optional[_Entry]) -> Any:
+        token = secrets.token_hex(8)
+        try:
+            outcome, entry = self._lock_or_wait_sync(redis_key, token, entry)
+        except RedisError as e:
+            logger.warning(f"[CACHE] {self.name} unavailable, loading directly: {e}")
+            outcome = "fallback"
+        if outcome in ("stale", "waited"):
+            self._count(outcome)
+            return entry.value
+        if outcome != "locked":
+            self._count(outcome)
+            return loader()
+
+        self._count("miss" if entry is None else "early")
+        try:
+            started = time.monotonic()
+            value = loader()
+            delta = time.monotonic() - started
+            try:
+                redis_sync_client.set(redis_key, _encode(value, delta, self.ttl), px=int(self.ttl * 1000))
+            except RedisError as e:
+                logger.warning(f"[CACHE] Failed to store {redis_key}: {e}")
+            return value
+        finally:
+            try:
+                _release_sync(keys=[f"{redis_key}:lock"], args=[token])
+            except RedisError as e:
+                logger.warning(f"[CACHE] Failed to release {redis_key} fill lock: {e}")
+
+    def _lock_or_wait_sync(self, redis_key: str, token: str, entry: Optional[_Entry]) -> tuple[str, Optional[_Entry]]:
+        lock_key = f"{redis_key}:lock"
+        deadline = time.monotonic() + settings.CACHE_FILL_WAIT_SECONDS
+        while True:
+            if redis_sync_client.set(lock_key, token, nx=True, px=self._lock_ms()):
+                return "locked", entry
+            if entry is not None:
+                return "stale", entry
+            if time.monotonic() >= deadline:
+                logger.warning(f"[CACHE] Timed out waiting for another worker to fill {redis_key}")
+                return "timeout", None
+            time.sleep(settings.CACHE_FILL_POLL_SECONDS)
+            entry = _decode(redis_sync_client.get(redis_key))
+            if entry is not None:
+                return "waited", entry
+
+    def invalidate_sync(self, key: str) -> None:
+        redis_sync_client.delete(self._key(key))
@@ -0,0 +1,58 @@
+"""
+Application error types and their HTTP mapping
+"""
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+class AppError(Exception):
+    """Base error carrying the HTTP status it should be rendered with"""
+
+    status_code: int = 400
+    detail: str = "Bad request"
+
+    def __init__(self, detail: Optional[str] = None, *, headers: Optional[dict[str, str]] = None):
+        self.detail = detail or self.detail
+        self.headers = headers
+        super().__init__(self.detail)
+
+
+class NotModifiedError(AppError):
+    """Conditional GET whose If-None-Match still matches; rendered without a body"""
+
+    status_code = 304
+    detail = "Not modified"
+
+
+class ForbiddenError(AppError):
+    status_code = 403
+    detail = "Not enough permissions"
+
+
+class NotFoundError(AppError):
+    status_code = 404
+    detail = "Not found"
+
+
+class TooManyRequestsError(AppError):
+    status_code = 429
+    detail = "Too many requests"
+
+
+class ServiceUnavailableError(AppError):
+    status_code = 503
+    detail = "Service temporarily unavailable"
+
+
+def register_exception_handlers(app: FastAPI) -> None:
+    @app.exception_handler(AppError)
+    async def app_error_handler(request: Request, exc: AppError) -> Response:
+        if exc.status_code == 304:
+            return Response(status_code=304, headers=exc.headers)
+        return JSONResponse(
+            status_code=exc.status_code,
+            content={"detail": exc.detail},
+            headers=exc.headers,
+        )
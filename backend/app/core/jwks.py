@@ -0,0 +1,115 @@
+"""
+Offline verification of API access tokens
+
+Celery workers and agents verify tokens against the API's published JWKS
+instead of sharing SECRET_KEY or calling back into the API. Verifiers are
+cached per kid; an unknown kid triggers a refetch (rate limited), which is how
+consumers learn about rotated keys.
+"""
+import json
+import logging
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.jwt_backends import (
+    InvalidTokenError,
+    b64url_decode,
+    parse_segment,
+    split_token,
+    validate_claims,
+)
+from app.core.jwt_keys import VerificationKey
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSVerifier:
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        issuer: Optional[str] = None,
+        audience: Optional[str] = None,
+        min_refresh_seconds: float = 60,
+        timeout: float = 5,
+    ):
+        self.url = url
+        self.issuer = issuer
+        self.audience = audience
+        self.min_refresh_seconds = min_refresh_seconds
+        self.timeout = timeout
+        self._keys: Dict[str, VerificationKey] = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        # caller holds the lock
+        self._fetched_at = time.monotonic()
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            document = json.load(response)
+        keys = {}
+        for jwk in document.get("keys", []):
+            try:
+                key = VerificationKey.from_jwk(jwk)
+            except (KeyError, ValueError) as e:
+                logger.warning(f"[AUTH] Skipping unusable JWK {jwk.get('kid')!r}: {e}")
+                continue
+            keys[key.kid] = key
+        self._keys = keys
+
+    def _key_for(self, kid: Optional[str]) -> Optional[VerificationKey]:
+        key = self._keys.get(kid) if kid else None
+        if key is not None or not kid:
+            return key
+        with self._lock:
+            key = self._keys.get(kid)
+            if key is None and time.monotonic() - self._fetched_at >= self.min_refresh_seconds:
+                try:
+                    self._refresh()
+                except Exception as e:
+                    logger.warning(f"[AUTH] JWKS fetch from {self.url} failed: {e}")
+                key = self._keys.get(kid)
+            return key
+
+    def verify(self, token: str, *, expect_type: Optional[str] = "access") -> Dict[str, Any]:
+        """Return the verified claims; raises the app.core.jwt_backends errors"""
+        signing_input, header_segment, signature = split_token(token)
+        header = parse_segment(header_segment)
+        key = self._key_for(header.get("kid"))
+        if key is None or header.get("alg") != key.alg:
+            raise InvalidTokenError("Unknown signing key")
+        try:
+            valid = key.verify(signing_input, b64url_decode(signature))
+        except (ValueError, TypeError) as e:
+            raise InvalidTokenError(f"Malformed token: {e}")
+        if not valid:
+            raise InvalidTokenError("Signature verification failed")
+        claims = validate_claims(
+            parse_segment(signing_input.split(b".", 1)[1]),
+            issuer=self.issuer,
+            audience=self.audience,
+        )
+        if expect_type and claims.get("type") != expect_type:
+            raise InvalidTokenError("Invalid token type")
+        return claims
+
+
+_verifier: Optional[JWKSVerifier] = None
+
+
+def get_verifier() -> JWKSVerifier:
+    """Process-wide verifier for settings.JWKS_URL"""
+    global _verifier
+    if _verifier is None:
+        if not settings.JWKS_URL:
+            raise RuntimeError("JWKS_URL is not configured")
+        _verifier = JWKSVerifier(
+            settings.JWKS_URL,
+            issuer=settings.JWT_ISSUER or None,
+            audience=settings.JWT_AUD or None,
+        )
+    return _verifier
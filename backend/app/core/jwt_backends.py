@@ -0,0 +1,305 @@
+"""
+JWT encode/decode backends
+
+`app.core.security` builds one backend at import, selected by
+settings.JWT_BACKEND:
+
+- "jose":   python-jose (the historical implementation)
+- "pyjwt":  PyJWT, if installed
+- "native": HS256 only, implemented with hmac/hashlib and a precomputed key
+- "asymmetric": EdDSA/ES256 with a rotating key ring (see app.core.jwt_keys)
+
+All backends produce interchangeable tokens and raise the errors below, which
+`security._decode_token` maps onto TokenError.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+
+class ExpiredTokenError(Exception):
+    pass
+
+
+class InvalidClaimsError(Exception):
+    pass
+
+
+class InvalidTokenError(Exception):
+    pass
+
+
+class JWTBackend(ABC):
+    """Encode/verify tokens with a fixed key, algorithm, issuer and audience"""
+
+    name = "base"
+
+    def __init__(
+        self,
+        *,
+        key: str,
+        algorithm: str,
+        issuer: Optional[str],
+        audience: Optional[str],
+        **options: Any,
+    ):
+        self.key = key
+        self.algorithm = algorithm
+        self.issuer = issuer
+        self.audience = audience
+        # Backend-specific settings (e.g. the key ring location); ignored by others.
+        self.options = options
+
+    @abstractmethod
+    def encode(self, claims: Dict[str, Any]) -> str:
+        """Sign `claims` into a compact JWS"""
+
+    @abstractmethod
+    def decode(self, token: str) -> Dict[str, Any]:
+        """Verify `token` and return its claims, raising the errors above"""
+
+    def jwks(self) -> Dict[str, Any]:
+        """Public verification keys; shared-secret backends publish none"""
+        return {"keys": []}
+
+
+class JoseBackend(JWTBackend):
+    name = "jose"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        from jose import jwt
+
+        self._jwt = jwt
+        self._algorithms = [self.algorithm]
+        self._options = {"verify_aud": bool(self.audience)}
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        return self._jwt.encode(claims, self.key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+
+        try:
+            return self._jwt.decode(
+                token,
+                self.key,
+                algorithms=self._algorithms,
+                options=self._options,
+                issuer=self.issuer,
+                audience=self.audience,
+            )
+        except ExpiredSignatureError as e:
+            raise ExpiredTokenError(str(e))
+        except JWTClaimsError as e:
+            raise InvalidClaimsError(str(e))
+        except JWTError as e:
+            raise InvalidTokenError(str(e))
+
+
+class PyJWTBackend(JWTBackend):
+    name = "pyjwt"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import jwt
+        except ImportError as e:
+            raise RuntimeError("JWT_BACKEND=pyjwt requires the PyJWT package") from e
+
+        self._jwt = jwt
+        self._algorithms = [self.algorithm]
+        self._options = {"verify_aud": bool(self.audience)}
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        return self._jwt.encode(claims, self.key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        jwt = self._jwt
+        try:
+            return jwt.decode(
+                token,
+                self.key,
+                algorithms=self._algorithms,
+                options=self._options,
+                issuer=self.issuer,
+                audience=self.audience,
+            )
+        except jwt.ExpiredSignatureError as e:
+            raise ExpiredTokenError(str(e))
+        except (
+            jwt.InvalidAudienceError,
+            jwt.InvalidIssuerError,
+            jwt.ImmatureSignatureError,
+            jwt.MissingRequiredClaimError,
+        ) as e:
+            raise InvalidClaimsError(str(e))
+        except jwt.InvalidTokenError as e:
+            raise InvalidTokenError(str(e))
+
+
+def b64url_encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64url_decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+def split_token(token: str) -> tuple[bytes, bytes, bytes]:
+    """Return (signing input, header segment, signature) of a compact JWS"""
+    try:
+        raw = token.encode("ascii")
+        signing_input, signature = raw.rsplit(b".", 1)
+        header, _ = signing_input.split(b".")
+    except (ValueError, UnicodeError) as e:
+        raise InvalidTokenError(f"Malformed token: {e}")
+    return signing_input, header, signature
+
+
+def parse_segment(segment: bytes) -> Dict[str, Any]:
+    try:
+        value = json.loads(b64url_decode(segment))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidTokenError(f"Malformed token: {e}")
+    if not isinstance(value, dict):
+        raise InvalidTokenError("Malformed token segment")
+    return value
+
+
+def validate_claims(claims: Dict[str, Any], *, issuer: Optional[str], audience: Optional[str]) -> Dict[str, Any]:
+    """Check exp/nbf/iss/aud the way python-jose does"""
+    now = time.time()
+    try:
+        if "exp" in claims and now >= float(claims["exp"]):
+            raise ExpiredTokenError("Signature has expired.")
+        if "nbf" in claims and now < float(claims["nbf"]):
+            raise InvalidClaimsError("The token is not yet valid (nbf)")
+    except (TypeError, ValueError):
+        raise InvalidClaimsError("Invalid exp/nbf claim")
+    if issuer is not None and claims.get("iss") != issuer:
+        raise InvalidClaimsError("Invalid issuer")
+    if audience is not None:
+        aud = claims.get("aud")
+        audiences = aud if isinstance(aud, list) else [aud]
+        if audience not in audiences:
+            raise InvalidClaimsError("Invalid audience")
+    return claims
+
+
+class NativeHS256Backend(JWTBackend):
+    """HS256 with an HMAC object keyed once and copied per token"""
+
+    name = "native"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.algorithm != "HS256":
+            raise RuntimeError("JWT_BACKEND=native only supports HS256")
+        self._mac = hmac.new(self.key.encode(), digestmod=hashlib.sha256)
+        self._header = b64url_encode(b'{"alg":"HS256","typ":"JWT"}')
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        payload = b64url_encode(json.dumps(claims, separators=(",", ":")).encode())
+        signing_input = self._header + b"." + payload
+        return (signing_input + b"." + b64url_encode(self._sign(signing_input))).decode()
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        signing_input, header, signature = split_token(token)
+        # Tokens from other encoders may order header keys differently.
+        if header != self._header and parse_segment(header).get("alg") != "HS256":
+            raise InvalidTokenError("The specified alg value is not allowed")
+        try:
+            valid = hmac.compare_digest(self._sign(signing_input), b64url_decode(signature))
+        except (ValueError, TypeError) as e:
+            raise InvalidTokenError(f"Malformed token: {e}")
+        if not valid:
+            raise InvalidTokenError("Signature verification failed")
+        claims = parse_segment(signing_input.split(b".", 1)[1])
+        return validate_claims(claims, issuer=self.issuer, audience=self.audience)
+
+
+class AsymmetricBackend(JWTBackend):
+    """
+    EdDSA / ES256 tokens signed with the active key of a key ring.
+
+    Tokens carry the signing key id in the `kid` header; any key still in the
+    ring verifies, so retired keys keep working until their tokens expire.
+    With `accept_hs256`, tokens signed with SECRET_KEY before the switch stay
+    valid as well.
+    """
+
+    name = "asymmetric"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        from app.core.jwt_keys import KeyRing
+
+        keys_dir = self.options.get("keys_dir")
+        if not keys_dir:
+            raise RuntimeError("JWT_BACKEND=asymmetric requires JWT_KEYS_DIR")
+        self.keyring = KeyRing.load(keys_dir, signing_kid=self.options.get("signing_kid"))
+        self._legacy = None
+        if self.options.get("accept_hs256"):
+            self._legacy = NativeHS256Backend(
+                key=self.key, algorithm="HS256", issuer=self.issuer, audience=self.audience
+            )
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        signing_key = self.keyring.signing_key
+        payload = b64url_encode(json.dumps(claims, separators=(",", ":")).encode())
+        signing_input = signing_key.header_segment + b"." + payload
+        return (signing_input + b"." + b64url_encode(signing_key.sign(signing_input))).decode()
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        signing_input, header_segment, signature = split_token(token)
+        header = parse_segment(header_segment)
+        if header.get("alg") == "HS256" and self._legacy is not None:
+            return self._legacy.decode(token)
+        key = self.keyring.get(header.get("kid"))
+        if key is None or header.get("alg") != key.alg:
+            raise InvalidTokenError("Unknown signing key")
+        try:
+            valid = key.verify(signing_input, b64url_decode(signature))
+        except (ValueError, TypeError) as e:
+            raise InvalidTokenError(f"Malformed token: {e}")
+        if not valid:
+            raise InvalidTokenError("Signature verification failed")
+        claims = parse_segment(signing_input.split(b".", 1)[1])
+        return validate_claims(claims, issuer=self.issuer, audience=self.audience)
+
+    def jwks(self) -> Dict[str, Any]:
+        return self.keyring.jwks()
+
+
+BACKENDS = {
+    JoseBackend.name: JoseBackend,
+    PyJWTBackend.name: PyJWTBackend,
+    NativeHS256Backend.name: NativeHS256Backend,
+    AsymmetricBackend.name: AsymmetricBackend,
+}
+
+
+def build_backend(
+    name: str,
+    *,
+    key: str,
+    algorithm: str,
+    issuer: Optional[str],
+    audience: Optional[str],
+    **options: Any,
+) -> JWTBackend:
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise RuntimeError(f"Unknown JWT_BACKEND {name!r}; expected one of {sorted(BACKENDS)}")
+    return backend_cls(key=key, algorithm=algorithm, issuer=issuer, audience=audience, **options)
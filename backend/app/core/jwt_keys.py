@@ -0,0 +1,141 @@
+"""
+Asymmetric JWT signing keys
+
+A key ring is a directory of PEM files named `<kid>.pem`. Files holding a
+private key can sign; files holding only a public key verify tokens issued
+before a rotation. The algorithm follows from the key type:
+
+- Ed25519      -> EdDSA
+- EC P-256     -> ES256 (raw r || s signatures, as JWS requires)
+
+Rotation: add the new key, wait for JWKS caches to pick it up
+(JWKS_CACHE_SECONDS), switch JWT_SIGNING_KID, and replace the old private key
+with its public half once refresh tokens signed by it have expired.
+"""
+import json
+import os
+from typing import Any, Dict, Optional
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature, encode_dss_signature
+
+from app.core.jwt_backends import b64url_decode, b64url_encode
+
+_ES256_COORD_SIZE = 32
+
+
+class VerificationKey:
+    """Public key of a ring entry; also built from a JWK on the consumer side"""
+
+    def __init__(self, kid: str, public_key):
+        self.kid = kid
+        self.public_key = public_key
+        if isinstance(public_key, Ed25519PublicKey):
+            self.alg = "EdDSA"
+        elif isinstance(public_key, ec.EllipticCurvePublicKey) and isinstance(public_key.curve, ec.SECP256R1):
+            self.alg = "ES256"
+        else:
+            raise ValueError(f"Unsupported key type for kid {kid!r}; use Ed25519 or EC P-256")
+
+    def verify(self, signing_input: bytes, signature: bytes) -> bool:
+        try:
+            if self.alg == "EdDSA":
+                self.public_key.verify(signature, signing_input)
+            else:
+                if len(signature) != 2 * _ES256_COORD_SIZE:
+                    return False
+                der = encode_dss_signature(
+                    int.from_bytes(signature[:_ES256_COORD_SIZE], "big"),
+                    int.from_bytes(signature[_ES256_COORD_SIZE:], "big"),
+                )
+                self.public_key.verify(der, signing_input, ec.ECDSA(hashes.SHA256()))
+        except InvalidSignature:
+            return False
+        return True
+
+    def to_jwk(self) -> Dict[str, str]:
+        jwk = {"kid": self.kid, "alg": self.alg, "use": "sig"}
+        if self.alg == "EdDSA":
+            raw = self.public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+            jwk.update(kty="OKP", crv="Ed25519", x=b64url_encode(raw).decode())
+        else:
+            numbers = self.public_key.public_numbers()
+            jwk.update(
+                kty="EC",
+                crv="P-256",
+                x=b64url_encode(numbers.x.to_bytes(_ES256_COORD_SIZE, "big")).decode(),
+                y=b64url_encode(numbers.y.to_bytes(_ES256_COORD_SIZE, "big")).decode(),
+            )
+        return jwk
+
+    @classmethod
+    def from_jwk(cls, jwk: Dict[str, Any]) -> "VerificationKey":
+        kty, crv = jwk.get("kty"), jwk.get("crv")
+        if kty == "OKP" and crv == "Ed25519":
+            public_key = Ed25519PublicKey.from_public_bytes(b64url_decode(jwk["x"].encode()))
+        elif kty == "EC" and crv == "P-256":
+            public_key = ec.EllipticCurvePublicNumbers(
+                int.from_bytes(b64url_decode(jwk["x"].encode()), "big"),
+                int.from_bytes(b64url_decode(jwk["y"].encode()), "big"),
+                ec.SECP256R1(),
+            ).public_key()
+        else:
+            raise ValueError(f"Unsupported JWK {kty}/{crv}")
+        return cls(jwk["kid"], public_key)
+
+
+class SigningKey(VerificationKey):
+
+    def __init__(self, kid: str, private_key):
+        super().__init__(kid, private_key.public_key())
+        self.private_key = private_key
+        # The header never changes for a key, so it is encoded once.
+        header = {"alg": self.alg, "kid": kid, "typ": "JWT"}
+        self.header_segment = b64url_encode(json.dumps(header, separators=(",", ":")).encode())
+
+    def sign(self, signing_input: bytes) -> bytes:
+        if self.alg == "EdDSA":
+            return self.private_key.sign(signing_input)
+        r, s = decode_dss_signature(self.private_key.sign(signing_input, ec.ECDSA(hashes.SHA256())))
+        return r.to_bytes(_ES256_COORD_SIZE, "big") + s.to_bytes(_ES256_COORD_SIZE, "big")
+
+
+class KeyRing:
+    """The active signing key plus every key still accepted for verification"""
+
+    def __init__(self, signing_key: SigningKey, keys: Dict[str, VerificationKey]):
+        self.signing_key = signing_key
+        self.keys = keys
+
+    def get(self, kid: Optional[str]) -> Optional[VerificationKey]:
+        return self.keys.get(kid) if kid else None
+
+    def jwks(self) -> Dict[str, Any]:
+        return {"keys": [key.to_jwk() for key in self.keys.values()]}
+
+    @classmethod
+    def load(cls, keys_dir: str, *, signing_kid: Optional[str]) -> "KeyRing":
+        keys: Dict[str, VerificationKey] = {}
+        for filename in sorted(os.listdir(keys_dir)):
+            if not filename.endswith(".pem"):
+                continue
+            kid = filename[: -len(".pem")]
+            with open(os.path.join(keys_dir, filename), "rb") as f:
+                pem = f.read()
+            if b"PRIVATE KEY" in pem:
+                private_key = serialization.load_pem_private_key(pem, password=None)
+                if not isinstance(private_key, (Ed25519PrivateKey, ec.EllipticCurvePrivateKey)):
+                    raise RuntimeError(f"Unsupported key type in {filename}; use Ed25519 or EC P-256")
+                keys[kid] = SigningKey(kid, private_key)
+            else:
+                keys[kid] = VerificationKey(kid, serialization.load_pem_public_key(pem))
+
+        if not signing_kid:
+            raise RuntimeError("JWT_SIGNING_KID must name the active key in JWT_KEYS_DIR")
+        signing_key = keys.get(signing_kid)
+        if not isinstance(signing_key, SigningKey):
+            raise RuntimeError(f"No private key for JWT_SIGNING_KID {signing_kid!r} in {keys_dir}")
+        return cls(signing_key, keys)
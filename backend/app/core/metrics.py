@@ -0,0 +1,192 @@
+"""
+Prometheus metrics shared across the application
+
+uvicorn runs several worker processes, so when PROMETHEUS_MULTIPROC_DIR is set
+the /metrics endpoint aggregates the per-process files instead of exposing the
+registry of whichever worker happened to receive the scrape.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+# Password hashing
+PASSWORD_HASH_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds",
+    "Time a password hashing job waited for a free hashing thread",
+    ["op"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent computing a password hash or verification",
+    ["op"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2),
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Password hashing jobs shed because the executor was saturated",
+    ["op", "reason"],
+)
+PASSWORD_HASH_PENDING = Gauge(
+    "password_hash_pending",
+    "Password hashing jobs queued or running",
+    multiprocess_mode="livesum",
+)
+PASSWORD_VERIFY_DURATION = Histogram(
+    "password_verify_duration_seconds",
+    "Password verification time by the scheme of the stored hash",
+    ["scheme"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2),
+)
+PASSWORD_REHASHED = Counter(
+    "password_rehashed_total",
+    "Stored password hashes upgraded on login, by the scheme of the new hash",
+    ["scheme"],
+)
+PASSWORD_HASH_COST = Gauge(
+    "password_hash_cost",
+    "Cost parameters chosen by startup calibration",
+    ["scheme", "parameter"],
+    multiprocess_mode="max",
+)
+PASSWORD_HASH_CALIBRATED_SECONDS = Gauge(
+    "password_hash_calibrated_seconds",
+    "Measured hash time at the calibrated cost",
+    ["scheme"],
+    multiprocess_mode="max",
+)
+
+# Authentication
+PRINCIPAL_CACHE_REQUESTS = Counter(
+    "principal_cache_requests_total",
+    "Principal cache lookups by result",
+    ["result"],
+)
+
+TOKEN_REVOCATION_CHECKS = Counter(
+    "token_revocation_checks_total",
+    "Token revocation checks by outcome (false_positive = Bloom hit not in Redis)",
+    ["result"],
+)
+TOKEN_REVOCATION_FILTER_ENTRIES = Gauge(
+    "token_revocation_filter_entries",
+    "Revoked token ids loaded into the local Bloom filter",
+    multiprocess_mode="max",
+)
+TOKEN_REVOCATION_FILTER_FPR = Gauge(
+    "token_revocation_filter_estimated_fpr",
+    "Estimated false positive rate of the local Bloom filter",
+    multiprocess_mode="max",
+)
+
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total",
+    "Requests rejected by a rate limiter (source=local: in-process pre-check, redis: GCRA)",
+    ["limiter", "source"],
+)
+
+
+# Database connection pools (per worker: "liveall" keeps one series per pid)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size",
+    "Configured pool_size of the engine's connection pool",
+    ["engine"],
+    multiprocess_mode="liveall",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ["engine"],
+    multiprocess_mode="liveall",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Overflow connections open beyond pool_size (negative while the pool is still filling)",
+    ["engine"],
+    multiprocess_mode="liveall",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection, including connecting",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Checkouts that gave up after pool_timeout",
+    ["engine"],
+)
+
+# Read replicas
+DB_REPLICA_LAG_SECONDS = Gauge(
+    "db_replica_lag_seconds",
+    "Replay lag of a read replica at its last health check",
+    ["replica"],
+    multiprocess_mode="max",
+)
+DB_REPLICA_EJECTIONS = Counter(
+    "db_replica_ejections_total",
+    "Times a replica was taken out of rotation after a failed check or connection error",
+    ["replica"],
+)
+DB_READS_ROUTED = Counter(
+    "db_reads_routed_total",
+    "Read-only requests by the server they read from",
+    ["target"],
+)
+
+# Per-request SQL (route = "<METHOD> <path template>")
+DB_REQUEST_QUERIES = Histogram(
+    "db_request_queries",
+    "SQL statements issued while serving one request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+DB_REQUEST_SECONDS = Histogram(
+    "db_request_seconds",
+    "Time spent executing SQL while serving one request",
+    ["route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+DB_N_PLUS_ONE = Counter(
+    "db_n_plus_one_total",
+    "Requests in which one statement fingerprint repeated QUERY_N_PLUS_ONE_THRESHOLD times or more",
+    ["route"],
+)
+DB_QUERY_BUDGET_EXCEEDED = Counter(
+    "db_query_budget_exceeded_total",
+    "Requests that issued more statements than their endpoint's declared budget",
+    ["route"],
+)
+
+SERVICE_TYPE_CATALOG_RELOADS = Counter(
+    "service_type_catalog_reloads_total",
+    "Reloads of the in-process service type catalog",
+    ["reason"],
+)
+
+# Shared caches (app.core.cache)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Shared cache lookups by result (miss and early = this caller ran the loader)",
+    ["cache", "result"],
+)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Return the exposition payload and its content type"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,89 +1,139 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from jose import JWTError
-from app.core.security import decode_access_token
-from crud.user import crud_user
-from db.session import SessionLocal
-from logger import logger
-from services.token_blacklist import is_blacklisted
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from starlette.responses import Response
-
-
-
-class AuthMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
-
-    async def dispatch(self, request: Request, call_next):
-        request.state.user = None
+"""
+Pure ASGI middlewares
 
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            return await call_next(request)
+The middlewares wrap the ASGI callable directly instead of going through
+BaseHTTPMiddleware, which spawns an extra task per request and buffers
+streaming responses.
+"""
+import logging
+from typing import Optional
 
-        token = auth_header.split(" ", 1)[1]
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-        if await is_blacklisted(token):
-            logger.warning("[AUTH] Blacklisted token used")
-            return await call_next(request)
+from app.api.deps import resolve_principal
+from app.core.config import settings
+from app.core.principal_cache import Principal
+from app.db.query_stats import report, route_label, track_queries
 
-        try:
-            payload = decode_access_token(token)
-            user_id: int | None = payload.get("sub")
-            if not user_id:
-                return await call_next(request)
+logger = logging.getLogger(__name__)
 
-            db = SessionLocal()
-            try:
-                user = crud_user.get(db, id=user_id)
-                # Only set user if exists and is active
-                if user and getattr(user, "is_active", True):
-                    request.state.user = user
-                else:
-                    request.state.user = None
-            finally:
-                db.close()
 
-        except JWTError as e:
-            logger.warning(f"[AUTH] Invalid token: {e}")
-        except Exception as e:
-            logger.error(f"[AUTH] Unexpected error: {e}")
+class AuthMiddleware:
+    """
+    Resolve the Bearer token into a Principal and attach it as
+    `scope["state"]["user"]` (i.e. `request.state.user`), or None.
 
-        return await call_next(request)
+    Cache hits never leave the event loop; misses load the principal on the
+    threadpool.
+    """
 
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["user"] = await self._resolve(scope)
+        await self.app(scope, receive, send)
+
+    async def _resolve(self, scope: Scope) -> Optional[Principal]:
+        token = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                if value[:7].lower() == b"bearer ":
+                    token = value[7:].decode("latin-1")
+                break
+        if not token:
+            return None
+
+        principal = await resolve_principal(token)
+        # Only set user if active
+        if principal is None or not principal.is_active:
+            return None
+        return principal
+
+
+_CSP_POLICY = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
+    "style-src 'self' 'unsafe-inline'; "
+    "img-src 'self' data: https:; "
+    "font-src 'self' data:; "
+    "connect-src 'self' https:; "
+    "frame-ancestors 'none'; "
+    "base-uri 'self'; "
+    "form-action 'self';"
+)
+
+# Encoded once at import; appended verbatim to every response.
+_SECURITY_HEADERS: list[tuple[bytes, bytes]] = [
+    (name.lower().encode("latin-1"), value.encode("latin-1"))
+    for name, value in (
+        ("Content-Security-Policy", _CSP_POLICY),
+        ("X-Content-Type-Options", "nosniff"),
+        ("X-Frame-Options", "DENY"),
+        ("X-XSS-Protection", "1; mode=block"),
+        ("Referrer-Policy", "strict-origin-when-cross-origin"),
+        ("Permissions-Policy", "geolocation=(), microphone=(), camera=()"),
+    )
+]
+_HSTS_HEADER = (b"strict-transport-security", b"max-age=31536000; includeSubDomains")
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in _SECURITY_HEADERS) | {_HSTS_HEADER[0]}
+
+
+class SecurityHeadersMiddleware:
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        extra = _SECURITY_HEADERS
+        if scope.get("scheme") == "https":
+            extra = extra + [_HSTS_HEADER]
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = [
+                    header
+                    for header in message.get("headers", ())
+                    if header[0].lower() not in _SECURITY_HEADER_NAMES
+                ]
+                headers.extend(extra)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+class QueryStatsMiddleware:
+    """
+    Count the SQL issued while serving a request, across auth, dependencies and
+    the endpoint. Reported in a `Server-Timing: db;dur=...` header and in the
+    db_request_* metrics, with warnings for N+1 patterns and budget overruns
+    (see app.db.query_stats).
+    """
 
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
-
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-
-        csp_policy = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
-            "style-src 'self' 'unsafe-inline'; "
-            "img-src 'self' data: https:; "
-            "font-src 'self' data:; "
-            "connect-src 'self' https:; "
-            "frame-ancestors 'none'; "
-            "base-uri 'self'; "
-            "form-action 'self';"
-        )
-
-        response.headers["Content-Security-Policy"] = csp_policy
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-
-        if request.url.scheme == "https":
-            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-
-        return response
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(scope) as stats:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start" and settings.SERVER_TIMING_ENABLED:
+                    headers = list(message.get("headers", ()))
+                    headers.append((b"server-timing", stats.server_timing().encode()))
+                    message["headers"] = headers
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                report(stats, route_label(scope))
@@ -0,0 +1,185 @@
+"""
+Per-worker cache of verified principals
+
+`get_current_user` used to load the full `User` row on every authenticated
+request. Verified tokens are now mapped (by digest) to a slim, immutable
+`Principal` for a short TTL. Workers drop entries for a user as soon as any
+worker publishes an invalidation on Redis, e.g. after deactivation or a
+superuser promotion.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from app.core.config import settings
+from app.core.metrics import PRINCIPAL_CACHE_REQUESTS
+from app.core.redis import redis_client, redis_sync_client
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "auth:principal-invalidate"
+
+
+class Principal:
+    """Immutable view of an authenticated user
+
+    `project_roles` holds the project -> role claims embedded in the access
+    token, or None when the token carries none (or they are stale).
+    """
+
+    __slots__ = ("id", "is_active", "is_superuser", "project_roles", "membership_version")
+
+    def __init__(
+        self,
+        id: int,
+        is_active: bool,
+        is_superuser: bool,
+        project_roles: Optional[Mapping[int, str]] = None,
+        membership_version: Optional[int] = None,
+    ):
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "is_active", is_active)
+        object.__setattr__(self, "is_superuser", is_superuser)
+        object.__setattr__(
+            self,
+            "project_roles",
+            MappingProxyType(dict(project_roles)) if project_roles is not None else None,
+        )
+        object.__setattr__(self, "membership_version", membership_version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Principal is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Principal is immutable")
+
+    def __repr__(self) -> str:
+        return f"<Principal id={self.id} active={self.is_active} superuser={self.is_superuser}>"
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(id=user.id, is_active=bool(user.is_active), is_superuser=bool(user.is_superuser))
+
+    def without_project_roles(self) -> "Principal":
+        if self.project_roles is None:
+            return self
+        return Principal(id=self.id, is_active=self.is_active, is_superuser=self.is_superuser)
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class PrincipalCache:
+    """Thread-safe LRU + TTL cache keyed by token digest"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, tuple[Principal, float]]" = OrderedDict()
+        self._by_user: dict[int, set[bytes]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes) -> Optional[Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                PRINCIPAL_CACHE_REQUESTS.labels(result="hit").inc()
+                return entry[0]
+            if entry is not None:
+                self._discard(digest)
+            self.misses += 1
+        PRINCIPAL_CACHE_REQUESTS.labels(result="miss").inc()
+        return None
+
+    def put(self, digest: bytes, principal: Principal, *, expires_at: Optional[float] = None) -> None:
+        """Cache a principal; `expires_at` (epoch seconds) caps the TTL at token expiry"""
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            if digest in self._entries:
+                self._discard(digest)
+            self._entries[digest] = (principal, time.monotonic() + ttl)
+            self._by_user.setdefault(principal.id, set()).add(digest)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for digest in list(self._by_user.get(user_id, ())):
+                self._discard(digest)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _discard(self, digest: bytes) -> None:
+        # caller holds the lock
+        principal, _ = self._entries.pop(digest)
+        digests = self._by_user.get(principal.id)
+        if digests is not None:
+            digests.discard(digest)
+            if not digests:
+                del self._by_user[principal.id]
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def publish_invalidation(user_id: int) -> None:
+    """Tell every worker (this one included) to forget cached principals of a user"""
+    principal_cache.invalidate_user(user_id)
+    try:
+        redis_sync_client.publish(INVALIDATION_CHANNEL, str(user_id))
+    except Exception as e:
+        # Other workers fall back to the TTL; log loudly since this delays revocation.
+        logger.error(f"[AUTH] Failed to publish principal invalidation for user {user_id}: {e}")
+
+
+async def listen_for_invalidations() -> None:
+    """Consume invalidations published by other workers; runs for the app lifetime"""
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Anything cached while we were disconnected may have missed a message.
+            principal_cache.clear()
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    principal_cache.invalidate_user(int(message["data"]))
+                except (TypeError, ValueError):
+                    logger.warning(f"[AUTH] Ignoring malformed invalidation: {message['data']!r}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[AUTH] Principal invalidation listener disconnected: {e}")
+            principal_cache.clear()
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
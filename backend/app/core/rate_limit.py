@@ -0,0 +1,135 @@
+"""
+Redis-backed rate limiting (GCRA)
+
+Each limiter allows `limit` requests per `period` seconds per key, with bursts
+of up to `limit`. The decision runs as one Lua script against Redis so that all
+workers share the budget, and it uses the Redis clock so worker clock skew does
+not matter.
+
+A rejected key is remembered in-process until its retry time, so a client that
+keeps hammering after a 429 is turned away without a Redis round trip.
+Redis errors fail open: the auth endpoints stay usable, just unthrottled.
+"""
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request
+
+from app.core.config import settings
+from app.core.errors import TooManyRequestsError
+from app.core.metrics import RATE_LIMIT_REJECTIONS
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = bucket key; ARGV[1] = emission interval (ms), ARGV[2] = burst tolerance (ms)
+# Returns {allowed, retry_after_ms}.
+_GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local allow_at = tat - tolerance
+if now < allow_at then
+    return {0, allow_at - now}
+end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, 0}
+"""
+
+_gcra = redis_client.register_script(_GCRA_SCRIPT)
+
+
+class RateLimiter:
+    """
+    GCRA limiter; `await limiter.hit(key)` raises TooManyRequestsError.
+
+    Used directly as a dependency, it limits by client IP.
+    """
+
+    def __init__(self, name: str, *, limit: int, period: float):
+        self.name = name
+        self.limit = limit
+        self.interval_ms = max(1, int(period * 1000 / max(limit, 1)))
+        self.tolerance_ms = int(period * 1000) - self.interval_ms
+        self._blocked_until: "OrderedDict[str, float]" = OrderedDict()
+
+    def _reject(self, source: str, retry_after: float) -> TooManyRequestsError:
+        RATE_LIMIT_REJECTIONS.labels(limiter=self.name, source=source).inc()
+        return TooManyRequestsError(headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    def _block_locally(self, key: str, until: float) -> None:
+        blocked = self._blocked_until
+        blocked[key] = until
+        blocked.move_to_end(key)
+        while len(blocked) > settings.RATE_LIMIT_LOCAL_ENTRIES:
+            blocked.popitem(last=False)
+
+    async def hit(self, key: str) -> None:
+        if not settings.RATE_LIMIT_ENABLED or self.limit <= 0:
+            return
+
+        now = time.monotonic()
+        until = self._blocked_until.get(key)
+        if until is not None:
+            if until > now:
+                raise self._reject("local", until - now)
+            del self._blocked_until[key]
+
+        try:
+            allowed, retry_after_ms = await _gcra(
+                keys=[f"ratelimit:{self.name}:{key}"],
+                args=[self.interval_ms, self.tolerance_ms],
+            )
+        except Exception as e:
+            logger.warning(f"[RATE_LIMIT] {self.name} check unavailable, allowing request: {e}")
+            return
+        if not int(allowed):
+            retry_after = int(retry_after_ms) / 1000
+            self._block_locally(key, now + retry_after)
+            raise self._reject("redis", retry_after)
+
+    async def __call__(self, request: Request) -> None:
+        await self.hit(client_ip(request))
+
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy, uvicorn's --proxy-headers puts the real client here.
+    return request.client.host if request.client else "unknown"
+
+
+def account_key(identifier: Optional[str]) -> str:
+    """Stable key for a login name that keeps raw emails out of Redis"""
+    normalized = (identifier or "").strip().lower()
+    return hashlib.sha256(normalized.encode()).hexdigest()[:32]
+
+
+login_ip_limiter = RateLimiter(
+    "login_ip",
+    limit=settings.RATE_LIMIT_LOGIN_PER_IP,
+    period=settings.RATE_LIMIT_PERIOD_SECONDS,
+)
+login_account_limiter = RateLimiter(
+    "login_account",
+    limit=settings.RATE_LIMIT_LOGIN_PER_ACCOUNT,
+    period=settings.RATE_LIMIT_PERIOD_SECONDS,
+)
+register_ip_limiter = RateLimiter(
+    "register_ip",
+    limit=settings.RATE_LIMIT_REGISTER_PER_IP,
+    period=settings.RATE_LIMIT_PERIOD_SECONDS,
+)
+refresh_ip_limiter = RateLimiter(
+    "refresh_ip",
+    limit=settings.RATE_LIMIT_REFRESH_PER_IP,
+    period=settings.RATE_LIMIT_PERIOD_SECONDS,
+)
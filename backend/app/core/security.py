@@ -1,15 +1,43 @@
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional, Union
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar, Union
 from uuid import uuid4
 
-from jose import jwt
-from jose.exceptions import JWTError, ExpiredSignatureError, JWTClaimsError
 from passlib.context import CryptContext
+from redis.exceptions import RedisError
 
 from app.core.config import settings
+from app.core.errors import ServiceUnavailableError
+from app.core.jwt_backends import (
+    ExpiredTokenError,
+    InvalidClaimsError,
+    InvalidTokenError,
+    build_backend,
+)
+from app.core.metrics import (
+    PASSWORD_HASH_CALIBRATED_SECONDS,
+    PASSWORD_HASH_COST,
+    PASSWORD_HASH_DURATION,
+    PASSWORD_HASH_PENDING,
+    PASSWORD_HASH_QUEUE_WAIT,
+    PASSWORD_HASH_REJECTED,
+    PASSWORD_REHASHED,
+    PASSWORD_VERIFY_DURATION,
+)
+from app.core.redis import redis_sync_client
+
+logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+T = TypeVar("T")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -19,10 +47,280 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password; on success also return a new hash when the stored one
+    uses a deprecated scheme or weaker cost than currently configured.
+    """
+    scheme = pwd_context.identify(hashed_password) or "unknown"
+    started = time.perf_counter()
+    try:
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    finally:
+        PASSWORD_VERIFY_DURATION.labels(scheme=scheme).observe(time.perf_counter() - started)
+
+
+def _time_hash(handler, **params) -> float:
+    """Best-of-three wall time of one hash with the given parameters"""
+    configured = handler.using(**params)
+    best = math.inf
+    for _ in range(3):
+        started = time.perf_counter()
+        configured.hash("calibration-password")
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _calibrate_bcrypt(target: float) -> Tuple[int, float]:
+    from passlib.hash import bcrypt
+
+    low, high = settings.PASSWORD_BCRYPT_MIN_ROUNDS, settings.PASSWORD_BCRYPT_MAX_ROUNDS
+    if settings.PASSWORD_BCRYPT_ROUNDS:
+        rounds = settings.PASSWORD_BCRYPT_ROUNDS
+        return rounds, _time_hash(bcrypt, rounds=rounds)
+
+    # Each extra round doubles the work, so one measurement at the floor
+    # predicts the rest; step down if the prediction overshoots.
+    elapsed = _time_hash(bcrypt, rounds=low)
+    rounds = low + max(0, int(math.log2(target / elapsed))) if elapsed > 0 else low
+    rounds = min(rounds, high)
+    elapsed = _time_hash(bcrypt, rounds=rounds)
+    while rounds > low and elapsed > target * 1.5:
+        rounds -= 1
+        elapsed = _time_hash(bcrypt, rounds=rounds)
+    return rounds, elapsed
+
+
+def _calibrate_argon2(target: float) -> Tuple[int, float]:
+    from passlib.hash import argon2
+
+    if not argon2.has_backend():
+        raise RuntimeError("PASSWORD_HASH_SCHEME=argon2 requires the argon2-cffi package")
+    params = {
+        "type": "ID",
+        "memory_cost": settings.ARGON2_MEMORY_COST_KIB,
+        "parallelism": settings.ARGON2_PARALLELISM,
+    }
+    if settings.ARGON2_TIME_COST:
+        time_cost = settings.ARGON2_TIME_COST
+        return time_cost, _time_hash(argon2, time_cost=time_cost, **params)
+
+    # Time grows linearly with time_cost at a fixed memory cost.
+    elapsed = _time_hash(argon2, time_cost=1, **params)
+    time_cost = max(settings.ARGON2_MIN_TIME_COST, int(target / elapsed) if elapsed > 0 else 1)
+    return time_cost, _time_hash(argon2, time_cost=time_cost, **params)
+
+
+def _measure_costs() -> Dict[str, Any]:
+    target = settings.PASSWORD_HASH_TARGET_MS / 1000
+    scheme = settings.PASSWORD_HASH_SCHEME
+    if scheme not in ("bcrypt", "argon2"):
+        raise RuntimeError(f"Unknown PASSWORD_HASH_SCHEME {scheme!r}; expected bcrypt or argon2")
+    rounds, bcrypt_elapsed = _calibrate_bcrypt(target)
+    costs: Dict[str, Any] = {"bcrypt_rounds": rounds, "bcrypt_seconds": bcrypt_elapsed}
+    if scheme == "argon2":
+        time_cost, argon2_elapsed = _calibrate_argon2(target)
+        costs.update(argon2_time_cost=time_cost, argon2_seconds=argon2_elapsed)
+    return costs
+
+
+def _apply_costs(costs: Dict[str, Any]) -> None:
+    rounds, bcrypt_elapsed = costs["bcrypt_rounds"], costs["bcrypt_seconds"]
+    config: Dict[str, Any] = {
+        "bcrypt__default_rounds": rounds,
+        "bcrypt__min_rounds": rounds,
+    }
+    PASSWORD_HASH_COST.labels(scheme="bcrypt", parameter="rounds").set(rounds)
+    PASSWORD_HASH_CALIBRATED_SECONDS.labels(scheme="bcrypt").set(bcrypt_elapsed)
+
+    if settings.PASSWORD_HASH_SCHEME == "argon2":
+        time_cost, argon2_elapsed = costs["argon2_time_cost"], costs["argon2_seconds"]
+        config.update(
+            schemes=["argon2", "bcrypt"],
+            argon2__type="ID",
+            argon2__memory_cost=settings.ARGON2_MEMORY_COST_KIB,
+            argon2__parallelism=settings.ARGON2_PARALLELISM,
+            argon2__time_cost=time_cost,
+        )
+        PASSWORD_HASH_COST.labels(scheme="argon2", parameter="time_cost").set(time_cost)
+        PASSWORD_HASH_COST.labels(scheme="argon2", parameter="memory_kib").set(settings.ARGON2_MEMORY_COST_KIB)
+        PASSWORD_HASH_CALIBRATED_SECONDS.labels(scheme="argon2").set(argon2_elapsed)
+        logger.info(
+            f"[AUTH] argon2id time_cost={time_cost} memory={settings.ARGON2_MEMORY_COST_KIB}KiB "
+            f"takes {argon2_elapsed * 1000:.0f}ms"
+        )
+
+    pwd_context.update(**config)
+    logger.info(f"[AUTH] bcrypt rounds={rounds} takes {bcrypt_elapsed * 1000:.0f}ms")
+
+
+def _calibration_key() -> str:
+    # Changing any input of the calibration starts a new one
+    inputs = (
+        settings.PASSWORD_HASH_SCHEME,
+        settings.PASSWORD_HASH_TARGET_MS,
+        settings.PASSWORD_BCRYPT_ROUNDS,
+        settings.PASSWORD_BCRYPT_MIN_ROUNDS,
+        settings.PASSWORD_BCRYPT_MAX_ROUNDS,
+        settings.ARGON2_MEMORY_COST_KIB,
+        settings.ARGON2_PARALLELISM,
+        settings.ARGON2_TIME_COST,
+        settings.ARGON2_MIN_TIME_COST,
+    )
+    return "auth:password-hash:calibration:" + ":".join(str(value) for value in inputs)
+
+
+def _shared_costs() -> Dict[str, Any]:
+    """Costs calibrated by the first worker of the deployment, measuring them if this is it"""
+    key = _calibration_key()
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + settings.PASSWORD_HASH_CALIBRATION_WAIT_SECONDS
+    while True:
+        stored = redis_sync_client.get(key)
+        if stored is not None:
+            return json.loads(stored)
+        lock_seconds = math.ceil(settings.PASSWORD_HASH_CALIBRATION_WAIT_SECONDS)
+        if redis_sync_client.set(lock_key, "1", nx=True, ex=lock_seconds):
+            try:
+                costs = _measure_costs()
+                redis_sync_client.set(key, json.dumps(costs), ex=settings.PASSWORD_HASH_CALIBRATION_TTL_SECONDS)
+                return costs
+            finally:
+                redis_sync_client.delete(lock_key)
+        if time.monotonic() >= deadline:
+            logger.warning("[AUTH] Timed out waiting for the shared password hashing calibration")
+            return _measure_costs()
+        time.sleep(0.2)
+
+
+def calibrate_password_hashing() -> None:
+    """
+    Pick hashing costs that meet PASSWORD_HASH_TARGET_MS on this machine and
+    configure `pwd_context` with them.
+
+    The first worker of a deployment measures (a few hundred milliseconds)
+    and stores the costs in Redis for PASSWORD_HASH_CALIBRATION_TTL_SECONDS;
+    the other workers wait for and reuse them, so every worker hashes with
+    the same cost. Without Redis each worker measures for itself.
+
+    Stored hashes weaker than the chosen cost (or using bcrypt once argon2 is
+    the default) are reported by `needs_update` and upgraded on next login.
+    """
+    try:
+        costs = _shared_costs()
+    except (RedisError, ValueError) as e:
+        logger.warning(f"[AUTH] Shared password hashing calibration unavailable, measuring locally: {e}")
+        costs = _measure_costs()
+    _apply_costs(costs)
+
+
+class HashingOverloadedError(ServiceUnavailableError):
+    detail = "Authentication is temporarily overloaded, please retry"
+
+
+# bcrypt releases the GIL while hashing, so a small thread pool gives real
+# parallelism without blocking the event loop. The pool is deliberately
+# bounded: jobs beyond PASSWORD_HASH_MAX_PENDING are shed with a 503 instead
+# of queueing up behind a login storm.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_hash_pending = 0
+_hash_pending_lock = threading.Lock()
+
+
+def _release_hash_slot(_: Future) -> None:
+    global _hash_pending
+    with _hash_pending_lock:
+        _hash_pending -= 1
+    PASSWORD_HASH_PENDING.dec()
+
+
+async def _run_hashing(op: str, fn: Callable[..., T], *args: Any) -> T:
+    global _hash_pending
+    with _hash_pending_lock:
+        if _hash_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            PASSWORD_HASH_REJECTED.labels(op=op, reason="queue_full").inc()
+            raise HashingOverloadedError(headers={"Retry-After": "1"})
+        _hash_pending += 1
+    PASSWORD_HASH_PENDING.inc()
+
+    timeout = settings.PASSWORD_HASH_TIMEOUT_SECONDS
+    submitted = time.perf_counter()
+
+    def job() -> T:
+        started = time.perf_counter()
+        waited = started - submitted
+        PASSWORD_HASH_QUEUE_WAIT.labels(op=op).observe(waited)
+        if waited >= timeout:
+            # The caller has already given up; don't burn CPU on a dead request.
+            raise TimeoutError
+        try:
+            return fn(*args)
+        finally:
+            PASSWORD_HASH_DURATION.labels(op=op).observe(time.perf_counter() - started)
+
+    future = _hash_executor.submit(job)
+    future.add_done_callback(_release_hash_slot)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+    except (asyncio.TimeoutError, TimeoutError):
+        future.cancel()
+        PASSWORD_HASH_REJECTED.labels(op=op, reason="timeout").inc()
+        raise HashingOverloadedError(headers={"Retry-After": "1"})
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing executor without blocking the event loop"""
+    return await _run_hashing("verify", verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Async `verify_and_update_password` on the hashing executor"""
+    verified, new_hash = await _run_hashing(
+        "verify", verify_and_update_password, plain_password, hashed_password
+    )
+    if new_hash:
+        PASSWORD_REHASHED.labels(scheme=pwd_context.identify(new_hash) or "unknown").inc()
+    return verified, new_hash
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing executor without blocking the event loop"""
+    return await _run_hashing("hash", get_password_hash, password)
+
+
+REFRESH_TOKEN_EXPIRE_MINUTES = 1440
+
+
 class TokenError(Exception):
     pass
 
 
+# Issuer/audience validation settings are read once; the backend keeps its
+# key material and decode options for the life of the process.
+_JWT_ISSUER: Optional[str] = settings.JWT_ISSUER or None
+_JWT_AUDIENCE: Optional[str] = settings.JWT_AUD or None
+_jwt_backend = build_backend(
+    settings.JWT_BACKEND,
+    key=settings.SECRET_KEY,
+    algorithm=settings.ALGORITHM_HMAC,
+    issuer=_JWT_ISSUER,
+    audience=_JWT_AUDIENCE,
+    keys_dir=settings.JWT_KEYS_DIR,
+    signing_kid=settings.JWT_SIGNING_KID,
+    accept_hs256=settings.JWT_ACCEPT_HS256,
+)
+
+
+def public_jwks() -> Dict[str, Any]:
+    """JWKS document with the public keys tokens may be verified with"""
+    return _jwt_backend.jwks()
+
+
 def _now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
@@ -42,26 +340,40 @@ def _create_token(
         "iat": int(now.timestamp()),
         "nbf": int(now.timestamp()),
         "exp": int(exp_time.timestamp()),
+        "jti": uuid4().hex,
     }
 
-    iss = getattr(settings, "JWT_ISSUER", None)
-    aud = getattr(settings, "JWT_AUD", None)
-    if iss:
-        claims["iss"] = iss
-    if aud:
-        claims["aud"] = aud
+    if _JWT_ISSUER:
+        claims["iss"] = _JWT_ISSUER
+    if _JWT_AUDIENCE:
+        claims["aud"] = _JWT_AUDIENCE
     if extra:
         claims.update(extra)
 
-    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM_HMAC)
+    return _jwt_backend.encode(claims)
 
 
-def create_access_token(user) -> str:
+def create_access_token(
+    user,
+    *,
+    project_roles: Optional[Dict[str, str]] = None,
+    membership_version: Optional[int] = None,
+) -> str:
+    """
+    Create an access token.
+
+    `project_roles` (already encoded, see app.api.v1.projects.claims) is only
+    embedded together with the membership version it was read at.
+    """
+    extra: Dict[str, Any] = {"is_superuser": bool(getattr(user, "is_superuser", False))}
+    if project_roles is not None and membership_version is not None:
+        extra["prj"] = project_roles
+        extra["mv"] = membership_version
     return _create_token(
         subject=user.id,
         expires_delta=settings.ACCESS_TOKEN_EXPIRE_MINUTES,
         token_type="access",
-        extra={"is_superuser": bool(getattr(user, "is_superuser", False))},
+        extra=extra,
     )
 
 
@@ -69,7 +381,7 @@ def create_refresh_token(user) -> str:
     # convert days → minutes
     return _create_token(
         subject=user.id,
-        expires_delta=1440,
+        expires_delta=REFRESH_TOKEN_EXPIRE_MINUTES,
         token_type="refresh",
     )
 
@@ -125,25 +437,16 @@ def create_impersonation_refresh_token(
 
 def _decode_token(token: str, *, expect_type: Optional[str] = None) -> Dict[str, Any]:
     try:
-        verify_aud = bool(getattr(settings, "JWT_AUD", None))
-        options = {"verify_aud": verify_aud}
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM_HMAC],
-            options=options,
-            issuer=getattr(settings, "JWT_ISSUER", None) or None,
-            audience=getattr(settings, "JWT_AUD", None) or None,
-        )
-        if expect_type and payload.get("type") != expect_type:
-            raise TokenError("Invalid token type")
-        return payload
-    except ExpiredSignatureError:
+        payload = _jwt_backend.decode(token)
+    except ExpiredTokenError:
         raise TokenError("Token expired")
-    except JWTClaimsError as e:
+    except InvalidClaimsError as e:
         raise TokenError(f"Invalid claims: {e}")
-    except JWTError:
+    except InvalidTokenError:
         raise TokenError("Signature verification failed")
+    if expect_type and payload.get("type") != expect_type:
+        raise TokenError("Invalid token type")
+    return payload
 
 
 def decode_access_token(token: str) -> Dict[str, Any]:
@@ -0,0 +1,191 @@
+"""
+Token revocation store
+
+Revoked token ids (the `jti` of a single token, or the `imp_sid` shared by
+every token of an impersonation session) are written to Redis with a TTL equal
+to the token's remaining lifetime and indexed in a sorted set scored by expiry.
+
+Each worker mirrors that index into a local Bloom filter, refreshed every
+TOKEN_REVOCATION_SYNC_SECONDS. A token whose ids are not in the filter - nearly
+all of them - is cleared without a Redis round trip; filter hits are confirmed
+with EXISTS, so a false positive only costs one extra Redis call.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Iterable, Optional
+
+from app.core.config import settings
+from app.core.metrics import (
+    TOKEN_REVOCATION_CHECKS,
+    TOKEN_REVOCATION_FILTER_ENTRIES,
+    TOKEN_REVOCATION_FILTER_FPR,
+)
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+_INDEX_KEY = "auth:revoked"
+_VERSION_KEY = "auth:revoked:version"
+
+
+def _entry_key(identifier: str) -> str:
+    return f"auth:revoked:{identifier}"
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using Kirsch-Mitzenmacher double hashing"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return ((h1 + i * h2) % size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        bits = self._bits
+        for pos in self._positions(item):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        for pos in self._positions(item):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def estimated_false_positive_rate(self) -> float:
+        set_bits = sum(bin(byte).count("1") for byte in self._bits)
+        return (set_bits / self.size) ** self.hashes
+
+
+def revocation_ids(payload: dict[str, Any]) -> list[str]:
+    """Identifiers under which a token may have been revoked"""
+    ids = []
+    if payload.get("jti"):
+        ids.append(f"jti:{payload['jti']}")
+    if payload.get("imp_sid"):
+        ids.append(f"imp:{payload['imp_sid']}")
+    return ids
+
+
+class RevocationFilter:
+    """Per-worker Bloom filter mirror of the Redis revocation index"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._version: Optional[str] = None
+        self.ready = False
+
+    def might_contain(self, identifier: str) -> bool:
+        return identifier in self._bloom
+
+    def add(self, identifier: str) -> None:
+        self._bloom.add(identifier)
+
+    async def sync(self) -> None:
+        version = await redis_client.get(_VERSION_KEY)
+        if self.ready and version == self._version:
+            return
+        now = time.time()
+        # Pruning here keeps the index bounded even if nobody revokes for a while.
+        await redis_client.zremrangebyscore(_INDEX_KEY, "-inf", now)
+        identifiers = await redis_client.zrangebyscore(_INDEX_KEY, now, "+inf")
+
+        bloom = BloomFilter(max(self.capacity, 2 * len(identifiers)), self.error_rate)
+        for identifier in identifiers:
+            bloom.add(identifier)
+        self._bloom = bloom
+        self._version = version
+        self.ready = True
+        TOKEN_REVOCATION_FILTER_ENTRIES.set(len(identifiers))
+        TOKEN_REVOCATION_FILTER_FPR.set(bloom.estimated_false_positive_rate())
+
+    async def run_sync_loop(self) -> None:
+        """Keep the filter in sync with Redis; runs for the app lifetime"""
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[AUTH] Revocation filter sync failed: {e}")
+            await asyncio.sleep(settings.TOKEN_REVOCATION_SYNC_SECONDS)
+
+
+revocation_filter = RevocationFilter(
+    capacity=settings.TOKEN_REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.TOKEN_REVOCATION_FILTER_ERROR_RATE,
+)
+
+
+async def revoke(identifier: str, expires_at: float) -> None:
+    """Revoke every token carrying `identifier` until `expires_at` (epoch seconds)"""
+    ttl = math.ceil(expires_at - time.time())
+    if ttl <= 0:
+        return
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(_entry_key(identifier), "1", ex=ttl)
+        pipe.zadd(_INDEX_KEY, {identifier: expires_at})
+        pipe.incr(_VERSION_KEY)
+        await pipe.execute()
+    revocation_filter.add(identifier)
+
+
+async def revoke_token(payload: dict[str, Any]) -> None:
+    """Revoke a single decoded token (logout)"""
+    if payload.get("jti") and payload.get("exp"):
+        await revoke(f"jti:{payload['jti']}", float(payload["exp"]))
+
+
+async def revoke_impersonation_session(imp_sid: str, expires_at: float) -> None:
+    """End an impersonation session: revokes its access and refresh tokens alike"""
+    await revoke(f"imp:{imp_sid}", expires_at)
+
+
+def _candidates(payload: dict[str, Any]) -> list[str]:
+    ids = revocation_ids(payload)
+    if not revocation_filter.ready:
+        # Until the first sync the filter knows nothing; ask Redis directly.
+        TOKEN_REVOCATION_CHECKS.labels(result="unsynced").inc()
+        return ids
+    candidates = [identifier for identifier in ids if revocation_filter.might_contain(identifier)]
+    if not candidates:
+        TOKEN_REVOCATION_CHECKS.labels(result="clear").inc()
+    return candidates
+
+
+def _unconfirmed() -> bool:
+    # A filter hit we cannot confirm is treated as revoked (fail closed); before
+    # the first sync every token is a "hit", so fail open instead.
+    return revocation_filter.ready
+
+
+def _record(revoked: bool) -> bool:
+    if revocation_filter.ready:
+        TOKEN_REVOCATION_CHECKS.labels(result="revoked" if revoked else "false_positive").inc()
+    return revoked
+
+
+async def is_blacklisted(payload: dict[str, Any]) -> bool:
+    candidates = _candidates(payload)
+    if not candidates:
+        return False
+    try:
+        found = await redis_client.exists(*(_entry_key(c) for c in candidates))
+    except Exception as e:
+        logger.warning(f"[AUTH] Revocation check unavailable: {e}")
+        return _unconfirmed()
+    return _record(found > 0)
+
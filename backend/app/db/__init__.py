@@ -1,8 +1,31 @@
 # Database package
 from app.db.base import Base
-from app.db.session import engine, SessionLocal, get_db
+from app.db.integrity import violated_constraint
+from app.db.session import (
+    AsyncSessionLocal,
+    DBSession,
+    SessionLocal,
+    async_engine,
+    db_dependency,
+    engine,
+    get_async_db,
+    get_db,
+    run_db,
+)
 
 # Ensure all models are imported & registered (relationships, Alembic autogenerate, etc.)
 from app.db import models as _models  # noqa: F401
 
-__all__ = ["Base", "engine", "SessionLocal", "get_db"]
+__all__ = [
+    "Base",
+    "engine",
+    "async_engine",
+    "SessionLocal",
+    "AsyncSessionLocal",
+    "DBSession",
+    "get_db",
+    "get_async_db",
+    "db_dependency",
+    "run_db",
+    "violated_constraint",
+]
@@ -0,0 +1,26 @@
+"""
+Constraint violations
+
+Writes rely on the database's own constraints (unique keys, foreign keys)
+instead of SELECTing first to check; `violated_constraint` tells callers which
+constraint an IntegrityError came from so they can turn it into a precise
+message.
+"""
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
+
+def violated_constraint(error: IntegrityError) -> Optional[str]:
+    """Name of the constraint behind an IntegrityError, for psycopg2 and asyncpg"""
+    orig = error.orig
+    # psycopg2 exposes the server's diagnostics on the DBAPI error
+    diag = getattr(orig, "diag", None)
+    if diag is not None and getattr(diag, "constraint_name", None):
+        return diag.constraint_name
+    # The asyncpg dialect wraps the driver's exception; the original carries the name
+    for candidate in (orig, getattr(orig, "__cause__", None)):
+        name = getattr(candidate, "constraint_name", None)
+        if name:
+            return name
+    return None
@@ -0,0 +1,141 @@
+"""
+Connection pool sizing and instrumentation
+
+Every process gets an equal slice of DB_CONNECTION_BUDGET instead of a fixed
+pool per engine:
+
+    web process:    (DB_CONNECTION_BUDGET - DB_CELERY_CONNECTIONS) / WEB_CONCURRENCY
+    celery process: DB_CELERY_CONNECTIONS / CELERY_WORKER_CONCURRENCY
+
+A web process splits its slice between the psycopg2 and asyncpg engines
+according to ASYNC_DB_ROUTERS. Half of an engine's slice is kept open
+(pool_size), the rest is overflow for bursts, so the total can never exceed
+the budget.
+
+With DB_PGBOUNCER, connections go through PgBouncer in transaction mode:
+asyncpg's prepared statement caches are disabled (server-side statements do
+not survive a transaction there) and pool_pre_ping is replaced by a short
+pool_recycle, since PgBouncer already health-checks its server connections.
+"""
+import logging
+import math
+import os
+import time
+from typing import Any
+from uuid import uuid4
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+from app.core.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_OVERFLOW,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUTS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Async engine's share of a web process' slice when some routers use it
+_ASYNC_SHARE = 0.75
+
+
+def process_connection_budget() -> int:
+    """Connections this process may hold across all of its engines"""
+    if settings.DB_PROCESS_ROLE == "celery":
+        budget = settings.DB_CELERY_CONNECTIONS // max(1, settings.CELERY_WORKER_CONCURRENCY)
+    else:
+        web_budget = settings.DB_CONNECTION_BUDGET - settings.DB_CELERY_CONNECTIONS
+        budget = web_budget // max(1, settings.WEB_CONCURRENCY)
+    return max(2, budget)
+
+
+def engine_budget(kind: str) -> int:
+    total = process_connection_budget()
+    async_share = _ASYNC_SHARE if settings.ASYNC_DB_ROUTERS and settings.DB_PROCESS_ROLE != "celery" else 0
+    async_budget = max(1, math.floor(total * async_share))
+    if kind == "async":
+        return async_budget
+    return max(1, total - async_budget)
+
+
+class _InstrumentedPool:
+    """Times checkouts (`_do_get` covers both queueing and connecting)"""
+
+    metrics_name = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.labels(engine=self.metrics_name).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(engine=self.metrics_name).observe(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    metrics_name = "sync"
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+
+def engine_options(kind: str) -> dict[str, Any]:
+    """Keyword arguments for create_engine / create_async_engine"""
+    budget = engine_budget(kind)
+    pool_size = max(1, math.ceil(budget / 2))
+    options: dict[str, Any] = {
+        "poolclass": InstrumentedAsyncQueuePool if kind == "async" else InstrumentedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": budget - pool_size,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": not settings.DB_PGBOUNCER,
+    }
+    if settings.DB_PGBOUNCER:
+        options["pool_recycle"] = min(settings.DB_POOL_RECYCLE_SECONDS, 300)
+        if kind == "async":
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                # Unnamed statements may still collide across pooled server
+                # connections; unique names avoid "already exists" errors.
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+    return options
+
+
+def replica_engine_options(kind: str) -> dict[str, Any]:
+    """
+    engine_options for a read replica. A replica takes reads off the primary,
+    so it gets the same per-process slice (counted against its own server's
+    max_connections); its checkouts stay out of the primary's pool metrics.
+    """
+    options = engine_options(kind)
+    options["poolclass"] = AsyncAdaptedQueuePool if kind == "async" else QueuePool
+    return options
+
+
+def instrument(engine, kind: str) -> None:
+    """Publish pool occupancy gauges for this process (pass a sync Engine)"""
+    pool = engine.pool
+    DB_POOL_SIZE.labels(engine=kind).set(pool.size())
+
+    def update(*_):
+        # engine.dispose() swaps the pool, so look it up on every event
+        current = engine.pool
+        DB_POOL_CHECKED_OUT.labels(engine=kind).set(current.checkedout())
+        DB_POOL_OVERFLOW.labels(engine=kind).set(current.overflow())
+
+    event.listen(engine, "checkout", update)
+    event.listen(engine, "checkin", update)
+    logger.info(
+        f"[DB] {kind} pool pid={os.getpid()} role={settings.DB_PROCESS_ROLE} "
+        f"pool_size={pool.size()} budget={engine_budget(kind)}"
+    )
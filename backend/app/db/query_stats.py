@@ -0,0 +1,165 @@
+"""
+Per-request SQL statistics
+
+Cursor hooks on both engines attribute every statement to the QueryStats of
+the current context: the request (QueryStatsMiddleware) or a block wrapped in
+`track_queries()`. The stats object is shared by reference, so statements run
+in the threadpool or in an AsyncSession's greenlet are counted too.
+
+Statements are reduced to a fingerprint (literals and bind parameters replaced,
+IN lists and multi-row VALUES collapsed). The same query issued once per row of
+an earlier result, an N+1, shows up as one fingerprint with a high count.
+
+Endpoints declare how many statements they may issue with `@query_budget(n)`.
+Overruns are logged and counted; with QUERY_BUDGET_STRICT the statement that
+crosses the budget raises QueryBudgetExceeded, which fails the request (and a
+test calling it). `expect_queries(n)` does the same for code called directly.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import DB_N_PLUS_ONE, DB_QUERY_BUDGET_EXCEEDED, DB_REQUEST_QUERIES, DB_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+# psycopg2 renders %(name)s, asyncpg $1
+_PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\bIN \(\?(?:, \?)*\)", re.IGNORECASE)
+_VALUES_ROWS = re.compile(r"(\((?:\?, )*\?\))(?:, \1)+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More statements than the declared budget"""
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Normalize a statement so that calls differing only in values compare equal"""
+    text = _STRING.sub("?", statement)
+    text = _PARAM.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _SPACE.sub(" ", text).strip()
+    text = _IN_LIST.sub("IN (?...)", text)
+    return _VALUES_ROWS.sub(r"\1, ...", text)
+
+
+def query_budget(max_queries: int) -> Callable[[F], F]:
+    """Declare the most statements an endpoint may issue, auth included"""
+
+    def decorate(endpoint: F) -> F:
+        endpoint.__query_budget__ = max_queries
+        return endpoint
+
+    return decorate
+
+
+class QueryStats:
+    """Statements executed in one request (or `track_queries` block)"""
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints: Counter[str] = Counter()
+        self._scope = scope
+        self._budget: Optional[int] = None
+
+    @property
+    def budget(self) -> Optional[int]:
+        # The endpoint is only known once routing has run
+        if self._budget is None and self._scope is not None:
+            self._budget = getattr(self._scope.get("endpoint"), "__query_budget__", None)
+        return self._budget
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.fingerprints[fingerprint(statement)] += 1
+        if settings.QUERY_BUDGET_STRICT:
+            budget = self.budget
+            if budget is not None and self.count > budget:
+                raise QueryBudgetExceeded(self.describe(budget))
+
+    def repeated(self, threshold: Optional[int] = None) -> list[tuple[str, int]]:
+        """Fingerprints executed at least `threshold` times: likely N+1 queries"""
+        threshold = threshold or settings.QUERY_N_PLUS_ONE_THRESHOLD
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries"'
+
+    def describe(self, budget: int) -> str:
+        top = "; ".join(f"{n}x {fp[:120]}" for fp, n in self.fingerprints.most_common(3))
+        return f"{self.count} statements, budget {budget}: {top}"
+
+
+@contextmanager
+def track_queries(scope: Optional[dict] = None) -> Iterator[QueryStats]:
+    stats = QueryStats(scope)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def expect_queries(max_queries: int) -> Iterator[QueryStats]:
+    """Raise QueryBudgetExceeded if the block issues more than `max_queries` statements"""
+    with track_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(stats.describe(max_queries))
+
+
+def route_label(scope: dict) -> str:
+    path = getattr(scope.get("route"), "path", None) or "unmatched"
+    return f"{scope.get('method', '')} {path}"
+
+
+def report(stats: QueryStats, route: str) -> None:
+    """Publish a finished request's stats and warn about N+1s and budget overruns"""
+    DB_REQUEST_QUERIES.labels(route=route).observe(stats.count)
+    DB_REQUEST_SECONDS.labels(route=route).observe(stats.seconds)
+    repeated = stats.repeated()
+    if repeated:
+        DB_N_PLUS_ONE.labels(route=route).inc()
+        fp, n = repeated[0]
+        logger.warning(f"[DB] possible N+1 on {route}: {n}x {fp[:200]}")
+    budget = stats.budget
+    if budget is not None and stats.count > budget:
+        DB_QUERY_BUDGET_EXCEEDED.labels(route=route).inc()
+        logger.warning(f"[DB] query budget exceeded on {route}: {stats.describe(budget)}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None and context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current.get()
+    started = getattr(context, "_query_started", None)
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def instrument_queries(engine) -> None:
+    """Attach the statement hooks (pass a sync Engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
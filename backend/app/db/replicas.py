@@ -0,0 +1,188 @@
+"""
+Read replicas
+
+With DATABASE_REPLICA_URLS set, GET/HEAD requests read from a replica picked
+round-robin among the eligible ones. A replica is eligible when it has passed a
+health check, is not ejected, and lags the primary by at most
+REPLICA_MAX_LAG_SECONDS. Everything else uses the primary.
+
+- Health: `ReplicaSet.monitor()` runs in every web worker and polls each
+  replica for its replay lag every REPLICA_CHECK_SECONDS. A failed check, or a
+  connection error hit by a request, ejects the replica for
+  REPLICA_EJECT_SECONDS.
+- Stickiness: the first write in a session pins the rest of that session to
+  the primary (RoutingSession). A request that wrote also pins the user's
+  reads to the primary for REPLICA_STICKY_SECONDS, so they see their own
+  writes.
+
+A server that is not in recovery reports zero lag, so a single instance can
+pose as both primary and replica.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.metrics import DB_READS_ROUTED, DB_REPLICA_EJECTIONS, DB_REPLICA_LAG_SECONDS
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Session.info keys
+READ_BIND = "replica_read_bind"
+WROTE = "replica_wrote"
+
+_READ_METHODS = frozenset({"GET", "HEAD"})
+
+# Caught up with everything received means no lag, even if the primary has
+# been idle since the last replayed transaction
+_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+def _pin_key(user_id: int) -> str:
+    return f"db:primary:{user_id}"
+
+
+class RoutingSession(Session):
+    """
+    Session that sends SELECTs to `info[READ_BIND]` when set. Flushes and DML
+    go to the primary, clear the read bind and set `info[WROTE]`; anything
+    else (text(), SELECT ... FOR UPDATE) uses the primary.
+    """
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kw: Any) -> Any:
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info.pop(READ_BIND, None)
+            self.info[WROTE] = True
+        else:
+            bind = self.info.get(READ_BIND)
+            if (
+                bind is not None
+                and getattr(clause, "is_select", False)
+                and getattr(clause, "_for_update_arg", None) is None
+            ):
+                return bind
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+class Replica:
+    def __init__(self, name: str, engine: Engine, async_engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        # Unknown until the first successful check
+        self.lag: Optional[float] = None
+        self.ejected_until = 0.0
+        for sync_engine in (engine, async_engine.sync_engine):
+            event.listen(sync_engine, "handle_error", self._on_error)
+
+    @property
+    def eligible(self) -> bool:
+        return (
+            self.lag is not None
+            and self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+            and time.monotonic() >= self.ejected_until
+        )
+
+    def bind(self, kind: str) -> Engine:
+        """The sync Engine a RoutingSession of this stack should read from"""
+        return self.async_engine.sync_engine if kind == "async" else self.engine
+
+    def eject(self, reason: str) -> None:
+        if time.monotonic() >= self.ejected_until:
+            DB_REPLICA_EJECTIONS.labels(replica=self.name).inc()
+            logger.warning(f"[DB] ejecting {self.name} for {settings.REPLICA_EJECT_SECONDS}s: {reason}")
+        self.ejected_until = time.monotonic() + settings.REPLICA_EJECT_SECONDS
+
+    async def check(self) -> None:
+        async with self.async_engine.connect() as conn:
+            lag = (await conn.execute(_LAG_SQL)).scalar_one()
+        self.lag = float(lag)
+        DB_REPLICA_LAG_SECONDS.labels(replica=self.name).set(self.lag)
+
+    def _on_error(self, context: Any) -> None:
+        # No connection means the connect itself failed
+        if context.is_disconnect or context.connection is None:
+            self.eject(str(context.original_exception))
+
+
+class ReplicaSet:
+    def __init__(self, replicas: list[Replica]):
+        self.replicas = replicas
+        self._turn = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def pick(self) -> Optional[Replica]:
+        """Next eligible replica in round-robin order, or None"""
+        count = len(self.replicas)
+        start = next(self._turn)
+        for offset in range(count):
+            replica = self.replicas[(start + offset) % count]
+            if replica.eligible:
+                return replica
+        return None
+
+    async def read_bind(self, request: Request, kind: str) -> Optional[Engine]:
+        """Replica bind for a read-only request, or None to use the primary"""
+        if request.method not in _READ_METHODS:
+            return None
+        replica = None
+        if not await self._pinned(request):
+            replica = self.pick()
+        DB_READS_ROUTED.labels(target="replica" if replica else "primary").inc()
+        return replica.bind(kind) if replica else None
+
+    async def pin(self, request: Request) -> None:
+        """Keep the requesting user's reads on the primary for a while"""
+        user = getattr(request.state, "user", None)
+        if user is None:
+            return
+        try:
+            await redis_client.set(_pin_key(user.id), "1", ex=settings.REPLICA_STICKY_SECONDS)
+        except Exception as e:
+            logger.warning(f"[DB] could not pin user {user.id} to the primary: {e}")
+
+    async def _pinned(self, request: Request) -> bool:
+        user = getattr(request.state, "user", None)
+        if user is None:
+            return False
+        try:
+            return bool(await redis_client.exists(_pin_key(user.id)))
+        except Exception:
+            # Without Redis we cannot tell; the primary is always correct
+            return True
+
+    async def monitor(self) -> None:
+        """Refresh replica lag; runs for the app lifetime"""
+        while True:
+            results = await asyncio.gather(
+                *(
+                    asyncio.wait_for(replica.check(), timeout=settings.REPLICA_CHECK_SECONDS)
+                    for replica in self.replicas
+                ),
+                return_exceptions=True,
+            )
+            for replica, result in zip(self.replicas, results):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                if isinstance(result, BaseException):
+                    replica.eject(f"health check failed: {result!r}")
+            await asyncio.sleep(settings.REPLICA_CHECK_SECONDS)
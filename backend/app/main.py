@@ -1,16 +1,35 @@
 """
 FastAPI main application
 """
+import asyncio
+import hashlib
+import json
+import logging
 import os
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.db import get_db, Base, engine
+from app.db.session import replicas
 from sqlalchemy import text
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.core.config import settings
+from app.core.errors import register_exception_handlers
+from app.core.metrics import render_latest
+from app.core.security import calibrate_password_hashing, public_jwks
+from app.core.middleware import AuthMiddleware, QueryStatsMiddleware, SecurityHeadersMiddleware
+from app.core.principal_cache import listen_for_invalidations
+from app.core.token_blacklist import revocation_filter
 
 # Import routers
 from app.api.v1.auth.router import router as auth_router
 from app.api.v1.projects.router import router as projects_router
+from app.api.v1.services.catalog import service_type_catalog
+from app.api.v1.services.router import router as services_router
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Backend API",
@@ -19,12 +38,44 @@ app = FastAPI(
     # from exposing internal Docker hostnames (e.g., http://backend:8000) when
     # requests go through a proxy. Accept both /api/v1/projects and /api/v1/projects/.
     redirect_slashes=False,
+    # orjson renders response bodies several times faster than the stdlib
+    # encoder; large lists bypass this and serialize rows directly
+    # (app.api.responses).
+    default_response_class=ORJSONResponse,
 )
 
+register_exception_handlers(app)
+
+_background_tasks: list[asyncio.Task] = []
+
+
 @app.on_event("startup")
 async def startup():
+    await run_in_threadpool(calibrate_password_hashing)
+    _background_tasks.append(asyncio.create_task(listen_for_invalidations()))
+    _background_tasks.append(asyncio.create_task(revocation_filter.run_sync_loop()))
+    try:
+        await run_in_threadpool(service_type_catalog.reload, "startup")
+    except Exception as e:
+        # The refresh loop retries; until then the catalog endpoint answers 503
+        logger.warning(f"[SERVICES] Service type catalog not loaded at startup: {e}")
+    _background_tasks.append(asyncio.create_task(service_type_catalog.refresh_loop()))
+    if replicas:
+        _background_tasks.append(asyncio.create_task(replicas.monitor()))
+
 
-    pass
+@app.on_event("shutdown")
+async def shutdown():
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+
+# Added before CORS so that CORS stays the outermost middleware.
+app.add_middleware(AuthMiddleware)
+# Outside AuthMiddleware so principal lookups count towards the request
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(SecurityHeadersMiddleware)
 
 cors_origins = [
     origin.strip()
@@ -41,11 +92,14 @@ allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets browser clients read the keyset pagination cursor and collection ETags
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 # Include API routers
 app.include_router(auth_router, prefix="/api/v1")
 app.include_router(projects_router, prefix="/api/v1")
+app.include_router(services_router, prefix="/api/v1")
 
 
 @app.get("/")
@@ -53,6 +107,27 @@ async def root():
     return {"message": "Backend API is running"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    payload, content_type = render_latest()
+    return Response(content=payload, media_type=content_type)
+
+
+# The key ring only changes on restart, so the document is rendered once.
+_JWKS_BODY = json.dumps(public_jwks(), separators=(",", ":")).encode()
+_JWKS_HEADERS = {
+    "Cache-Control": f"public, max-age={settings.JWKS_CACHE_SECONDS}",
+    "ETag": f'"{hashlib.sha256(_JWKS_BODY).hexdigest()[:32]}"',
+}
+
+
+@app.get("/.well-known/jwks.json", include_in_schema=False)
+async def jwks(request: Request):
+    if request.headers.get("if-none-match") == _JWKS_HEADERS["ETag"]:
+        return Response(status_code=304, headers=_JWKS_HEADERS)
+    return Response(content=_JWKS_BODY, media_type="application/json", headers=_JWKS_HEADERS)
+
+
 @app.get("/health")
 async def health(db: Session = Depends(get_db)):
 
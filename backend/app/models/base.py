@@ -3,7 +3,7 @@ Base model with common fields for all database models
 """
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import DateTime, Integer, func, text
+from sqlalchemy import DateTime, Integer, func, null, text
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
 
@@ -14,6 +14,9 @@ class BaseModel(Base):
     All models should inherit from this class
     """
     __abstract__ = True
+    # Fetch server-generated columns (created_at, updated_at, server defaults)
+    # with RETURNING on the INSERT/UPDATE itself instead of a later SELECT
+    __mapper_args__ = {"eager_defaults": True}
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     created_at: Mapped[datetime] = mapped_column(
@@ -24,5 +27,8 @@ class BaseModel(Base):
     updated_at: Mapped[Optional[datetime]] = mapped_column(
         DateTime(timezone=True),
         nullable=True,
+        # An explicit NULL on INSERT; without it eager_defaults re-SELECTs the
+        # column after every insert because it has an onupdate expression
+        insert_default=null(),
         onupdate=func.now()
     )
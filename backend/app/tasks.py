@@ -2,6 +2,8 @@
 Celery tasks
 """
 from app.celery import celery_app
+from app.core.config import settings
+from app.db import SessionLocal
 
 
 @celery_app.task(name="app.tasks.example_task")
@@ -11,3 +13,42 @@ def example_task(message: str):
     """
     print(f"Processing task: {message}")
     return f"Task completed: {message}"
+
+
+@celery_app.task(name="app.tasks.flush_user_activity")
+def flush_user_activity():
+    """
+    Flush coalesced last_login timestamps from Redis to the users table
+    """
+    from app.api.v1.users.activity import flush_activity
+
+    db = SessionLocal()
+    try:
+        return flush_activity(db)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.delete_project", bind=True)
+def delete_project(self, project_id: int):
+    """
+    Delete a large project in batches (see app.api.v1.projects.deletion)
+    """
+    from app.api.v1.projects.deletion import finish_deletion
+    from app.api.v1.projects.service import ProjectService
+
+    def progress(deleted: int) -> None:
+        self.update_state(state="PROGRESS", meta={"project_id": project_id, "deleted": deleted})
+
+    db = SessionLocal()
+    try:
+        deleted = ProjectService.delete_in_batches(
+            db,
+            project_id=project_id,
+            batch_size=settings.PROJECT_DELETE_BATCH_SIZE,
+            progress=progress,
+        )
+        return {"project_id": project_id, "deleted": deleted}
+    finally:
+        db.close()
+        finish_deletion(project_id)
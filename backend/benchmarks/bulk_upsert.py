@@ -0,0 +1,87 @@
+"""
+Elapsed time of a 50k-row service instance bulk upsert
+
+POSTs --rows service instances as NDJSON to /projects/{id}/services/bulk on
+the in-process app, twice: the first request creates every row, the second
+updates them all. Each timing covers the whole request (body parsing, item
+validation, the chunked INSERT ... ON CONFLICT and the response). The target
+is 50k rows in under 10 seconds.
+
+A scratch superuser, project and service type are created and deleted
+afterwards. Point DATABASE_URL at a scratch database (missing tables are
+created) and REDIS_URL at a scratch Redis.
+
+    cd backend && DATABASE_URL=postgresql://... REDIS_URL=redis://... python -m benchmarks.bulk_upsert [--rows 50000]
+"""
+import argparse
+import time
+
+import orjson
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from app.main import app
+from app.api.v1.projects.models import Project
+from app.api.v1.services.models import ServiceType
+from app.api.v1.users.models import User
+from app.core.security import create_access_token
+from app.db import Base, SessionLocal, engine
+
+TARGET_SECONDS = 10
+
+
+def _body(rows: int, service_type_id: int, port: int) -> bytes:
+    return b"\n".join(
+        orjson.dumps({
+            "service_type_id": service_type_id,
+            "name": f"service-{n:06d}",
+            "endpoint": f"https://service-{n:06d}.internal.example.com",
+            "port": port,
+            "metadata": {"team": f"team-{n % 40}", "tier": n % 3},
+        })
+        for n in range(rows)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    suffix = time.time_ns()
+    with SessionLocal() as db:
+        user = User(email=f"bulk-bench-{suffix}@example.com", hashed_password="!", is_superuser=True)
+        project = Project(code=f"bulk-bench-{suffix}", display_name="Bulk upsert benchmark")
+        service_type = ServiceType(code=f"bulk-bench-{suffix}", group="bench", display_name="Benchmark")
+        db.add_all([user, project, service_type])
+        db.commit()
+        ids = (user.id, project.id, service_type.id)
+        token = create_access_token(user)
+
+    client = TestClient(app)
+    url = f"/api/v1/projects/{project.id}/services/bulk"
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/x-ndjson"}
+    try:
+        for port, expected in ((8080, "created"), (8443, "updated")):
+            body = _body(args.rows, service_type.id, port)
+            started = time.perf_counter()
+            response = client.post(url, content=body, headers=headers)
+            elapsed = time.perf_counter() - started
+            response.raise_for_status()
+            result = response.json()
+            assert result[expected] == args.rows, {key: value for key, value in result.items() if key != "results"}
+            verdict = "within" if elapsed < TARGET_SECONDS else "OVER"
+            print(f"{expected:<8} {args.rows:,} rows in {elapsed:.2f}s ({args.rows / elapsed:,.0f} rows/s), "
+                  f"{verdict} the {TARGET_SECONDS}s target")
+    finally:
+        with SessionLocal() as db:
+            user_id, project_id, service_type_id = ids
+            db.execute(delete(Project).where(Project.id == project_id))
+            db.execute(delete(ServiceType).where(ServiceType.id == service_type_id))
+            db.execute(delete(User).where(User.id == user_id))
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
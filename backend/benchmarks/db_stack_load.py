@@ -0,0 +1,153 @@
+"""
+Throughput and tail latency of the sync and async DB stacks under load
+
+Serves the app with uvicorn (one worker) twice, once per stack:
+
+- sync:   ASYNC_DB_ROUTERS unset; handlers reach psycopg2 through the
+          threadpool (`run_db` on a Session)
+- async:  ASYNC_DB_ROUTERS=auth,projects; services run on the event loop
+          over asyncpg (`run_db` on an AsyncSession)
+
+and keeps --clients concurrent keep-alive clients sending GET --path (by
+default a project detail, two statements) for --duration seconds after a
+short warm-up. Reports requests/s, p50/p99 latency and failed requests.
+
+A scratch superuser and project are created and deleted afterwards. Point
+DATABASE_URL at a scratch database (missing tables are created) and REDIS_URL
+at a scratch Redis; the server inherits both. The load generator shares the
+machine with the server, so give it spare cores for meaningful numbers.
+
+    cd backend && DATABASE_URL=postgresql://... REDIS_URL=redis://... python -m benchmarks.db_stack_load \\
+        [--clients 500] [--duration 30] [--path /api/v1/projects/{project_id}]
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+from sqlalchemy import delete
+
+from app.db import Base, SessionLocal, engine
+from app.api.v1.projects.models import Project
+from app.api.v1.users.models import User
+from app.core.security import create_access_token
+
+STACKS = {"sync": "", "async": "auth,projects"}
+WARMUP_SECONDS = 3
+
+_CONTENT_LENGTH = re.compile(rb"content-length:\s*(\d+)", re.IGNORECASE)
+
+
+def _serve(routers: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, "ASYNC_DB_ROUTERS": routers}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def _wait_ready(base_url: str, server: subprocess.Popen) -> None:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(300):
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with {server.returncode}")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not become ready")
+
+
+async def _client(port: int, request: bytes, deadline: float, latencies: list[float]) -> int:
+    """
+    One keep-alive client sending `request` until `deadline`; returns its
+    failed requests. Raw streams rather than httpx: on a shared machine the
+    generator must cost far less CPU than the server it measures.
+    """
+    failures = 0
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = _CONTENT_LENGTH.search(head)
+            await reader.readexactly(int(length.group(1)) if length else 0)
+            if head[9:12] == b"200":
+                latencies.append(time.perf_counter() - started)
+            else:
+                failures += 1
+    except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        failures += 1
+    finally:
+        writer.close()
+    return failures
+
+
+async def _load(port: int, request: bytes, clients: int, seconds: float) -> tuple[list[float], int]:
+    """Latencies of successful requests and the number of failed ones"""
+    latencies: list[float] = []
+    deadline = time.perf_counter() + seconds
+    failures = await asyncio.gather(*(_client(port, request, deadline, latencies) for _ in range(clients)))
+    return latencies, sum(failures)
+
+
+async def _measure(routers: str, args: argparse.Namespace, request: bytes) -> tuple[list[float], int]:
+    server = _serve(routers, args.port)
+    try:
+        await _wait_ready(f"http://127.0.0.1:{args.port}", server)
+        await _load(args.port, request, args.clients, WARMUP_SECONDS)
+        return await _load(args.port, request, args.clients, args.duration)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--path", default="/api/v1/projects/{project_id}")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    suffix = time.time_ns()
+    with SessionLocal() as db:
+        user = User(email=f"load-bench-{suffix}@example.com", hashed_password="!", is_superuser=True)
+        project = Project(code=f"load-bench-{suffix}", display_name="Load benchmark")
+        db.add_all([user, project])
+        db.commit()
+        user_id, project_id = user.id, project.id
+        token = create_access_token(user)
+    path = args.path.format(project_id=project_id)
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{args.port}\r\nAuthorization: Bearer {token}\r\n\r\n"
+    ).encode()
+
+    try:
+        print(f"GET {args.path}, {args.clients} clients, {args.duration:g}s per stack")
+        print(f"{'stack':<8}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'failed':>8}")
+        for name, routers in STACKS.items():
+            latencies, failures = asyncio.run(_measure(routers, args, request))
+            latencies.sort()
+            p50 = statistics.median(latencies) if latencies else float("nan")
+            p99 = latencies[int(len(latencies) * 0.99)] if latencies else float("nan")
+            print(f"{name:<8}{len(latencies):>10,}{len(latencies) / args.duration:>10,.0f}"
+                  f"{p50 * 1000:>10.1f}{p99 * 1000:>10.1f}{failures:>8}")
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Project).where(Project.id == project_id))
+            db.execute(delete(User).where(User.id == user_id))
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
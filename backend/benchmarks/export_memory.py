@@ -0,0 +1,86 @@
+"""
+Peak memory of a large project export
+
+Seeds a scratch project with --rows credentials (INSERT ... SELECT
+generate_series, so the rows never pass through this process), streams
+`generate_export` to the end, and reports how far the process' peak RSS grew
+while streaming. With server-side cursors the growth stays flat however many
+rows are exported. The project is deleted afterwards.
+
+Point DATABASE_URL at a scratch database; missing tables are created.
+
+    cd backend && DATABASE_URL=postgresql://... python -m benchmarks.export_memory [--rows 1000000] [--format csv] [--gzip]
+"""
+import argparse
+import resource
+import time
+
+from sqlalchemy import text
+
+from app.db import Base, SessionLocal, engine
+from app.api.v1.projects.export import generate_export
+from app.api.v1.projects.models import Project
+
+
+def _peak_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _seed(rows: int) -> int:
+    with SessionLocal() as db:
+        project = Project(code=f"export-bench-{time.time_ns()}", display_name="Export benchmark")
+        db.add(project)
+        db.flush()
+        db.execute(
+            text(
+                "INSERT INTO credentials (project_id, kind, secret_ref, metadata) "
+                "SELECT :project_id, 'api_key', 'vault:bench/' || n, jsonb_build_object('n', n) "
+                "FROM generate_series(1, :rows) AS n"
+            ),
+            {"project_id": project.id, "rows": rows},
+        )
+        db.commit()
+        return project.id
+
+
+def _drop(project_id: int) -> None:
+    with SessionLocal() as db:
+        db.execute(text("DELETE FROM projects WHERE id = :id"), {"id": project_id})
+        db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    print(f"seeding {args.rows:,} credentials...")
+    project_id = _seed(args.rows)
+    try:
+        before = _peak_rss_mib()
+        started = time.perf_counter()
+        size = chunks = 0
+        for chunk in generate_export(
+            project_id,
+            fmt=args.format,
+            resource="credentials",
+            compress="gzip" if args.gzip else None,
+        ):
+            size += len(chunk)
+            chunks += 1
+        elapsed = time.perf_counter() - started
+        after = _peak_rss_mib()
+    finally:
+        _drop(project_id)
+
+    print(f"exported {args.rows:,} rows as {args.format}{'.gz' if args.gzip else ''}: "
+          f"{size / 2**20:,.1f} MiB in {chunks:,} chunks, {elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/s)")
+    print(f"peak RSS {before:,.1f} MiB before streaming, {after:,.1f} MiB after (+{after - before:,.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Encode/decode throughput of the JWT backends
+
+Signs and verifies the same access-token claims with every backend that can be
+built here (PyJWT is skipped when it is not installed) and prints operations
+per second. The asymmetric backend runs against a throwaway Ed25519 and EC
+P-256 key ring. Nothing outside app.core.jwt_backends/jwt_keys is imported, so
+no database or Redis is needed.
+
+    cd backend && python -m benchmarks.jwt_backends [--number 20000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from app.core.jwt_backends import JWTBackend, build_backend
+
+SECRET = "benchmark-secret-key-0123456789abcdef"
+ISSUER = "obser"
+AUDIENCE = "obser-api"
+
+
+def _claims() -> dict:
+    now = int(time.time())
+    return {
+        "sub": "42",
+        "type": "access",
+        "iat": now,
+        "exp": now + 3600,
+        "iss": ISSUER,
+        "aud": AUDIENCE,
+        "mv": 7,
+    }
+
+
+def _write_key(keys_dir: Path, kid: str, private_key) -> None:
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    (keys_dir / f"{kid}.pem").write_bytes(pem)
+
+
+def _backends(keys_dir: Path) -> list[tuple[str, JWTBackend]]:
+    common = {"key": SECRET, "issuer": ISSUER, "audience": AUDIENCE}
+    built = []
+    for label, name, options in (
+        ("jose HS256", "jose", {"algorithm": "HS256"}),
+        ("pyjwt HS256", "pyjwt", {"algorithm": "HS256"}),
+        ("native HS256", "native", {"algorithm": "HS256"}),
+        ("asymmetric EdDSA", "asymmetric", {"algorithm": "HS256", "keys_dir": str(keys_dir), "signing_kid": "ed"}),
+        ("asymmetric ES256", "asymmetric", {"algorithm": "HS256", "keys_dir": str(keys_dir), "signing_kid": "ec"}),
+    ):
+        try:
+            built.append((label, build_backend(name, **common, **options)))
+        except RuntimeError as e:
+            print(f"skipping {label}: {e}")
+    return built
+
+
+def _rate(fn: Callable[[], object], number: int) -> float:
+    fn()  # warm-up
+    started = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return number / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="operations per measurement")
+    args = parser.parse_args()
+
+    claims = _claims()
+    with tempfile.TemporaryDirectory() as tmp:
+        keys_dir = Path(tmp)
+        _write_key(keys_dir, "ed", Ed25519PrivateKey.generate())
+        _write_key(keys_dir, "ec", ec.generate_private_key(ec.SECP256R1()))
+
+        backends = _backends(keys_dir)
+        print(f"{'backend':<20}{'encode/s':>12}{'decode/s':>12}")
+        for label, backend in backends:
+            token = backend.encode(claims)
+            assert backend.decode(token)["sub"] == claims["sub"]
+            encode = _rate(lambda: backend.encode(claims), args.number)
+            decode = _rate(lambda: backend.decode(token), args.number)
+            print(f"{label:<20}{encode:>12,.0f}{decode:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
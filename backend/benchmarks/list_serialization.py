@@ -0,0 +1,106 @@
+"""
+Serialization cost of a large service instance list
+
+Compares the two ways GET /projects/{id}/services can render 10k rows:
+
+- rows:  Core rows of SERVICE_INSTANCE_READ_COLUMNS through `rows_response`
+         (orjson straight from the row mappings), as the endpoint does now
+- orm:   ServiceInstance objects validated into list[ServiceInstanceRead]
+         with from_attributes, dumped in JSON mode and rendered by
+         JSONResponse, i.e. what FastAPI does for a `response_model`
+
+Rows and objects are synthetic and built before timing, so no database is
+needed and the ORM path is measured without its (considerable) hydration cost.
+
+    cd backend && python -m benchmarks.list_serialization [--rows 10000] [--repeat 5]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+import app.db  # noqa: F401  (registers every model before the imports below)
+from app.api.responses import rows_response
+from app.api.v1.projects.service_instance_service import SERVICE_INSTANCE_READ_COLUMNS
+from app.api.v1.projects.service_schemas import ServiceInstanceRead
+from app.api.v1.services.models import ServiceInstance
+
+_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _values(n: int) -> dict[str, Any]:
+    return {
+        "id": n + 1,
+        "project_id": 1,
+        "service_type_id": n % 12 + 1,
+        "environment_id": n % 3 + 1 if n % 5 else None,
+        "name": f"service-{n:05d}",
+        "endpoint": f"https://service-{n:05d}.internal.example.com",
+        "port": 8000 + n % 1000,
+        "status": ("up", "down", "unknown")[n % 3],
+        "metadata": {"team": f"team-{n % 40}", "tier": n % 3, "tags": ["prod", f"zone-{n % 4}"]},
+        "created_at": _EPOCH + timedelta(seconds=n),
+        "updated_at": _EPOCH + timedelta(seconds=2 * n) if n % 2 else None,
+    }
+
+
+def _rows(count: int) -> list[Any]:
+    fields = [column.key for column in SERVICE_INSTANCE_READ_COLUMNS]
+    data = [tuple(_values(n)[field] for field in fields) for n in range(count)]
+    return IteratorResult(SimpleResultMetaData(fields), iter(data)).all()
+
+
+def _objects(count: int) -> list[ServiceInstance]:
+    objects = []
+    for n in range(count):
+        values = _values(n)
+        values["metadata_"] = values.pop("metadata")
+        objects.append(ServiceInstance(**values))
+    return objects
+
+
+def _best(fn: Callable[[], bytes], repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(fn())
+        best = min(best, time.perf_counter() - started)
+    return best, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = _rows(args.rows)
+    objects = _objects(args.rows)
+    adapter = TypeAdapter(list[ServiceInstanceRead])
+
+    def render_rows() -> bytes:
+        return rows_response(rows, SERVICE_INSTANCE_READ_COLUMNS).body
+
+    def render_orm() -> bytes:
+        validated = adapter.validate_python(objects, from_attributes=True)
+        return JSONResponse(adapter.dump_python(validated, mode="json")).body
+
+    # Both paths must render the same document for the comparison to mean anything
+    assert render_rows() == render_orm(), "rows_response output differs from the response_model output"
+
+    rows_seconds, rows_size = _best(render_rows, args.repeat)
+    orm_seconds, orm_size = _best(render_orm, args.repeat)
+    print(f"{args.rows} service instances, best of {args.repeat}")
+    print(f"{'path':<8}{'ms':>10}{'bytes':>12}")
+    print(f"{'rows':<8}{rows_seconds * 1000:>10.1f}{rows_size:>12,}")
+    print(f"{'orm':<8}{orm_seconds * 1000:>10.1f}{orm_size:>12,}")
+    print(f"speedup {orm_seconds / rows_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
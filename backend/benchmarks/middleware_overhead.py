@@ -0,0 +1,154 @@
+"""
+Per-request overhead of the auth and security-header middlewares
+
+Times anonymous requests to a no-op endpoint through three stacks, each
+called in-process as an ASGI app (no server, no network):
+
+- none:   the bare FastAPI app
+- base:   the BaseHTTPMiddleware versions app.core.middleware replaced,
+          reproduced below as they were
+- asgi:   the current pure ASGI AuthMiddleware + SecurityHeadersMiddleware
+
+Anonymous requests skip token checks in every stack, so the numbers are the
+middleware plumbing alone. Requests run --concurrency at a time.
+
+    cd backend && python -m benchmarks.middleware_overhead [--requests 20000] [--concurrency 50] [--repeat 5]
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+import app.db  # noqa: F401  (registers every model before the middleware imports)
+from app.core.middleware import AuthMiddleware, SecurityHeadersMiddleware
+
+
+class BaseAuthMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        request.state.user = None
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return await call_next(request)
+        raise NotImplementedError("anonymous requests only")
+
+
+class BaseSecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        csp_policy = (
+            "default-src 'self'; "
+            "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
+            "style-src 'self' 'unsafe-inline'; "
+            "img-src 'self' data: https:; "
+            "font-src 'self' data:; "
+            "connect-src 'self' https:; "
+            "frame-ancestors 'none'; "
+            "base-uri 'self'; "
+            "form-action 'self';"
+        )
+        response.headers["Content-Security-Policy"] = csp_policy
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
+        if request.url.scheme == "https":
+            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        return response
+
+
+def _app(*middlewares: type) -> FastAPI:
+    api = FastAPI()
+
+    @api.get("/noop", response_class=PlainTextResponse)
+    async def noop():
+        return "ok"
+
+    for middleware in middlewares:
+        api.add_middleware(middleware)
+    return api
+
+
+STACKS = {
+    "none": (),
+    "base": (BaseAuthMiddleware, BaseSecurityHeadersMiddleware),
+    "asgi": (AuthMiddleware, SecurityHeadersMiddleware),
+}
+
+
+async def _request(api: FastAPI) -> None:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/noop",
+        "raw_path": b"/noop",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    status = None
+    received = False
+    done = asyncio.Event()
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # As uvicorn does: nothing more until the response is complete
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif not message.get("more_body", False):
+            done.set()
+
+    await api(scope, receive, send)
+    assert status == 200
+
+
+async def _run(api: FastAPI, requests: int, concurrency: int) -> float:
+    # Warm up routing and middleware stack construction
+    await asyncio.gather(*(_request(api) for _ in range(concurrency)))
+    started = time.perf_counter()
+    for _ in range(requests // concurrency):
+        await asyncio.gather(*(_request(api) for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    requests = args.requests // args.concurrency * args.concurrency
+    results = {}
+    for name, middlewares in STACKS.items():
+        api = _app(*middlewares)
+        results[name] = min(
+            asyncio.run(_run(api, requests, args.concurrency)) for _ in range(args.repeat)
+        ) / requests
+
+    print(f"{requests:,} requests, {args.concurrency} concurrent, best of {args.repeat}")
+    print(f"{'stack':<8}{'us/req':>10}{'req/s':>10}{'overhead us':>14}")
+    for name, seconds in results.items():
+        overhead = (seconds - results["none"]) * 1e6
+        print(f"{name:<8}{seconds * 1e6:>10.1f}{1 / seconds:>10,.0f}{overhead:>14.1f}")
+    print(f"asgi serves {results['base'] / results['asgi']:.1f}x the requests of base")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Per-request cost of the token revocation check
+
+Compares, for tokens that were not revoked (nearly every request):
+
+- bloom:  `is_blacklisted`, the per-worker Bloom filter with EXISTS only on
+          a filter hit, as get_current_user runs it
+- redis:  one EXISTS round trip per request, the lookup the filter replaced
+
+--revoked ids are revoked through `revoke` first and the filter synced from
+Redis, so it is as full as in production with that many live revocations.
+Bloom filter hits on unrevoked tokens (false positives) are counted; each one
+costs the same round trip as the redis path.
+
+Point REDIS_URL at a scratch Redis; the revocation keys are left to expire.
+
+    cd backend && REDIS_URL=redis://... python -m benchmarks.revocation_check [--revoked 50000] [--checks 20000]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from app.core.redis import redis_client
+from app.core.token_blacklist import _entry_key, is_blacklisted, revocation_filter, revoke
+
+
+async def _revoke_many(count: int) -> None:
+    expires_at = time.time() + 600
+    for _ in range(count):
+        await revoke(f"jti:{uuid.uuid4()}", expires_at)
+
+
+async def _time(check, payloads: list[dict]) -> float:
+    started = time.perf_counter()
+    for payload in payloads:
+        await check(payload)
+    return (time.perf_counter() - started) / len(payloads)
+
+
+async def _redis_lookup(payload: dict) -> bool:
+    return await redis_client.exists(_entry_key(f"jti:{payload['jti']}")) > 0
+
+
+async def _run(args: argparse.Namespace) -> None:
+    print(f"revoking {args.revoked:,} token ids...")
+    await _revoke_many(args.revoked)
+    await revocation_filter.sync()
+
+    payloads = [{"jti": str(uuid.uuid4())} for _ in range(args.checks)]
+    false_positives = sum(revocation_filter.might_contain(f"jti:{p['jti']}") for p in payloads)
+    bloom = await _time(is_blacklisted, payloads)
+    redis = await _time(_redis_lookup, payloads)
+    await redis_client.aclose()
+
+    print(f"{args.checks:,} checks of unrevoked tokens, {args.revoked:,} revoked ids")
+    print(f"{'path':<8}{'us/check':>10}")
+    print(f"{'bloom':<8}{bloom * 1e6:>10.1f}")
+    print(f"{'redis':<8}{redis * 1e6:>10.1f}")
+    print(f"bloom false positives: {false_positives} ({false_positives / args.checks:.3%}); "
+          f"speedup {redis / bloom:.0f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--revoked", type=int, default=50000)
+    parser.add_argument("--checks", type=int, default=20000)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+SharedCache single-flight fills under concurrency
+
+Loaders count their calls; however many callers ask for a cold key at once,
+from coroutines, threads or separate cache instances standing in for other
+workers (sharing the suite's fakeredis), the value is loaded once.
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.cache import SharedCache
+from app.core.config import settings
+
+CALLERS = 20
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_FILL_POLL_SECONDS", 0.01)
+
+
+class CountingLoader:
+    def __init__(self, seconds: float = 0.1):
+        self.seconds = seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self) -> dict:
+        with self._lock:
+            self.calls += 1
+        return {"value": 42}
+
+    async def load(self) -> dict:
+        await asyncio.sleep(self.seconds)
+        return self._count()
+
+    def load_sync(self) -> dict:
+        time.sleep(self.seconds)
+        return self._count()
+
+
+def _gather_async(caches, loader):
+    async def main():
+        return await asyncio.gather(*(
+            caches[n % len(caches)].get_or_load("key", loader.load) for n in range(CALLERS)
+        ))
+
+    return asyncio.run(main())
+
+
+def _run_threads(caches, loader):
+    results = []
+    barrier = threading.Barrier(CALLERS)
+
+    def call(cache):
+        barrier.wait()
+        results.append(cache.get_or_load_sync("key", loader.load_sync))
+
+    threads = [threading.Thread(target=call, args=(caches[n % len(caches)],)) for n in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_async_callers_share_one_fill():
+    loader = CountingLoader()
+    results = _gather_async([SharedCache("test", ttl=60, beta=0)], loader)
+    assert loader.calls == 1
+    assert results == [{"value": 42}] * CALLERS
+
+
+def test_async_callers_across_workers_share_one_fill():
+    loader = CountingLoader()
+    workers = [SharedCache("test", ttl=60, beta=0) for _ in range(3)]
+    results = _gather_async(workers, loader)
+    assert loader.calls == 1
+    assert results == [{"value": 42}] * CALLERS
+
+
+def test_threaded_callers_share_one_fill():
+    loader = CountingLoader()
+    results = _run_threads([SharedCache("test", ttl=60, beta=0)], loader)
+    assert loader.calls == 1
+    assert results == [{"value": 42}] * CALLERS
+
+
+def test_threaded_callers_across_workers_share_one_fill():
+    loader = CountingLoader()
+    workers = [SharedCache("test", ttl=60, beta=0) for _ in range(3)]
+    results = _run_threads(workers, loader)
+    assert loader.calls == 1
+    assert results == [{"value": 42}] * CALLERS
+
+
+def test_async_and_threaded_callers_share_one_fill():
+    loader = CountingLoader()
+    cache = SharedCache("test", ttl=60, beta=0)
+    async_results = []
+    event_loop = threading.Thread(target=lambda: async_results.extend(_gather_async([cache], loader)))
+    event_loop.start()
+    thread_results = _run_threads([cache], loader)
+    event_loop.join()
+    assert loader.calls == 1
+    assert async_results + thread_results == [{"value": 42}] * (2 * CALLERS)
+
+
+def test_loader_error_reaches_every_waiting_caller():
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        raise RuntimeError("backend down")
+
+    async def main():
+        cache = SharedCache("test", ttl=60, beta=0)
+        return await asyncio.gather(*(cache.get_or_load("key", failing) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cached_value_is_served_without_loading(redis):
+    loader = CountingLoader(seconds=0)
+    cache = SharedCache("test", ttl=60, beta=0)
+    assert cache.get_or_load_sync("key", loader.load_sync) == {"value": 42}
+    assert asyncio.run(cache.get_or_load("key", loader.load)) == {"value": 42}
+    assert loader.calls == 1
+    assert redis.exists("cache:test:key")
+    assert not redis.exists("cache:test:key:lock")
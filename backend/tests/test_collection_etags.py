@@ -0,0 +1,44 @@
+import pytest
+
+from app.core import middleware
+
+
+@pytest.fixture
+def request_stats(monkeypatch):
+    """QueryStats of every request served, in order"""
+    captured = []
+    report = middleware.report
+
+    def capture(stats, route):
+        captured.append(stats)
+        report(stats, route)
+
+    monkeypatch.setattr(middleware, "report", capture)
+    return captured
+
+
+@pytest.mark.parametrize("collection", ["credentials", "services"])
+def test_unchanged_poll_issues_no_sql(client, auth_headers, project, request_stats, collection):
+    url = f"/api/v1/projects/{project.id}/{collection}"
+    first = client.get(url, headers=auth_headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert request_stats[-1].count > 0
+
+    poll = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert poll.status_code == 304
+    assert poll.headers["ETag"] == etag
+    assert request_stats[-1].count == 0
+
+
+def test_write_invalidates_etag(client, auth_headers, project, request_stats):
+    url = f"/api/v1/projects/{project.id}/credentials"
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+
+    created = client.post(url, json={"kind": "token", "secret_ref": "vault:acme/token"}, headers=auth_headers)
+    assert created.status_code == 201
+
+    poll = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert poll.status_code == 200
+    assert poll.headers["ETag"] != etag
+    assert [item["secret_ref"] for item in poll.json()] == ["vault:acme/token"]
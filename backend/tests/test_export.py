@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import orjson
+import pytest
+
+from app.api.v1.projects import export
+from app.api.v1.projects.models import Credential, CredentialKind
+
+
+@pytest.fixture
+def slots(monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(export, "_export_slots", slots)
+    return slots
+
+
+@pytest.fixture
+def credentials(db, project):
+    db.add_all([
+        Credential(project_id=project.id, kind=CredentialKind.token, secret_ref=f"vault:acme/{n}")
+        for n in range(3)
+    ])
+    db.commit()
+
+
+def test_ndjson_export(client, auth_headers, project, credentials, slots):
+    response = client.get(f"/api/v1/projects/{project.id}/export", headers=auth_headers)
+    assert response.status_code == 200
+    records = [orjson.loads(line) for line in response.content.splitlines()]
+    assert [record["type"] for record in records] == ["project"] + ["credential"] * 3
+    assert records[1]["secret_ref"] == "vault:acme/0"
+    # The slot is free again once the stream is done
+    assert slots.acquire(blocking=False)
+
+
+def test_exports_beyond_the_cap_are_rejected(client, auth_headers, project, slots):
+    slots.acquire()
+    response = client.get(f"/api/v1/projects/{project.id}/export", headers=auth_headers)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+def test_client_disconnect_closes_the_export(slots):
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                yield b"x" * 1024
+        finally:
+            closed.set()
+
+    slots.acquire()
+    response = export.ExportResponse(endless(), media_type="application/x-ndjson")
+    sent = []
+
+    async def receive():
+        # The client goes away once the body has started
+        while len(sent) < 3:
+            await asyncio.sleep(0.01)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(response({"type": "http", "method": "GET", "asgi": {"spec_version": "2.3"}}, receive, send))
+
+    assert closed.is_set()
+    assert slots.acquire(blocking=False)
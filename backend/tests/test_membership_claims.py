@@ -0,0 +1,37 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.api.v1.projects.claims import _version_key
+from app.api.v1.projects.models import ProjectMember
+from app.api.v1.users.models import User
+from app.core.redis import redis_sync_client
+
+
+@pytest.fixture
+def member(db, project):
+    user = User(email="member@example.com", hashed_password="!")
+    db.add(user)
+    db.flush()
+    db.add(ProjectMember(project_id=project.id, user_id=user.id, role="viewer"))
+    db.commit()
+    return user
+
+
+def test_removing_a_member_bumps_their_membership_version(client, auth_headers, redis, project, member):
+    redis.set(_version_key(member.id), 1)
+    response = client.delete(f"/api/v1/projects/{project.id}/members/{member.id}", headers=auth_headers)
+    assert response.status_code == 204
+    assert redis.get(_version_key(member.id)) == "2"
+
+
+def test_membership_write_fails_when_claims_cannot_be_invalidated(
+    client, auth_headers, db, monkeypatch, project, member
+):
+    def incr(*args, **kwargs):
+        raise RedisConnectionError("redis down")
+
+    monkeypatch.setattr(redis_sync_client, "incr", incr)
+    response = client.delete(f"/api/v1/projects/{project.id}/members/{member.id}", headers=auth_headers)
+    # The removal is committed, but must not be reported as done
+    assert response.status_code == 503
+    assert db.query(ProjectMember).count() == 0
@@ -0,0 +1,41 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api.pagination import PageParams, encode_cursor
+from app.api.v1.projects.models import Project
+
+
+@pytest.fixture
+def projects(db):
+    db.add_all([Project(code=f"p{n}", display_name=f"Project {n}") for n in range(5)])
+    db.commit()
+
+
+def test_pages_follow_the_cursor(client, auth_headers, projects):
+    codes = []
+    url = "/api/v1/projects?sort=code&limit=2"
+    while url:
+        response = client.get(url, headers=auth_headers)
+        assert response.status_code == 200
+        codes += [project["code"] for project in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        url = f"/api/v1/projects?sort=code&limit=2&cursor={cursor}" if cursor else None
+    assert codes == ["p0", "p1", "p2", "p3", "p4"]
+
+
+@pytest.mark.parametrize("key", [{"code": "p1"}, ["p1"], 1, True, None])
+def test_cursor_key_of_the_wrong_type_is_rejected(client, auth_headers, projects, key):
+    cursor = encode_cursor("code", [key, 2])
+    response = client.get(f"/api/v1/projects?sort=code&cursor={cursor}", headers=auth_headers)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+def test_timestamp_cursor_key_is_parsed():
+    cursor = encode_cursor("created_at", ["2024-01-01 00:00:00+00:00", 1])
+    assert PageParams(limit=10, sort="created_at", cursor=cursor).predicate(Project) is not None
+
+    page = PageParams(limit=10, sort="created_at", cursor=encode_cursor("created_at", [1704067200, 1]))
+    with pytest.raises(HTTPException) as error:
+        page.predicate(Project)
+    assert error.value.status_code == 400
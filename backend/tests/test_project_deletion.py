@@ -0,0 +1,104 @@
+import pytest
+from kombu.exceptions import OperationalError as BrokerError
+
+from app.api.v1.projects import deletion
+from app.api.v1.projects.claims import _version_key
+from app.api.v1.projects.models import Credential, CredentialKind, Project, ProjectMember
+from app.api.v1.projects.service import ProjectService
+from app.api.v1.services.models import ServiceInstance, ServiceType
+from app.api.v1.users.models import User
+from app.core.config import settings
+from app.tasks import delete_project
+
+
+@pytest.fixture
+def members(db, project, redis):
+    users = [User(email=f"user{n}@example.com", hashed_password="!") for n in range(3)]
+    db.add_all(users)
+    db.flush()
+    db.add_all([ProjectMember(project_id=project.id, user_id=user.id, role="viewer") for user in users])
+    db.commit()
+    for user in users:
+        redis.set(_version_key(user.id), 1)
+    return [user.id for user in users]
+
+
+@pytest.fixture
+def large_project(db, project, members, monkeypatch):
+    """A project over a lowered PROJECT_DELETE_ASYNC_THRESHOLD: 5 credentials, 3 services, 3 members"""
+    monkeypatch.setattr(settings, "PROJECT_DELETE_ASYNC_THRESHOLD", 4)
+    service_type = ServiceType(code="http", group="web", display_name="HTTP")
+    db.add(service_type)
+    db.flush()
+    db.add_all([
+        Credential(project_id=project.id, kind=CredentialKind.token, secret_ref=f"vault:acme/{n}")
+        for n in range(5)
+    ])
+    db.add_all([
+        ServiceInstance(
+            project_id=project.id, service_type_id=service_type.id, name=f"svc-{n}", endpoint="https://acme.test"
+        )
+        for n in range(3)
+    ])
+    db.commit()
+    return project
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Task ids handed to the broker"""
+    calls = []
+    monkeypatch.setattr(delete_project, "apply_async", lambda args, task_id: calls.append(task_id))
+    return calls
+
+
+def _bumped(redis, user_ids):
+    return all(redis.get(_version_key(user_id)) == "2" for user_id in user_ids)
+
+
+def test_small_project_is_deleted_inline(client, auth_headers, db, redis, project, members, queued):
+    response = client.delete(f"/api/v1/projects/{project.id}", headers=auth_headers)
+    assert response.status_code == 204
+    assert not queued
+    assert db.query(ProjectMember).count() == 0
+    # Former members' tokens no longer carry a trusted claim for the project
+    assert _bumped(redis, members)
+
+
+def test_large_project_is_deleted_in_the_background(client, auth_headers, db, large_project, queued):
+    response = client.delete(f"/api/v1/projects/{large_project.id}", headers=auth_headers)
+    assert response.status_code == 202
+    job = response.json()
+    assert job == {"job_id": queued[0], "status": "queued", "project_id": large_project.id}
+    assert response.headers["Location"] == f"http://testserver/api/v1/projects/jobs/{job['job_id']}"
+    assert db.get(Project, large_project.id) is not None
+
+
+def test_second_delete_returns_the_queued_job(client, auth_headers, large_project, queued):
+    url = f"/api/v1/projects/{large_project.id}"
+    first = client.delete(url, headers=auth_headers).json()["job_id"]
+    second = client.delete(url, headers=auth_headers).json()["job_id"]
+    assert first == second
+    assert queued == [first]
+
+
+def test_failed_enqueue_releases_the_guard(redis, monkeypatch):
+    def apply_async(args, task_id):
+        raise BrokerError("broker down")
+
+    monkeypatch.setattr(delete_project, "apply_async", apply_async)
+    with pytest.raises(BrokerError):
+        deletion.start_deletion(1)
+    assert not redis.exists(deletion._guard_key(1))
+
+
+def test_delete_in_batches(db, redis, large_project, members):
+    progress = []
+    deleted = ProjectService.delete_in_batches(
+        db, project_id=large_project.id, batch_size=2, progress=progress.append
+    )
+    assert deleted == 5 + 3 + 3
+    assert progress[-1] == deleted
+    assert db.get(Project, large_project.id) is None
+    assert db.query(Credential).count() == db.query(ServiceInstance).count() == 0
+    assert _bumped(redis, members)
@@ -0,0 +1,55 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.core.middleware import QueryStatsMiddleware
+from app.db import SessionLocal
+from app.db.query_stats import QueryBudgetExceeded, expect_queries, query_budget
+
+
+def _budget_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+
+    def run(statements: int) -> None:
+        with SessionLocal() as db:
+            for _ in range(statements):
+                db.execute(text("SELECT 1"))
+
+    @app.get("/statements/{count}")
+    @query_budget(2)
+    def statements(count: int):
+        run(count)
+        return {"count": count}
+
+    return app
+
+
+def test_endpoint_within_budget_passes(database, strict_query_budgets):
+    response = TestClient(_budget_app()).get("/statements/2")
+    assert response.status_code == 200
+
+
+def test_endpoint_over_budget_fails(database, strict_query_budgets):
+    with pytest.raises(QueryBudgetExceeded, match="3 statements, budget 2"):
+        TestClient(_budget_app()).get("/statements/3")
+
+
+def test_budget_is_only_reported_when_not_strict(database):
+    response = TestClient(_budget_app()).get("/statements/3")
+    assert response.status_code == 200
+
+
+def test_expect_queries_fails_over_budget(db):
+    with pytest.raises(QueryBudgetExceeded):
+        with expect_queries(1):
+            db.execute(text("SELECT 1"))
+            db.execute(text("SELECT 2"))
+
+
+def test_app_endpoint_is_held_to_its_budget(client, auth_headers, project):
+    # GET /projects/{id} declares 2: principal lookup + project
+    response = client.get(f"/api/v1/projects/{project.id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["code"] == "acme"
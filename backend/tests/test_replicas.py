@@ -0,0 +1,185 @@
+"""
+Read replica routing
+
+The test database poses as both primary and replica (it is not in recovery,
+so it reports zero lag); statements are attributed to the engine that ran them.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, event, insert, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from starlette.requests import Request
+
+from app.api.v1.projects.models import Project
+from app.core.config import settings
+from app.core.principal_cache import Principal
+from app.db import SessionLocal, engine, replicas as replicas_module, session as session_module
+from app.db.replicas import READ_BIND, WROTE, Replica, ReplicaSet
+from app.db.session import _async_url
+
+USER = Principal(id=1, is_active=True, is_superuser=False)
+
+
+def _replica(name: str, url: str) -> Replica:
+    # NullPool: every test runs its own event loop
+    return Replica(name, create_engine(url), create_async_engine(_async_url(url), poolclass=NullPool))
+
+
+@pytest.fixture
+def replica(database):
+    replica = _replica("replica-test", database.url.render_as_string(hide_password=False))
+    yield replica
+    replica.engine.dispose()
+
+
+@pytest.fixture
+def replica_set(replica, monkeypatch):
+    replica_set = ReplicaSet([replica])
+    monkeypatch.setattr(session_module, "replicas", replica_set)
+    return replica_set
+
+
+@pytest.fixture
+def executed():
+    """Engine ("primary" or "replica") of every statement run, in order"""
+    return []
+
+
+@pytest.fixture(autouse=True)
+def attribute_statements(replica, executed):
+    def listen(target, label):
+        def record(*args):
+            executed.append(label)
+
+        event.listen(target, "before_cursor_execute", record)
+        return record
+
+    listeners = [(engine, listen(engine, "primary")), (replica.engine, listen(replica.engine, "replica"))]
+    yield
+    for target, record in listeners:
+        event.remove(target, "before_cursor_execute", record)
+
+
+def _request(method: str) -> Request:
+    request = Request({"type": "http", "method": method, "headers": [], "state": {}})
+    request.state.user = USER
+    return request
+
+
+async def _routed(method: str, work) -> None:
+    """Run `work(session)` in a request served through get_routed_db"""
+    request = _request(method)
+    dependency = session_module.get_routed_db(request)
+    db = await dependency.__anext__()
+    work(db)
+    with pytest.raises(StopAsyncIteration):
+        await dependency.__anext__()
+
+
+def test_get_bind_sends_reads_to_the_replica_and_writes_to_the_primary(db, replica, executed):
+    with SessionLocal() as session:
+        session.info[READ_BIND] = replica.engine
+        session.execute(select(Project.id))
+        assert executed == ["replica"]
+
+        session.add(Project(code="acme", display_name="Acme"))
+        session.flush()
+        assert executed[-1] == "primary"
+        assert session.info[WROTE] and READ_BIND not in session.info
+
+        # The rest of the session stays on the primary
+        session.execute(select(Project.id))
+        assert executed[-1] == "primary"
+        session.commit()
+
+
+def test_dml_and_locking_reads_use_the_primary(db, replica, executed):
+    with SessionLocal() as session:
+        session.info[READ_BIND] = replica.engine
+        session.execute(select(Project.id).with_for_update())
+        session.execute(text("SELECT 1"))
+        assert executed == ["primary", "primary"]
+        session.execute(insert(Project).values(code="acme", display_name="Acme"))
+        assert session.info[WROTE]
+        session.rollback()
+
+
+def test_write_pins_the_users_reads_to_the_primary(db, replica, replica_set, executed, monkeypatch):
+    monkeypatch.setattr(settings, "REPLICA_MAX_LAG_SECONDS", 5)
+
+    def read(session):
+        session.execute(select(Project.id))
+
+    def write(session):
+        session.add(Project(code="acme", display_name="Acme"))
+        session.commit()
+
+    async def main():
+        await replica.check()
+        await _routed("GET", read)
+        await _routed("POST", write)
+        await _routed("GET", read)
+
+    asyncio.run(main())
+    assert executed[0] == "replica"
+    # The GET after the write reads its own write from the primary
+    assert executed[-1] == "primary"
+
+
+def test_lagging_replica_is_ejected_and_readmitted(replica, replica_set, monkeypatch):
+    monkeypatch.setattr(settings, "REPLICA_MAX_LAG_SECONDS", 5)
+    asyncio.run(replica.check())
+    assert replica_set.pick() is replica
+
+    monkeypatch.setattr(replicas_module, "_LAG_SQL", text("SELECT 30"))
+    asyncio.run(replica.check())
+    assert replica.lag == 30
+    assert replica_set.pick() is None
+
+    monkeypatch.undo()
+    monkeypatch.setattr(settings, "REPLICA_MAX_LAG_SECONDS", 5)
+    asyncio.run(replica.check())
+    assert replica_set.pick() is replica
+
+
+def test_failed_probe_ejects_until_a_later_check(replica, replica_set, monkeypatch):
+    monkeypatch.setattr(settings, "REPLICA_CHECK_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "REPLICA_EJECT_SECONDS", 0.2)
+    check = replica.check
+    failures = 1
+
+    async def flaky_check():
+        nonlocal failures
+        if failures:
+            failures -= 1
+            raise OSError("connection refused")
+        await check()
+
+    monkeypatch.setattr(replica, "check", flaky_check)
+
+    async def main():
+        monitor = asyncio.create_task(replica_set.monitor())
+        try:
+            await asyncio.sleep(0.02)
+            ejected = replica_set.pick()
+            await asyncio.sleep(0.3)
+            return ejected, replica_set.pick()
+        finally:
+            monitor.cancel()
+
+    ejected, readmitted = asyncio.run(main())
+    assert ejected is None
+    assert readmitted is replica
+
+
+def test_connection_error_ejects_the_replica(database):
+    down = _replica("replica-down", "postgresql://postgres@/obser_test?host=/nonexistent")
+    down.lag = 0
+    assert down.eligible
+    with pytest.raises(OperationalError):
+        with down.engine.connect():
+            pass
+    assert not down.eligible
@@ -0,0 +1,58 @@
+import pytest
+
+from app.api.v1.projects.service_instance_service import ServiceInstanceService
+from app.api.v1.projects.service_schemas import ServiceInstanceCreate
+from app.api.v1.services.catalog import service_type_catalog
+from app.api.v1.services.models import ServiceInstance, ServiceType
+from app.core.principal_cache import Principal
+
+
+@pytest.fixture
+def catalog(db, monkeypatch):
+    """The catalog snapshot loaded from two service types"""
+    db.add_all([
+        ServiceType(code="http", group="web", display_name="HTTP"),
+        ServiceType(code="postgres", group="database", display_name="PostgreSQL"),
+    ])
+    db.commit()
+    monkeypatch.setattr(service_type_catalog, "_snapshot", None)
+    service_type_catalog.load(db)
+    return service_type_catalog
+
+
+def test_list_service_types(client, auth_headers, catalog):
+    response = client.get("/api/v1/service-types", headers=auth_headers)
+    assert response.status_code == 200
+    assert [item["code"] for item in response.json()] == ["http", "postgres"]
+    assert response.headers["ETag"]
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_service_types_not_modified(client, auth_headers, catalog, if_none_match):
+    etag = client.get("/api/v1/service-types", headers=auth_headers).headers["ETag"]
+    response = client.get(
+        "/api/v1/service-types", headers={**auth_headers, "If-None-Match": if_none_match.format(etag=etag)}
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+
+def test_bulk_upsert_reports_type_deleted_since_snapshot(db, project, superuser, catalog):
+    http, postgres = (catalog.by_code("http").id, catalog.by_code("postgres").id)
+    # Deleted behind the snapshot's back: it still lists the type
+    db.query(ServiceType).filter(ServiceType.id == postgres).delete()
+    db.commit()
+    assert catalog.known_ids({postgres}) == {postgres}
+
+    items = [
+        (0, ServiceInstanceCreate(service_type_id=http, name="web", endpoint="https://acme.test")),
+        (1, ServiceInstanceCreate(service_type_id=postgres, name="db", endpoint="postgres://db.acme.test")),
+    ]
+    results = ServiceInstanceService.bulk_upsert(
+        db, project_id=project.id, items=items, user=Principal.from_user(superuser)
+    )
+
+    by_index = {result["index"]: result for result in results}
+    assert by_index[0]["status"] == "created"
+    assert by_index[1] == {"index": 1, "status": "error", "id": None, "detail": "Service type not found"}
+    assert [service.name for service in db.query(ServiceInstance)] == ["web"]
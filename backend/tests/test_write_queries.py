@@ -0,0 +1,154 @@
+"""
+Statement counts of the write paths
+
+Endpoint tests run under strict query budgets (see conftest), so each request
+below fails if it issues more statements than its `@query_budget`. Bulk
+endpoints have no fixed budget; their services are checked to issue the same
+number of statements whatever the batch size.
+"""
+import pytest
+
+from app.api.v1.projects.credential_schemas import CredentialCreate
+from app.api.v1.projects.credential_service import CredentialService
+from app.api.v1.projects.models import Credential, CredentialKind, ProjectMember
+from app.api.v1.projects.service_instance_service import ServiceInstanceService
+from app.api.v1.projects.service_schemas import ServiceInstanceCreate
+from app.api.v1.services.models import ServiceInstance, ServiceType
+from app.api.v1.users.models import User
+from app.core.principal_cache import Principal
+from app.db import SessionLocal
+from app.db.query_stats import expect_queries, track_queries
+
+
+@pytest.fixture
+def service_type(db):
+    service_type = ServiceType(code="http", group="web", display_name="HTTP")
+    db.add(service_type)
+    db.commit()
+    return service_type
+
+
+@pytest.fixture
+def principal(superuser):
+    return Principal.from_user(superuser)
+
+
+@pytest.fixture
+def credential(db, project):
+    credential = Credential(project_id=project.id, kind=CredentialKind.api_key, secret_ref="vault:acme/key")
+    db.add(credential)
+    db.commit()
+    return credential
+
+
+@pytest.fixture
+def service(db, project, service_type):
+    service = ServiceInstance(
+        project_id=project.id, service_type_id=service_type.id, name="api", endpoint="https://api.acme.test"
+    )
+    db.add(service)
+    db.commit()
+    return service
+
+
+def test_create_project(client, auth_headers):
+    response = client.post("/api/v1/projects", json={"code": "new", "display_name": "New"}, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json()["updated_at"] is None
+
+
+def test_update_project(client, auth_headers, project):
+    response = client.patch(f"/api/v1/projects/{project.id}", json={"display_name": "Renamed"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["updated_at"] is not None
+
+
+def test_delete_project(client, auth_headers, project):
+    response = client.delete(f"/api/v1/projects/{project.id}", headers=auth_headers)
+    assert response.status_code == 204
+
+
+def test_add_and_remove_member(client, auth_headers, db, project):
+    member = User(email="member@example.com", hashed_password="!")
+    db.add(member)
+    db.commit()
+
+    response = client.post(
+        f"/api/v1/projects/{project.id}/members", json={"user_id": member.id, "role": "viewer"}, headers=auth_headers
+    )
+    assert response.status_code == 201
+    assert response.json()["user_email"] == "member@example.com"
+
+    response = client.delete(f"/api/v1/projects/{project.id}/members/{member.id}", headers=auth_headers)
+    assert response.status_code == 204
+    assert db.query(ProjectMember).count() == 0
+
+
+def test_credential_writes(client, auth_headers, project, credential):
+    base = f"/api/v1/projects/{project.id}/credentials"
+    response = client.post(base, json={"kind": "api_key", "secret_ref": "vault:acme/other"}, headers=auth_headers)
+    assert response.status_code == 201
+
+    response = client.patch(f"{base}/{credential.id}", json={"secret_ref": "vault:acme/rotated"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["secret_ref"] == "vault:acme/rotated"
+
+    response = client.delete(f"{base}/{credential.id}", headers=auth_headers)
+    assert response.status_code == 204
+
+
+def test_service_writes(client, auth_headers, project, service_type, service):
+    base = f"/api/v1/projects/{project.id}/services"
+    response = client.post(
+        base,
+        json={"service_type_id": service_type.id, "name": "web", "endpoint": "https://acme.test"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 201
+
+    response = client.patch(f"{base}/{service.id}", json={"port": 8443}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["port"] == 8443
+
+    response = client.delete(f"{base}/{service.id}", headers=auth_headers)
+    assert response.status_code == 204
+
+
+def _bulk_credentials(project, principal, count):
+    items = [
+        (index, CredentialCreate(kind=CredentialKind.api_key, secret_ref=f"vault:acme/{count}-{index}"))
+        for index in range(count)
+    ]
+    # A fresh session per batch, as per request: access checks are memoized per session
+    with SessionLocal() as session, track_queries() as stats:
+        results = CredentialService.bulk_create(session, project_id=project.id, items=items, user=principal)
+    assert [result["status"] for result in results] == ["created"] * count
+    return stats.count
+
+
+def test_bulk_create_credentials_is_constant(db, project, principal):
+    # access check + one INSERT per chunk
+    assert _bulk_credentials(project, principal, 1) == _bulk_credentials(project, principal, 200) == 2
+
+
+def test_bulk_create_credentials_returns_ids_in_item_order(db, project, principal):
+    items = [
+        (index, CredentialCreate(kind=CredentialKind.api_key, secret_ref=f"vault:acme/{index}"))
+        for index in range(50)
+    ]
+    results = CredentialService.bulk_create(db, project_id=project.id, items=items, user=principal)
+    refs = dict(db.query(Credential.id, Credential.secret_ref).all())
+    assert all(refs[result["id"]] == f"vault:acme/{result['index']}" for result in results)
+
+
+def test_bulk_upsert_services_is_constant(project, service_type, principal):
+    def upsert(names):
+        items = [
+            (index, ServiceInstanceCreate(service_type_id=service_type.id, name=name, endpoint=f"https://{name}.test"))
+            for index, name in enumerate(names)
+        ]
+        with SessionLocal() as session, expect_queries(4) as stats:
+            ServiceInstanceService.bulk_upsert(session, project_id=project.id, items=items, user=principal)
+        return stats.count
+
+    assert upsert(["one"]) == upsert([f"svc-{n}" for n in range(100)])
@@ -9,6 +9,22 @@ export type Project = {
   updated_at?: string | null
 }
 
+// Largest page the backend serves (MAX_PAGE_SIZE)
+const LIST_PAGE_SIZE = 500
+
+// Fetch every page of a keyset-paginated list by following the X-Next-Cursor header.
+async function listAllPages<T>(url: string): Promise<T[]> {
+  const items: T[] = []
+  let cursor: string | undefined
+  do {
+    const res = await apiClient.get<T[]>(url, { params: { limit: LIST_PAGE_SIZE, cursor } })
+    items.push(...res.data)
+    const next = res.headers["x-next-cursor"]
+    cursor = typeof next === "string" && next ? next : undefined
+  } while (cursor)
+  return items
+}
+
 export async function listProjects(params?: { skip?: number; limit?: number }): Promise<Project[]> {
   // Build URL manually to ensure trailing slash is preserved even with query params.
   // Axios may strip trailing slashes when params are present, which triggers FastAPI redirects
@@ -72,8 +88,7 @@ export type User = {
 }
 
 export async function listProjectMembers(projectId: number): Promise<ProjectMember[]> {
-  const res = await apiClient.get<ProjectMember[]>(`/api/v1/projects/${projectId}/members`)
-  return res.data
+  return listAllPages<ProjectMember>(`/api/v1/projects/${projectId}/members`)
 }
 
 export async function addProjectMember(projectId: number, data: ProjectMemberCreate): Promise<ProjectMember> {
@@ -116,8 +131,7 @@ export type CredentialUpdate = {
 }
 
 export async function listProjectCredentials(projectId: number): Promise<Credential[]> {
-  const res = await apiClient.get<Credential[]>(`/api/v1/projects/${projectId}/credentials`)
-  return res.data
+  return listAllPages<Credential>(`/api/v1/projects/${projectId}/credentials`)
 }
 
 export async function createProjectCredential(projectId: number, data: CredentialCreate): Promise<Credential> {
@@ -178,8 +192,7 @@ export type ServiceInstanceUpdate = {
 }
 
 export async function listProjectServices(projectId: number): Promise<ServiceInstance[]> {
-  const res = await apiClient.get<ServiceInstance[]>(`/api/v1/projects/${projectId}/services`)
-  return res.data
+  return listAllPages<ServiceInstance>(`/api/v1/projects/${projectId}/services`)
 }
 
 export async function createProjectService(projectId: number, data: ServiceInstanceCreate): Promise<ServiceInstance> {